@@ -1,12 +1,14 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import jwt
 import time
-import requests
 import json
 import os
 import base64
 
+# jwt (which loads cryptography) and requests are imported inside the functions
+# that use them: every cold start pays for module-level imports, and most
+# invocations never sign an Apple Music token.
+
 app = Flask(__name__)
 CORS(app)
 
@@ -23,6 +25,8 @@ PRIVATE_KEY = os.environ.get("APPLE_MUSIC_PRIVATE_KEY", "")
 
 def generate_apple_music_token():
     """Generate JWT token for Apple Music API"""
+    import jwt
+
     payload = {
         'iss': TEAM_ID,
         'iat': int(time.time()),
@@ -38,6 +42,8 @@ def generate_apple_music_token():
 
 def get_spotify_token():
     """Get Spotify access token"""
+    import requests
+
     auth = base64.b64encode(f"{CLIENT_ID}:{CLIENT_SECRET}".encode()).decode()
     res = requests.post(
         "https://accounts.spotify.com/api/token",
@@ -49,6 +55,7 @@ def get_spotify_token():
 def search_apple_music_by_isrc(isrc):
     """Enhanced lookup with IPI extraction"""
     import re
+    import requests
     
     token = generate_apple_music_token()
     
@@ -3,14 +3,18 @@ from flask_cors import CORS
 import requests
 import base64
 import os
-import time
 from dotenv import load_dotenv
+from market_registry import get_markets
+from rate_governor import get_rate_governor
 
 load_dotenv()
 
 app = Flask(__name__)
 CORS(app)
 
+# Spotify calls are paced by the shared outbound rate governor
+rate_governor = get_rate_governor()
+
 CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
 CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
 
@@ -24,17 +28,7 @@ def get_spotify_token():
     return res.json()["access_token"]
 
 def get_playlists_from_category(market, genre, token):
-    market_codes = {
-        'France': 'FR',
-        'UK': 'GB',
-        'Germany': 'DE',
-        'Spain': 'ES',
-        'US': 'US',
-        'Thailand': 'TH',
-        'Japan': 'JP'
-    }
-    
-    market_code = market_codes.get(market, market)
+    market_code = get_markets().market_code(market)
     
     headers = {"Authorization": f"Bearer {token}"}
     playlists = []
@@ -57,7 +51,8 @@ def get_playlists_from_category(market, genre, token):
             "limit": 20
         }
         
-        search_response = requests.get(
+        search_response = rate_governor.get(
+            'spotify',
             "https://api.spotify.com/v1/search",
             headers=headers,
             params=search_params
@@ -82,7 +77,8 @@ def get_playlists_from_category(market, genre, token):
             playlist_id = item.get("id")
             
             # Get follower count for frontend display
-            playlist_details = requests.get(
+            playlist_details = rate_governor.get(
+                'spotify',
                 f"https://api.spotify.com/v1/playlists/{playlist_id}",
                 headers=headers
             ).json()
@@ -105,7 +101,7 @@ def get_playlist_tracks_detailed(playlist_id, token, playlist_name=""):
     
     # Get playlist info (for followers)
     playlist_url = f"https://api.spotify.com/v1/playlists/{playlist_id}"
-    p_info = requests.get(playlist_url, headers=headers).json()
+    p_info = rate_governor.get('spotify', playlist_url, headers=headers).json()
     followers = p_info.get("followers", {}).get("total")
     
     # Get tracks with pagination
@@ -114,7 +110,7 @@ def get_playlist_tracks_detailed(playlist_id, token, playlist_name=""):
     all_tracks = []
     
     while url:
-        r = requests.get(url, headers=headers, params=params)
+        r = rate_governor.get('spotify', url, headers=headers, params=params)
         if r.status_code != 200:
             break
             
@@ -148,7 +144,6 @@ def get_playlist_tracks_detailed(playlist_id, token, playlist_name=""):
             })
         
         url = data.get("next")  # Pagination
-        time.sleep(0.1)  # Rate limiting
     
     return all_tracks
 
@@ -192,7 +187,8 @@ def get_tracks():
         
         for i, playlist_id in enumerate(playlist_ids):
             # Get playlist name first
-            playlist_response = requests.get(
+            playlist_response = rate_governor.get(
+                'spotify',
                 f"https://api.spotify.com/v1/playlists/{playlist_id}",
                 headers={"Authorization": f"Bearer {token}"}
             )
@@ -218,4 +214,4 @@ def get_tracks():
         return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    app.run(debug=os.getenv('FLASK_DEBUG', '0') == '1', port=5000)
\ No newline at end of file
@@ -0,0 +1,449 @@
+"""
+Async Spotify / Apple Music client for discovery, harvests and credits
+asyncio + httpx versions of get_playlists_from_category,
+get_playlist_tracks_detailed and search_apple_music_by_isrc. One long-lived
+event loop (AsyncBridge) owns shared connection pools, and per-API
+semaphores cap in-flight calls, so a request waiting on Spotify costs a
+coroutine instead of a worker thread. Flask routes call in through
+AsyncBridge.run.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import threading
+
+import httpx
+
+from market_registry import get_markets
+from playlist_scoring import select_candidates
+from playlist_store import METADATA_FIELDS, format_playlist_track, playlist_metadata_url
+from rate_governor import get_rate_governor, retry_after_seconds
+from resilience import (CONNECT_TIMEOUT_SECONDS, READ_TIMEOUT_SECONDS, backoff_delay, get_upstreams,
+                        is_transient_status)
+
+# In-flight HTTP calls per process, across all requests
+SPOTIFY_MAX_CONCURRENCY = int(os.getenv('SPOTIFY_MAX_CONCURRENCY', '16'))
+APPLE_MAX_CONCURRENCY = int(os.getenv('APPLE_MAX_CONCURRENCY', '4'))
+
+# Retries for 429 (paced by the rate governor's Retry-After pause), 5xx and
+# connection errors (jittered backoff); per-upstream breakers come from resilience.py
+MAX_RETRIES = 3
+
+SPOTIFY_API = "https://api.spotify.com/v1"
+APPLE_CATALOG_API = "https://api.music.apple.com/v1/catalog/us"
+PAGE_SIZE = 100
+
+IPI_FROM_URL = re.compile(r'/artist/[^/]+/(\d{9,11})$')
+
+
+class AsyncBridge:
+    """Runs coroutines from synchronous code on one background event loop"""
+
+    def __init__(self):
+        self.loop = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        # Started on first use and again in a forked worker, where the parent's loop thread does not exist
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self.loop = asyncio.new_event_loop()
+                    threading.Thread(target=self.loop.run_forever, name='async-bridge', daemon=True).start()
+                    self._pid = os.getpid()
+        return self.loop
+
+    def reset(self):
+        """Forget an inherited loop (call in a worker right after fork)"""
+        self._lock = threading.Lock()
+        self.loop = None
+        self._pid = None
+
+    @property
+    def running(self):
+        return self._pid == os.getpid() and self.loop.is_running()
+
+    def run(self, coro, timeout=None):
+        """Run coro on the bridge loop and wait for its result in the calling thread"""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result(timeout)
+
+    def close(self):
+        if self.running:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+class AsyncMusicClient:
+    """Shared-pool async client; create once and use from the bridge loop"""
+
+    def __init__(self, spotify_token, apple_token, playlist_store=None, rate_governor=None, upstreams=None):
+        """
+        Args:
+            spotify_token: callable() -> Spotify access token (cached, may block briefly)
+            apple_token: callable() -> Apple Music developer token
+            playlist_store: Optional PlaylistStore for metadata and snapshot-gated harvests
+            rate_governor: RateGovernor pacing outbound calls (the process-wide one by default)
+            upstreams: ResilientUpstreams whose circuit breakers are shared with the blocking path
+        """
+        self.spotify_token = spotify_token
+        self.apple_token = apple_token
+        self.playlist_store = playlist_store
+        self.rate_governor = rate_governor or get_rate_governor()
+        self.upstreams = upstreams or get_upstreams()
+        self.logger = logging.getLogger(__name__)
+        self._client = None
+        self._spotify_slots = None
+        self._apple_slots = None
+        self._metadata_flights = {}  # (playlist_id, max_age_seconds) -> in-flight lookup
+        self.stats = {'requests': 0, 'retries': 0, 'errors': 0, 'rejected': 0, 'metadata_coalesced': 0,
+                      'pages_followed': 0}
+
+    def _ensure_client(self):
+        # Created lazily so the pool and semaphores belong to the running loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(READ_TIMEOUT_SECONDS, connect=CONNECT_TIMEOUT_SECONDS),
+                limits=httpx.Limits(max_connections=SPOTIFY_MAX_CONCURRENCY + APPLE_MAX_CONCURRENCY,
+                                    max_keepalive_connections=SPOTIFY_MAX_CONCURRENCY + APPLE_MAX_CONCURRENCY)
+            )
+            self._spotify_slots = asyncio.Semaphore(SPOTIFY_MAX_CONCURRENCY)
+            self._apple_slots = asyncio.Semaphore(APPLE_MAX_CONCURRENCY)
+        return self._client
+
+    def reset(self):
+        """Drop a connection pool inherited through fork (it belongs to the parent's loop)"""
+        self._client = None
+        self._spotify_slots = None
+        self._apple_slots = None
+        self._metadata_flights = {}
+
+    async def _get(self, url, headers, params=None, apple=False):
+        """
+        GET within the upstream's rate budget and a concurrency slot, retrying transient failures
+
+        Returns:
+            The first non-transient response, or None when the upstream is
+            unavailable (retries exhausted or its circuit breaker is open)
+        """
+        client = self._ensure_client()
+        slots = self._apple_slots if apple else self._spotify_slots
+        upstream = ('apple_search' if url.endswith('/search') else 'apple_catalog') if apple else 'spotify'
+        breaker = self.upstreams.breakers[upstream]
+        for attempt in range(MAX_RETRIES + 1):
+            if not breaker.allow():
+                self.stats['rejected'] += 1
+                return None
+            try:
+                # Wait for the reserved slot before taking a connection so others keep moving
+                wait = self.rate_governor.reserve(upstream)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                async with slots:
+                    self.stats['requests'] += 1
+                    try:
+                        response = await client.get(url, headers=headers, params=params)
+                    except httpx.HTTPError as e:
+                        self.stats['errors'] += 1
+                        self.logger.warning(f"⚠️ GET {url} failed: {e}")
+                        response = None
+            except BaseException:
+                # Cancelled (or failed outside HTTP) before an outcome: free a half-open probe
+                breaker.release_probe()
+                raise
+            if response is None or response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+                if not is_transient_status(response.status_code):
+                    return response
+                # 429: pauses every caller of this upstream, in all workers, for Retry-After
+                self.rate_governor.penalize(upstream, retry_after_seconds(response))
+            if attempt < MAX_RETRIES:
+                self.stats['retries'] += 1
+                if response is None or response.status_code >= 500:
+                    await asyncio.sleep(backoff_delay(attempt))
+        return None
+
+    async def _spotify_headers(self):
+        token = await asyncio.to_thread(self.spotify_token)
+        return {"Authorization": f"Bearer {token}"}
+
+    # ------------------------------------------------------------------
+    # Discovery
+    # ------------------------------------------------------------------
+    async def get_playlists_from_category(self, market, genre, report=None):
+        """Async get_playlists_from_category: searches and detail lookups run concurrently"""
+        markets = get_markets()
+        market_code = markets.market_code(market)
+        search_queries = markets.search_queries(market, genre)
+        scorer = markets.scorer(market, genre)
+        headers = await self._spotify_headers()
+
+        responses = await asyncio.gather(*[
+            self._get(f"{SPOTIFY_API}/search", headers,
+                      {"q": query, "type": "playlist", "market": market_code, "limit": 25})
+            for query in search_queries
+        ])
+
+        # Merge in query order so de-duplication matches the synchronous version
+        all_items = []
+        seen_ids = set()
+        for search_query, response in zip(search_queries, responses):
+            if response is None or response.status_code != 200:
+                if report is not None:
+                    report.setdefault('failed_queries', []).append(search_query)
+                continue
+            for item in response.json().get("playlists", {}).get("items", []):
+                if item and item.get("id") not in seen_ids:
+                    item['_search_query'] = search_query
+                    all_items.append(item)
+                    seen_ids.add(item.get("id"))
+
+        candidates = select_candidates(scorer, all_items, limit=60)
+        details = await asyncio.gather(*[
+            self.get_playlist_metadata(item.get("id"), headers) for item, _ in candidates
+        ])
+
+        playlists = [{
+            "playlist_name": item.get("name", ""),
+            "playlist_id": item.get("id"),
+            "owner": item.get("owner", {}).get("display_name", "Unknown"),
+            "followers": (metadata or {}).get("followers") or 0,
+            "description": item.get("description", ""),
+            "priority": priority,
+            "search_query": item.get('_search_query', '')
+        } for (item, priority), metadata in zip(candidates, details)]
+        if report is not None:
+            report['failed_details'] = [item.get("id") for (item, _), metadata in zip(candidates, details)
+                                        if metadata is None]
+
+        playlists.sort(key=lambda x: (x.get('priority', 0), x.get('followers', 0)), reverse=True)
+        return playlists
+
+    async def get_playlist_metadata(self, playlist_id, headers=None, max_age_seconds=None):
+        """
+        Playlist metadata through the playlist store's refresh tiers (or straight from Spotify)
+
+        Concurrent lookups of the same playlist (e.g. found by several markets' searches
+        in one batch) share a single request.
+        """
+        key = (playlist_id, max_age_seconds)
+        flight = self._metadata_flights.get(key)
+        if flight is None:
+            flight = asyncio.ensure_future(self._fetch_playlist_metadata(playlist_id, headers, max_age_seconds))
+            self._metadata_flights[key] = flight
+            flight.add_done_callback(lambda _: self._metadata_flights.pop(key, None))
+        else:
+            self.stats['metadata_coalesced'] += 1
+        # Shielded: one caller being cancelled must not cancel the lookup the others wait on
+        return await asyncio.shield(flight)
+
+    async def _fetch_playlist_metadata(self, playlist_id, headers, max_age_seconds):
+        headers = headers or await self._spotify_headers()
+        store = self.playlist_store
+        if store is None:
+            response = await self._get(playlist_metadata_url(playlist_id), headers, {"fields": METADATA_FIELDS})
+            if response is None or response.status_code != 200:
+                return None
+            payload = response.json()
+            return {'playlist_id': playlist_id, 'name': payload.get('name'),
+                    'followers': (payload.get('followers') or {}).get('total'),
+                    'snapshot_id': payload.get('snapshot_id'),
+                    'track_count': (payload.get('tracks') or {}).get('total')}
+
+        fresh, conditional_headers, row = store.refresh_plan(playlist_id, max_age_seconds)
+        if fresh is not None:
+            return fresh
+        response = await self._get(playlist_metadata_url(playlist_id), {**headers, **conditional_headers},
+                                   {"fields": METADATA_FIELDS})
+        if response is None:
+            return store.apply_refresh(playlist_id, row, None)
+        payload = response.json() if response.status_code == 200 else None
+        return store.apply_refresh(playlist_id, row, response.status_code, payload, response.headers.get('ETag'))
+
+    # ------------------------------------------------------------------
+    # Harvests
+    # ------------------------------------------------------------------
+    async def get_playlist_tracks_detailed(self, playlist_id, playlist_name=""):
+        """Async get_playlist_tracks_detailed"""
+        tracks, _ = await self.harvest_playlist(playlist_id, playlist_name)
+        return tracks
+
+    async def harvest_playlist(self, playlist_id, playlist_name=""):
+        """
+        (tracks, complete) for one playlist; complete is False when a page failed
+
+        With the track total from the metadata every page offset is known up
+        front, so pages are fetched concurrently instead of following next links.
+        The stored total can be up to an hour old, so the last planned page's
+        next link is then followed until the end of the playlist.
+        """
+        headers = await self._spotify_headers()
+        metadata = await self.get_playlist_metadata(playlist_id, headers)
+        if metadata is None:
+            return [], False
+        if self.playlist_store is not None:
+            stored = self.playlist_store.stored_tracks(playlist_id, metadata)
+            if stored is not None:
+                return stored, True
+
+        name = playlist_name or metadata.get('name')
+        followers = metadata.get('followers')
+        total = metadata.get('track_count') or 0
+        responses = await asyncio.gather(*[
+            self._get(f"{SPOTIFY_API}/playlists/{playlist_id}/tracks", headers,
+                      {"offset": offset, "limit": PAGE_SIZE})
+            for offset in range(0, max(total, 1), PAGE_SIZE)
+        ])
+
+        tracks = []
+        complete = True
+        next_url = None
+        for response in responses:
+            if response is None or response.status_code != 200:
+                # Same as the synchronous harvest: stop at the first failed page
+                complete = False
+                break
+            page = response.json()
+            for item in page.get("items", []):
+                row = format_playlist_track(item, playlist_id, name, followers)
+                if row:
+                    tracks.append(row)
+            next_url = page.get("next")
+
+        # Tracks appended since the metadata was fetched
+        while complete and next_url:
+            self.stats['pages_followed'] += 1
+            response = await self._get(next_url, headers)
+            if response is None or response.status_code != 200:
+                complete = False
+                break
+            page = response.json()
+            for item in page.get("items", []):
+                row = format_playlist_track(item, playlist_id, name, followers)
+                if row:
+                    tracks.append(row)
+            next_url = page.get("next")
+
+        if self.playlist_store is not None:
+            self.playlist_store.record_harvest(playlist_id, metadata, tracks, complete)
+        return tracks, complete
+
+    async def harvest_playlists(self, playlist_ids, on_playlist=None):
+        """
+        [(playlist_id, playlist_name, tracks, complete)] for many playlists, harvested concurrently
+
+        on_playlist(playlist_id, playlist_name, tracks, complete), when given, is called (in a
+        worker thread) as each playlist finishes, so results can be used before the slowest one.
+        """
+        headers = await self._spotify_headers()
+        metadata = await asyncio.gather(*[self.get_playlist_metadata(pid, headers) for pid in playlist_ids])
+        available = [(pid, meta.get('name') or "Unknown") for pid, meta in zip(playlist_ids, metadata)
+                     if meta is not None]
+
+        async def harvest(pid, name):
+            tracks, complete = await self.harvest_playlist(pid, name)
+            if on_playlist is not None:
+                await asyncio.to_thread(on_playlist, pid, name, tracks, complete)
+            return pid, name, tracks, complete
+
+        return list(await asyncio.gather(*[harvest(pid, name) for pid, name in available]))
+
+    # ------------------------------------------------------------------
+    # Apple Music credits
+    # ------------------------------------------------------------------
+    async def search_apple_music_by_isrc(self, isrc):
+        """Async search_apple_music_by_isrc (same result shape); writer searches run concurrently"""
+        token = await asyncio.to_thread(self.apple_token)
+        headers = {'Authorization': f'Bearer {token}'}
+        params = {
+            'filter[isrc]': isrc,
+            'include': 'artists,albums,composers',
+            'extend': 'editorialNotes,offers,artistUrl,popularity'
+        }
+
+        try:
+            response = await self._get(f"{APPLE_CATALOG_API}/songs", headers, params, apple=True)
+            if response is None:
+                # Transient: retries exhausted or the breaker is open, worth asking again later
+                return {'api_status': 'unavailable', 'isrc': isrc}
+            if response.status_code != 200:
+                self.logger.warning(f"Apple Music API error for ISRC {isrc}: {response.status_code}")
+                return {'api_status': 'error', 'isrc': isrc}
+
+            data = response.json()
+            if not data.get('data'):
+                return {'api_status': 'not_found', 'isrc': isrc}
+
+            attributes = data['data'][0].get('attributes', {})
+            result = {
+                'isrc': isrc,
+                'track_name': attributes.get('name', ''),
+                'artist_name': attributes.get('artistName', ''),
+                'composer_names': attributes.get('composerName', ''),
+                'apple_music_url': attributes.get('url', ''),
+                'genre_names': ', '.join(attributes.get('genreNames', [])),
+                'main_artist_ipi': None,
+                'writer_ipis': [],
+                'all_ipi_numbers': [],
+                'api_status': 'found'
+            }
+
+            artist_ipi_match = IPI_FROM_URL.search(attributes.get('artistUrl', '') or '')
+            if artist_ipi_match:
+                result['main_artist_ipi'] = artist_ipi_match.group(1)
+                result['all_ipi_numbers'].append(artist_ipi_match.group(1))
+
+            composer_name = attributes.get('composerName', '')
+            writers = [w.strip() for w in re.split(r'[&,]', composer_name) if w.strip()] if composer_name else []
+            matches = await asyncio.gather(*[self._writer_ipi(writer, headers) for writer in writers[:3]])
+            for match, searched in matches:
+                if match:
+                    result['writer_ipis'].append(match)
+                    result['all_ipi_numbers'].append(match['ipi'])
+            if not all(searched for _, searched in matches):
+                result['writer_search_incomplete'] = True
+
+            composers = [name.strip() for name in composer_name.replace('&', ',').split(',')] if composer_name else []
+            result['composer_count'] = len([c for c in composers if c])
+            if result['composer_names'] or result['main_artist_ipi'] or result['writer_ipis']:
+                result['api_status'] = 'found_with_credits'
+            result['total_ipis_found'] = len(result['all_ipi_numbers'])
+            result['all_ipi_string'] = ','.join(result['all_ipi_numbers']) if result['all_ipi_numbers'] else None
+            return result
+
+        except Exception as e:
+            self.logger.error(f"Error searching Apple Music for ISRC {isrc}: {e}")
+            return {'api_status': 'error', 'isrc': isrc, 'error': str(e)}
+
+    async def _writer_ipi(self, writer, headers):
+        """(match, searched): first Apple Music artist matching a writer name with an IPI in its URL"""
+        response = await self._get(f"{APPLE_CATALOG_API}/search", headers,
+                                   {'term': writer, 'types': 'artists', 'limit': 5}, apple=True)
+        if response is None:
+            return None, False
+        if response.status_code != 200:
+            return None, True
+        for artist in response.json().get('results', {}).get('artists', {}).get('data', []):
+            artist_attrs = artist.get('attributes', {})
+            artist_name = artist_attrs.get('name', '')
+            if writer.lower() == artist_name.lower() or artist_name.lower() in writer.lower():
+                writer_ipi_match = IPI_FROM_URL.search(artist_attrs.get('url', ''))
+                if writer_ipi_match:
+                    return {'name': writer, 'ipi': writer_ipi_match.group(1), 'found_as': artist_name}, True
+        return None, True
+
+    async def lookup_credits(self, isrcs):
+        """search_apple_music_by_isrc for many ISRCs concurrently (bounded by APPLE_MAX_CONCURRENCY)"""
+        return await asyncio.gather(*[self.search_apple_music_by_isrc(isrc) for isrc in isrcs])
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def get_stats(self):
+        return dict(self.stats, spotify_max_concurrency=SPOTIFY_MAX_CONCURRENCY,
+                    apple_max_concurrency=APPLE_MAX_CONCURRENCY)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cold start of the serverless function and the backend app
+
+Each run is a fresh interpreter (-X importtime) that imports the app module
+and serves its first request through the WSGI app, which is what a
+serverless cold start pays before answering. Two variants are compared:
+  - lazy:  the modules as shipped (heavy dependencies imported on first use)
+  - eager: the previously module-level heavy imports (jwt/cryptography,
+           requests, snowflake.connector, pyarrow) loaded up front
+
+Reports wall time (process start to exit), import time, first-request time
+and the modules imported by the app module with the highest cumulative cost.
+
+Usage: python benchmark_cold_start.py [--target api|backend] [--runs 5] [--top 12]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+TARGETS = {
+    # Vercel handler: a validation error needs no network or credentials
+    'api': {'cwd': os.path.join(os.path.dirname(BACKEND_DIR), 'api'), 'module': 'index',
+            'request': {'path': '/api/analyze', 'method': 'POST', 'json': {}}},
+    'backend': {'cwd': BACKEND_DIR, 'module': 'simple_working',
+                'request': {'path': '/healthz', 'method': 'GET'}},
+}
+
+EAGER_MODULES = ['jwt', 'requests', 'snowflake.connector', 'pyarrow']
+
+SNIPPET = """
+import json, time
+started = time.perf_counter()
+for name in {eager!r}:
+    try:
+        __import__(name)
+    except ImportError:
+        pass
+import {module} as target
+imported = time.perf_counter()
+from werkzeug.test import EnvironBuilder
+status = []
+b''.join(target.app(EnvironBuilder(**{request!r}).get_environ(), lambda code, headers: status.append(code)))
+served = time.perf_counter()
+print(json.dumps({{'import_ms': (imported - started) * 1000, 'first_request_ms': (served - imported) * 1000,
+                  'status': status[0]}}))
+"""
+
+
+def parse_importtime(stderr, module):
+    """Cumulative import cost (ms) of each module imported directly by module, from -X importtime output"""
+    direct = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        # Children are printed before their parent, so direct imports precede the module's own line
+        if depth == 1:
+            direct[name.strip()] = int(cumulative) / 1000
+        elif depth == 0:
+            if name.strip() == module:
+                return direct
+            direct = {}
+    return {}
+
+
+def run_once(target, eager):
+    config = TARGETS[target]
+    code = SNIPPET.format(eager=EAGER_MODULES if eager else [], module=config['module'], request=config['request'])
+    env = dict(os.environ, PREWARM_ENABLED='0', PLAYLIST_STORE_PATH=':memory:', PROFILING_BACKEND='mock')
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=config['cwd'], env=env,
+                          capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - started) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'failed')
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result['wall_ms'] = wall_ms
+    result['modules'] = parse_importtime(proc.stderr, config['module'])
+    return result
+
+
+def benchmark(target, runs, top):
+    print(f"\n{target}: {TARGETS[target]['module']} ({runs} runs, median)")
+    medians = {}
+    for variant in ('eager', 'lazy'):
+        try:
+            results = [run_once(target, variant == 'eager') for _ in range(runs)]
+        except RuntimeError as e:
+            print(f"  ❌ {variant}: {e}")
+            return
+        medians[variant] = {key: statistics.median(r[key] for r in results)
+                            for key in ('wall_ms', 'import_ms', 'first_request_ms')}
+        print(f"  {variant:6s} wall {medians[variant]['wall_ms']:7.1f}ms | "
+              f"import {medians[variant]['import_ms']:7.1f}ms | "
+              f"first request {medians[variant]['first_request_ms']:6.1f}ms | status {results[0]['status']}")
+        if variant == 'lazy':
+            median_run = sorted(results, key=lambda r: r['wall_ms'])[len(results) // 2]['modules']
+            print(f"  top {top} imports by {TARGETS[target]['module']} (lazy, cumulative):")
+            for name, cost in sorted(median_run.items(), key=lambda item: -item[1])[:top]:
+                print(f"    {cost:8.1f}ms  {name}")
+
+    saved = medians['eager']['wall_ms'] - medians['lazy']['wall_ms']
+    print(f"  ⚡ cold start {saved:+.1f}ms faster ({saved / medians['eager']['wall_ms']:.0%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', choices=[*TARGETS, 'all'], default='all')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=12)
+    args = parser.parse_args()
+
+    for target in (TARGETS if args.target == 'all' else [args.target]):
+        benchmark(target, args.runs, args.top)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Benchmark: row-dict fetch vs columnar (Arrow batch) fetch for profiling queries
+
+Simulates a Snowflake cursor whose result set arrives as Arrow chunks (which is
+how the connector receives it) and compares:
+  - legacy:   fetchall() + dict(zip(columns, row)) per row
+  - columnar: fetch_arrow_batches() kept as ColumnarResult
+  - columnar+json: columnar fetch, then to_rows() at the JSON boundary
+
+Reports throughput (rows/s) and peak Python + Arrow memory for 10k/100k/1M rows.
+
+Usage: python benchmark_columnar_fetch.py [--sizes 10000,100000,1000000]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pyarrow
+
+from query_results import ColumnarResult
+
+CHUNK_ROWS = 50000
+COLUMNS = ['ISRC', 'PLAYLIST_NAME', 'TERRITORY', 'STREAMS_ATD', 'HIT_RATE', 'ACTIVITY_MONTH']
+
+
+def build_source_table(num_rows):
+    """Synthetic profiling-shaped result (ISRC-level rows)"""
+    return pyarrow.table({
+        'ISRC': [f"FR{i:010d}" for i in range(num_rows)],
+        'PLAYLIST_NAME': pyarrow.array([f"Playlist {i % 500}" for i in range(num_rows)]).dictionary_encode().cast(pyarrow.string()),
+        'TERRITORY': ['FR'] * num_rows,
+        'STREAMS_ATD': pyarrow.array([(i * 7919) % 50000000 for i in range(num_rows)], pyarrow.int64()),
+        'HIT_RATE': pyarrow.array([(i % 1000) / 1000 for i in range(num_rows)], pyarrow.float64()),
+        'ACTIVITY_MONTH': pyarrow.array([f"2024-{(i % 12) + 1:02d}" for i in range(num_rows)]),
+    })
+
+
+class ArrowChunkCursor:
+    """Minimal stand-in for a Snowflake cursor with an Arrow result set"""
+
+    def __init__(self, table):
+        self._table = table
+        self._offset = 0  # next row for fetchmany()
+        self.description = [(name,) for name in table.column_names]
+
+    def _chunks(self):
+        return self._table.to_batches(max_chunksize=CHUNK_ROWS)
+
+    @staticmethod
+    def _to_tuples(batch):
+        # The connector converts each Arrow chunk to Python row tuples
+        return list(zip(*[col.to_pylist() for col in batch.columns]))
+
+    def fetchall(self):
+        rows = []
+        for batch in self._chunks():
+            rows.extend(self._to_tuples(batch))
+        return rows
+
+    def fetch_arrow_batches(self):
+        for batch in self._chunks():
+            yield pyarrow.Table.from_batches([batch])
+
+    def fetchmany(self, size):
+        rows = []
+        for batch in self._table.slice(self._offset, size).to_batches(max_chunksize=CHUNK_ROWS):
+            rows.extend(self._to_tuples(batch))
+        self._offset += len(rows)
+        return rows
+
+
+def legacy_fetch(cursor):
+    columns = [desc[0] for desc in cursor.description]
+    results = []
+    for row in cursor.fetchall():
+        results.append(dict(zip(columns, row)))
+    return results
+
+
+def columnar_fetch(cursor):
+    return ColumnarResult.from_cursor(cursor)
+
+
+def columnar_fetch_to_json_rows(cursor):
+    return ColumnarResult.from_cursor(cursor).to_rows()
+
+
+def measure(fn, table):
+    gc.collect()
+    arrow_before = pyarrow.total_allocated_bytes()
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+
+    start = time.perf_counter()
+    result = fn(ArrowChunkCursor(table))
+    elapsed = time.perf_counter() - start
+
+    _, py_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    arrow_delta = max(pyarrow.total_allocated_bytes() - arrow_before, 0)
+
+    rows = len(result)
+    del result
+    gc.collect()
+    return {
+        'rows': rows,
+        'seconds': elapsed,
+        'rows_per_sec': rows / elapsed if elapsed else float('inf'),
+        'peak_mb': (py_peak + arrow_delta) / (1024 * 1024),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(',')]
+
+    modes = [
+        ('legacy dict-per-row', legacy_fetch),
+        ('columnar (arrow)', columnar_fetch),
+        ('columnar + to_rows', columnar_fetch_to_json_rows),
+    ]
+
+    print("📊 Columnar fetch benchmark")
+    print(f"{'rows':>10} | {'mode':<22} | {'seconds':>8} | {'rows/s':>12} | {'peak MB':>8}")
+    print('-' * 72)
+
+    for size in sizes:
+        table = build_source_table(size)
+        for name, fn in modes:
+            stats = measure(fn, table)
+            print(f"{size:>10,} | {name:<22} | {stats['seconds']:>8.3f} | "
+                  f"{stats['rows_per_sec']:>12,.0f} | {stats['peak_mb']:>8.1f}")
+        print('-' * 72)
+
+
+if __name__ == '__main__':
+    main()
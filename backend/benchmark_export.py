@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Benchmark: bulk export of enriched tracks as JSON vs chunked CSV vs Parquet
+
+Streams synthetic harvested + writer-credit rows (the shape /api/export/tracks
+writes) and compares:
+  - json:    the whole row list materialized and serialized (how analysts get it today)
+  - orjson:  same, with the fast JSON provider's serializer
+  - csv:     export_pipeline.TrackExporter, chunked CSV
+  - parquet: export_pipeline.TrackExporter, typed Parquet (zstd)
+
+Reports write time, bytes on disk and (with --memory) peak Python + Arrow memory.
+
+Usage: python benchmark_export.py [--rows 1000000] [--memory]
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pyarrow
+
+from export_pipeline import EXPORT_BATCH_ROWS, TrackExporter, export_columns
+from response_encoding import orjson
+
+
+def iter_batches(num_rows, batch_rows=EXPORT_BATCH_ROWS):
+    """Synthetic enriched track rows, one batch (a few harvested playlists) at a time"""
+    rng = random.Random(11)
+    for start in range(0, num_rows, batch_rows):
+        batch = []
+        for i in range(start, min(start + batch_rows, num_rows)):
+            playlist = i // 250
+            writers = [{'name': f"Writer {rng.randrange(20000)}", 'ipi': f"{rng.randrange(10**9):011d}",
+                        'found_as': 'artist'} for _ in range(rng.randint(0, 2))]
+            batch.append({
+                'playlist_id': f"37i9dQZF1DX{playlist:08x}",
+                'playlist_name': f"Playlist {playlist}",
+                'playlist_followers': (playlist * 7919) % 2000000,
+                'track_name': f"Track {i}",
+                'track_artist': f"Artist {rng.randrange(50000)}",
+                'track_added_at': f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:00:00Z",
+                'track_release_date': f"20{rng.randint(10, 25)}-{rng.randint(1, 12):02d}-01",
+                'track_popularity': rng.randint(0, 100),
+                'isrc': f"FR{rng.choice('ABCDEFGH')}{i:09d}",
+                'spotify_link': f"https://open.spotify.com/track/{i:022x}",
+                'total_streams': rng.randrange(10**8) if rng.random() < 0.7 else None,
+                'streams_source': 'luminate',
+                'api_status': rng.choice(['found', 'found_with_credits', 'not_found']),
+                'apple_music_url': f"https://music.apple.com/us/song/{i}",
+                'genre_names': 'Hip-Hop/Rap, Music',
+                'composer_names': ' & '.join(writer['name'] for writer in writers),
+                'composer_count': len(writers),
+                'main_artist_ipi': f"{rng.randrange(10**9):011d}" if rng.random() < 0.5 else None,
+                'writer_ipis': writers,
+                'total_ipis_found': len(writers),
+                'all_ipi_string': ','.join(writer['ipi'] for writer in writers) or None,
+                'writer_search_incomplete': False,
+            })
+        yield batch
+
+
+def run_json(num_rows, directory, dumps):
+    rows = [row for batch in iter_batches(num_rows) for row in batch]
+    path = os.path.join(directory, 'tracks.json')
+    start = time.perf_counter()
+    with open(path, 'wb') as f:
+        f.write(dumps({'success': True, 'tracks': rows}))
+    return time.perf_counter() - start, os.path.getsize(path)
+
+
+def run_export(num_rows, directory, fmt):
+    path = os.path.join(directory, 'tracks.parquet' if fmt == 'parquet' else 'tracks-csv')
+    seconds = 0.0
+    with TrackExporter(path, fmt, export_columns(include_streams=True, include_credits=True)) as exporter:
+        for batch in iter_batches(num_rows):
+            start = time.perf_counter()
+            exporter.write_rows(batch)
+            seconds += time.perf_counter() - start
+        start = time.perf_counter()
+    seconds += time.perf_counter() - start
+    return seconds, exporter.summary()['bytes']
+
+
+METHODS = {
+    'json': lambda n, d: run_json(n, d, lambda obj: json.dumps(obj).encode()),
+    'csv': lambda n, d: run_export(n, d, 'csv'),
+    'parquet': lambda n, d: run_export(n, d, 'parquet'),
+}
+if orjson is not None:
+    METHODS['orjson'] = lambda n, d: run_json(n, d, orjson.dumps)
+
+
+def measure(method, num_rows, memory):
+    directory = tempfile.mkdtemp(prefix='export-bench-')
+    try:
+        gc.collect()
+        pool = pyarrow.default_memory_pool()
+        arrow_before = pool.max_memory()
+        if memory:
+            tracemalloc.start()
+        seconds, size = METHODS[method](num_rows, directory)
+        peak = None
+        if memory:
+            _, python_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            peak = python_peak + max(pool.max_memory() - arrow_before, 0)
+        return seconds, size, peak
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--memory', action='store_true', help='trace peak memory (slows every method down)')
+    args = parser.parse_args()
+
+    print(f"📦 Exporting {args.rows:,} enriched tracks (batches of {EXPORT_BATCH_ROWS:,})\n")
+    print(f"{'method':10s} {'write s':>9s} {'rows/s':>12s} {'MB on disk':>11s} {'peak MB':>9s}")
+    for method in ['json', 'orjson', 'csv', 'parquet']:
+        if method not in METHODS:
+            continue
+        seconds, size, peak = measure(method, args.rows, args.memory)
+        peak_text = f"{peak / 1e6:9.0f}" if peak is not None else f"{'-':>9s}"
+        print(f"{method:10s} {seconds:9.2f} {args.rows / seconds:12,.0f} {size / 1e6:11.1f} {peak_text}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Benchmark: precompiled playlist scoring vs the original per-term checks
+
+Scores synthetic playlist names for every market/genre config with both
+the original calculate_universal_priority / skip-term scan (copied below
+as the reference) and the scorers precompiled by the market registry from
+market_config.json, verifies that priorities and skip decisions are
+identical, and reports the speedup.
+
+Usage: python benchmark_playlist_scoring.py [--names 100000] [--seed 7]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from market_registry import MarketRegistry
+from playlist_scoring import RECENT_TERMS, QUALITY_TERMS, OFFICIAL_TERMS
+
+GENRES = ['Hip-Hop', 'Pop', 'Electronic', 'Rock', 'R&B']
+
+FILLER_WORDS = ['mix', 'vibes', 'playlist', 'songs', 'radio', 'weekend', 'summer', 'club', 'chill',
+                'drive', 'party', 'love', 'music', 'beats', 'anthems', 'classics', '2023', 'tracks']
+
+
+# ----------------------------------------------------------------------------
+# Reference implementation (original nested function in simple_working.py)
+# ----------------------------------------------------------------------------
+def calculate_universal_priority(playlist_name, market, genre, search_query, config):
+    """Universal priority calculation that works for any market/genre"""
+    priority = 0
+    name_lower = playlist_name.lower()
+    
+    # Market-specific boost (highest priority)
+    market_terms = config.get('terms', [])
+    for term in market_terms:
+        if term in name_lower:
+            priority += 20  # Strong boost for market-specific playlists
+    
+    # Genre translation boost (very high priority)
+    genre_translations = config.get('genre_translations', {}).get(genre.lower(), [])
+    for translation in genre_translations:
+        translation_words = translation.split()
+        if all(word in name_lower for word in translation_words):
+            # Balanced priority: mainstream and underground both get good scores
+            if market == 'UK' and genre.lower() == 'electronic':
+                # Give mainstream terms equal priority with underground
+                mainstream_terms = ['uk house', 'uk dance', 'british electronic']
+                underground_terms = ['uk garage', 'uk bass', 'uk bassline']
+                if any(term in translation for term in mainstream_terms):
+                    priority += 15  # Equal priority for mainstream
+                elif any(term in translation for term in underground_terms):
+                    priority += 15  # Equal priority for underground
+                else:
+                    priority += 15
+            else:
+                priority += 15  # Strong boost for local language genre terms
+    
+    # Recency boost
+    current_year = "2025"
+    recent_terms = [current_year, "2024", "new", "fresh", "latest", "now"]
+    if any(term in name_lower for term in recent_terms):
+        priority += 8
+    
+    # Quality indicators boost
+    quality_terms = ["best", "top", "hits", "bangers", "essential", "ultimate", "must hear"]
+    quality_score = sum(3 for term in quality_terms if term in name_lower)
+    priority += min(quality_score, 9)  # Cap quality boost
+    
+    # Official/curated playlist boost
+    official_terms = ["official", "spotify", "curated", "editorial", "new music friday"]
+    if any(term in name_lower for term in official_terms):
+        priority += 8  # Higher boost for official playlists
+    
+    # Mainstream UK dance playlist boost
+    if market == 'UK' and genre.lower() == 'electronic':
+        mainstream_playlist_terms = ["dance hits", "house music", "dance party", "electronic music", "club hits"]
+        if any(term in name_lower for term in mainstream_playlist_terms):
+            priority += 5  # Boost mainstream dance playlists
+    
+    return priority
+
+
+def get_universal_skip_terms(market, genre):
+    """Generate smart skip terms based on market and genre"""
+    # Base terms that are generally irrelevant for music discovery
+    base_skip = ['sleep', 'study', 'meditation', 'yoga', 'ambient', 'white noise', 'rain sounds']
+
+    # Genre-specific filtering
+    genre_skip = []
+    if genre.lower() in ['hip-hop', 'rap']:
+        genre_skip = ['lofi', 'lo-fi', 'jazz', 'classical', 'instrumental', 'beats to study', 'chill beats']
+        # Cross-cultural contamination prevention (unless it's that market)
+        if market not in ['South Korea', 'Korea']:
+            genre_skip.extend(['kpop', 'k-pop', 'korean'])
+        if market not in ['Japan']:
+            genre_skip.extend(['jpop', 'j-pop', 'anime', 'vocaloid'])
+        if market not in ['US', 'USA']:
+            genre_skip.extend(['type beat', 'beats for sale'])
+
+    elif genre.lower() == 'electronic':
+        genre_skip = ['acoustic', 'unplugged', 'live session', 'classical']
+        # For UK electronic, be less aggressive with filtering to allow mainstream dance
+        if market == 'UK':
+            genre_skip.extend(['ambient', 'meditation', 'sleep'])  # Keep mainstream dance/house
+        else:
+            if market not in ['Netherlands', 'Belgium']:
+                genre_skip.extend(['tomorrowland'])
+            if market not in ['UK', 'Britain']:
+                genre_skip.extend(['ministry of sound'])
+
+    elif genre.lower() == 'pop':
+        genre_skip = ['death metal', 'black metal', 'hardcore punk', 'grindcore']
+
+    elif genre.lower() == 'rock':
+        genre_skip = ['top 40', 'dance hits', 'club music']
+
+    # Add workout/generic playlists that dilute results
+    generic_skip = ['workout', 'gym', 'running', 'car music', 'party mix', 'wedding']
+
+    return base_skip + genre_skip + generic_skip
+
+
+def reference_should_skip(playlist_name, skip_terms):
+    name_lower = playlist_name.lower()
+    return any(term in name_lower for term in skip_terms)
+
+
+def synthetic_names(count, market_config, seed):
+    """Playlist names mixing market terms, translations, boost and skip terms"""
+    rng = random.Random(seed)
+    vocabulary = list(FILLER_WORDS) + RECENT_TERMS + QUALITY_TERMS + OFFICIAL_TERMS
+    for market, config in market_config.items():
+        vocabulary.extend(config['terms'])
+        for translations in config['genre_translations'].values():
+            vocabulary.extend(translations)
+        for terms in config.get('boost_terms', {}).values():
+            vocabulary.extend(terms)
+    for genre in GENRES:
+        for market in market_config:
+            vocabulary.extend(get_universal_skip_terms(market, genre))
+    vocabulary = sorted(set(vocabulary))
+
+    names = []
+    for _ in range(count):
+        words = rng.sample(vocabulary, rng.randint(1, 5))
+        name = ' '.join(words)
+        names.append(name.title() if rng.random() < 0.5 else name.upper() if rng.random() < 0.2 else name)
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Playlist scoring benchmark')
+    parser.add_argument('--names', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    registry = MarketRegistry().current()
+    market_config = {name: config for name, config in registry.markets.items() if config.get('discovery', True)}
+    names = synthetic_names(args.names, market_config, args.seed)
+    print(f"🧪 {len(names):,} synthetic playlist names, {len(market_config)} markets x {len(GENRES)} genres")
+
+    # Full equivalence check on a sample for every market/genre
+    sample = names[:5000]
+    mismatches = 0
+    for market, config in market_config.items():
+        for genre in GENRES:
+            scorer = registry.scorer(market, genre)
+            skip_terms = get_universal_skip_terms(market, genre)
+            for name, (priority, skip) in zip(sample, scorer.score_batch(sample)):
+                expected = (calculate_universal_priority(name, market, genre, '', config),
+                            reference_should_skip(name, skip_terms))
+                if (priority, skip) != expected:
+                    mismatches += 1
+                    if mismatches <= 5:
+                        print(f"   ❌ {market}/{genre} {name!r}: got {(priority, skip)}, expected {expected}")
+    print(f"{'✅' if not mismatches else '❌'} Equivalence: {mismatches} mismatches "
+          f"({len(sample) * len(market_config) * len(GENRES):,} comparisons)")
+
+    print(f"\n{'Market/Genre':<22} {'reference':>10} {'compiled':>10} {'speedup':>8}")
+    for market, genre in [('UK', 'Electronic'), ('France', 'Hip-Hop'), ('Japan', 'Pop')]:
+        config = market_config[market]
+        skip_terms = get_universal_skip_terms(market, genre)
+
+        started = time.perf_counter()
+        reference = [(calculate_universal_priority(name, market, genre, '', config),
+                      reference_should_skip(name, skip_terms)) for name in names]
+        reference_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        compiled = registry.scorer(market, genre).score_batch(names)
+        compiled_seconds = time.perf_counter() - started
+
+        assert reference == compiled, f"{market}/{genre} results differ"
+        print(f"{market + '/' + genre:<22} {reference_seconds:>9.3f}s {compiled_seconds:>9.3f}s "
+              f"{reference_seconds / compiled_seconds:>7.1f}x")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark of the profiling SQL on the local DuckDB backend
+
+Generates synthetic Luminate/playlist tables, then times every single-market
+profiling query, the bulk multi-market queries and cached profile reads.
+With --max-seconds it exits non-zero when any query is slower than the
+threshold, so it can be used as a regression check in CI.
+
+Usage: python benchmark_profiling_local.py [--recordings 200000] [--markets France,UK,Germany]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from local_profiling_service import LocalProfilingService
+from profiling_queries import (
+    convert_market_to_code, get_summary_stats_query, get_playlist_performance_query,
+    get_most_common_playlists_query, get_timing_analysis_query, get_seasonality_query
+)
+
+SINGLE_QUERIES = [
+    ("Summary Statistics", get_summary_stats_query),
+    ("Playlist Performance", get_playlist_performance_query),
+    ("Most Common Playlists", get_most_common_playlists_query),
+    ("Timing Analysis", get_timing_analysis_query),
+    ("Seasonality", get_seasonality_query),
+]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--recordings', type=int, default=200000)
+    parser.add_argument('--months', type=int, default=24)
+    parser.add_argument('--markets', default='France,UK,Germany,Spain,US,Japan')
+    parser.add_argument('--genre', default='Hip-Hop')
+    parser.add_argument('--max-seconds', type=float, default=None,
+                        help='Fail if any single query exceeds this many seconds')
+    args = parser.parse_args()
+    markets = args.markets.split(',')
+
+    service = LocalProfilingService()
+    print(f"🧪 Generating synthetic data ({args.recordings:,} recordings, {args.months} months)...")
+    counts = service.load_synthetic_data(recordings=args.recordings, months=args.months)
+    for table, count in counts.items():
+        print(f"   {table}: {count:,}")
+
+    slow = []
+    print(f"\n📊 Single-market queries ({markets[0]} - {args.genre})")
+    market_code = convert_market_to_code(markets[0])
+    for query_name, builder in SINGLE_QUERIES:
+        rows, seconds = timed(lambda: service._execute_query_columnar(builder(market_code, args.genre), query_name))
+        print(f"   {query_name:<24} {seconds:>7.3f}s  {len(rows):>6} rows")
+        if args.max_seconds and seconds > args.max_seconds:
+            slow.append(query_name)
+
+    service.cache.invalidate()
+    _, sequential = timed(lambda: [service._run_profile(m, args.genre) for m in markets])
+    _, bulk = timed(lambda: list(service.profile_markets_bulk(markets, [args.genre])))
+    _, cached = timed(lambda: [service.profile_market_genre(m, args.genre) for m in markets])
+
+    print(f"\n📊 {len(markets)} markets")
+    print(f"   sequential profiles      {sequential:>7.3f}s")
+    print(f"   bulk set-based profiles  {bulk:>7.3f}s  ({sequential / bulk:.1f}x)")
+    print(f"   cached profile reads     {cached:>7.3f}s")
+
+    if slow:
+        print(f"\n❌ Over {args.max_seconds}s: {', '.join(slow)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
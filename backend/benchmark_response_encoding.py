@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark: JSON encoding and compression of a large /api/playlist-tracks response
+
+Builds a synthetic 50k-track response (the row shape returned by
+/api/playlist-tracks plus writer-credit fields) and compares:
+  - serialization CPU: Flask's previous stdlib provider vs FastJSONProvider (orjson),
+    as row dicts and as the compact {"columns", "rows"} envelope
+  - bytes on the wire: identity, gzip and brotli at the settings the app uses,
+    with the time each compression takes
+
+Usage: python benchmark_response_encoding.py [--tracks 50000] [--repeat 5]
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from response_encoding import (BROTLI_QUALITY, GZIP_LEVEL, FastJSONProvider, brotli, columns_envelope,
+                               orjson)
+
+
+def build_tracks(count):
+    """Rows shaped like harvested + enriched playlist tracks"""
+    rng = random.Random(7)
+    playlists = [(f"37i9dQZF1DX{rng.randrange(16**8):08x}", f"Playlist {i}", rng.randrange(10**6))
+                 for i in range(200)]
+    tracks = []
+    for i in range(count):
+        playlist_id, playlist_name, followers = playlists[i % len(playlists)]
+        tracks.append({
+            "playlist_name": playlist_name,
+            "playlist_id": playlist_id,
+            "playlist_followers": followers,
+            "track_name": f"Track {i} ({rng.choice(['Remix', 'Live', 'Edit', 'Original Mix'])})",
+            "track_artist": ", ".join(f"Artist {rng.randrange(5000)}" for _ in range(rng.randint(1, 3))),
+            "track_added_at": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T12:00:00Z",
+            "track_release_date": f"20{rng.randint(10, 25)}-{rng.randint(1, 12):02d}-01",
+            "track_popularity": rng.randint(0, 100),
+            "isrc": f"FR{rng.choice('ABCDEFGH')}{rng.randrange(10**9):09d}",
+            "spotify_link": f"https://open.spotify.com/track/{rng.randrange(16**22):022x}",
+            "api_status": rng.choice(['found', 'found_with_credits', 'not_found']),
+            "main_artist_ipi": str(rng.randrange(10**9, 10**10)) if rng.random() < 0.5 else None,
+            "total_ipis_found": rng.randint(0, 3),
+        })
+    return {'success': True, 'total_tracks': count, 'partial': False, 'incomplete_playlists': [],
+            'unavailable_playlists': [], 'tracks': tracks}
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tracks', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    stdlib = DefaultJSONProvider(app)
+    fast = FastJSONProvider(app)
+    payload = build_tracks(args.tracks)
+    compact = dict(payload, tracks=columns_envelope(payload['tracks']))
+
+    print(f"📦 {args.tracks} tracks, best of {args.repeat} (orjson {'on' if orjson else 'NOT INSTALLED'}, "
+          f"brotli {'on' if brotli else 'NOT INSTALLED'})\n")
+    print(f"{'encoding':42s} {'serialize ms':>13s} {'bytes':>12s}")
+
+    bodies = {}
+    for label, encode in [
+        # Compact separators, as the previous provider's response() used outside debug mode
+        ('stdlib json, rows (previous)', lambda: stdlib.dumps(payload, separators=(',', ':')).encode()),
+        ('orjson, rows', lambda: fast.dumps(payload).encode()),
+        ('orjson, columns envelope', lambda: fast.dumps(compact).encode()),
+    ]:
+        body, seconds = timed(encode, args.repeat)
+        bodies[label] = body
+        print(f"{label:42s} {seconds * 1000:13.1f} {len(body):12,d}")
+
+    # Sanity check: every variant carries the same data
+    assert json.loads(bodies['orjson, rows']) == json.loads(bodies['stdlib json, rows (previous)'])
+    envelope = json.loads(bodies['orjson, columns envelope'])['tracks']
+    assert [dict(zip(envelope['columns'], row)) for row in envelope['rows']] == payload['tracks']
+
+    print(f"\n{'on the wire':42s} {'compress ms':>13s} {'bytes':>12s} {'vs previous':>12s}")
+    baseline = len(bodies['stdlib json, rows (previous)'])
+    codecs = [('gzip', lambda b: gzip.compress(b, compresslevel=GZIP_LEVEL))]
+    if brotli is not None:
+        codecs.append(('br', lambda b: brotli.compress(b, quality=BROTLI_QUALITY)))
+    for label in ('orjson, rows', 'orjson, columns envelope'):
+        for codec, compress in codecs:
+            compressed, seconds = timed(lambda: compress(bodies[label]), args.repeat)
+            print(f"{label + ' + ' + codec:42s} {seconds * 1000:13.1f} {len(compressed):12,d} "
+                  f"{len(compressed) / baseline:11.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+"""
+Single-flight coalescing of identical concurrent requests
+Callers with the same key share one computation: within a process they wait
+on the leader's flight, and across worker processes (when a lock directory is
+configured) a per-key file lock elects one leader whose result is handed to
+the waiting workers through a small JSON file next to the lock.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from query_guardrails import QueryCancelled, current_query_guard
+
+try:
+    import fcntl  # cross-process leader lock (not available on Windows)
+except ImportError:
+    fcntl = None
+
+# Shared lock / result directory for all workers (unset = coalesce within the process only)
+COALESCE_DIR = os.getenv('COALESCE_DIR')
+
+# Longest a follower waits for another worker's leader before computing itself
+COALESCE_WAIT_SECONDS = int(os.getenv('COALESCE_WAIT_SECONDS', '180'))
+LOCK_POLL_SECONDS = 0.05
+# How often a waiting caller checks its own request's QueryGuard (deadline / disconnect)
+WAIT_POLL_SECONDS = 0.25
+
+
+class _Flight:
+    """One in-progress computation that other callers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class RequestCoalescer:
+    """Thread- and process-level single-flight keyed by normalized request keys"""
+
+    def __init__(self, lock_dir=COALESCE_DIR, dumps=json.dumps, loads=json.loads,
+                 wait_seconds=COALESCE_WAIT_SECONDS):
+        """
+        Args:
+            lock_dir: Directory shared by the worker processes; None coalesces in-process only
+            dumps: Serializer for results handed to other workers (e.g. app.json.dumps)
+            loads: Matching deserializer
+            wait_seconds: Longest wait on another worker before computing locally
+        """
+        self.lock_dir = lock_dir if fcntl is not None else None
+        self.dumps = dumps
+        self.loads = loads
+        self.wait_seconds = wait_seconds
+        self.logger = logging.getLogger(__name__)
+        self._inflight = {}  # key -> _Flight
+        self._lock = threading.Lock()
+        self.stats = {'leaders': 0, 'coalesced': 0, 'recomputed': 0, 'coalesced_remote': 0, 'remote_timeouts': 0,
+                      'errors': 0}
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    def reopen(self):
+        """Fresh lock and flights after fork (inherited waiters belong to the parent)"""
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def run(self, key, compute):
+        """
+        Return compute() for key, sharing one computation among concurrent callers
+
+        Args:
+            key: Hashable, JSON-serializable request key (already normalized)
+            compute: callable() -> result
+
+        Raises:
+            Whatever compute raised, for the leader and the callers waiting on it
+            (except QueryCancelled: the leader's cancellation belongs to its own
+            request, so waiters run compute again under theirs). QueryCancelled
+            when the caller's own guard is cancelled while it waits.
+        """
+        while True:
+            with self._lock:
+                flight = self._inflight.get(key)
+                leader = flight is None
+                if leader:
+                    flight = _Flight()
+                    self._inflight[key] = flight
+                else:
+                    self.stats['coalesced'] += 1
+
+            if leader:
+                break
+            self._wait_for_flight(flight)
+            if isinstance(flight.error, QueryCancelled):
+                self.stats['recomputed'] += 1
+                continue
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = self._run_shared(key, compute) if self.lock_dir else self._lead(compute)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            self.stats['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    @staticmethod
+    def _wait_for_flight(flight):
+        guard = current_query_guard()
+        while not flight.done.wait(WAIT_POLL_SECONDS):
+            guard.raise_if_cancelled('coalesced wait')
+
+    def _lead(self, compute):
+        self.stats['leaders'] += 1
+        return compute()
+
+    def _paths(self, key):
+        digest = hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()[:20]
+        base = os.path.join(self.lock_dir, digest)
+        return base + '.lock', base + '.json'
+
+    def _run_shared(self, key, compute):
+        """Elect one leader across workers with a per-key file lock"""
+        lock_path, result_path = self._paths(key)
+        waiting_since = time.time()
+        with open(lock_path, 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                # Another worker is computing this key: wait for it and take its result
+                if self._wait_for_lock(lock_file):
+                    shared = self._read_result(result_path, waiting_since)
+                    if shared is not None:
+                        self.stats['coalesced_remote'] += 1
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+                        return shared[0]
+                else:
+                    self.stats['remote_timeouts'] += 1
+                    self.logger.warning(f"⚠️ Coalescing wait timed out for {key}, computing locally")
+                    return self._lead(compute)
+
+            try:
+                value = self._lead(compute)
+                self._write_result(result_path, value)
+                return value
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _wait_for_lock(self, lock_file):
+        """True once the lock is ours, False after wait_seconds; QueryCancelled if our request is"""
+        guard = current_query_guard()
+        deadline = time.monotonic() + self.wait_seconds
+        while time.monotonic() < deadline:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except OSError:
+                guard.raise_if_cancelled('coalesced wait')
+                time.sleep(LOCK_POLL_SECONDS)
+        return False
+
+    def _write_result(self, result_path, value):
+        try:
+            temp_path = f"{result_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w') as f:
+                f.write(json.dumps({'written_at': time.time(), 'value': self.dumps(value)}))
+            os.replace(temp_path, result_path)
+        except (TypeError, ValueError, OSError) as e:
+            # Unserializable results are still returned, just not shared with other workers
+            self.logger.warning(f"⚠️ Could not share coalesced result: {e}")
+
+    def _read_result(self, result_path, since):
+        """(value,) when the leader finished after since, else None (the leader failed)"""
+        try:
+            with open(result_path) as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if stored['written_at'] < since:
+            return None
+        return (self.loads(stored['value']),)
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, inflight=len(self._inflight), shared=self.lock_dir is not None)
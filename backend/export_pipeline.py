@@ -0,0 +1,314 @@
+"""
+Bulk export of harvested tracks and writer-credit enrichments
+Track rows are streamed into typed Parquet (one row group per batch) or
+chunked CSV files on local disk instead of being copied out of JSON
+responses. Rows are buffered only up to one batch, so memory stays bounded
+however many playlists are exported.
+"""
+
+import csv
+import os
+import secrets
+import shutil
+import time
+
+from query_results import _arrow
+
+EXPORT_DIR = os.getenv('EXPORT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'exports'))
+
+# Rows buffered before a batch is written (one Parquet row group / CSV write)
+EXPORT_BATCH_ROWS = int(os.getenv('EXPORT_BATCH_ROWS', '50000'))
+
+# CSV output is split into part files of at most this many rows
+CSV_CHUNK_ROWS = int(os.getenv('EXPORT_CSV_CHUNK_ROWS', '1000000'))
+
+PARQUET_COMPRESSION = os.getenv('EXPORT_PARQUET_COMPRESSION', 'zstd')
+
+FORMATS = ('parquet', 'csv')
+
+# (column, type) per export; IPIs and ISRCs stay strings (leading zeros are significant)
+TRACK_COLUMNS = [
+    ('playlist_id', 'string'),
+    ('playlist_name', 'string'),
+    ('playlist_followers', 'int64'),
+    ('track_name', 'string'),
+    ('track_artist', 'string'),
+    ('track_added_at', 'timestamp'),
+    ('track_release_date', 'string'),  # Spotify precision varies: YYYY, YYYY-MM or YYYY-MM-DD
+    ('track_popularity', 'int16'),
+    ('isrc', 'string'),
+    ('spotify_link', 'string'),
+]
+
+STREAMS_COLUMNS = [
+    ('total_streams', 'int64'),
+    ('streams_source', 'string'),
+]
+
+CREDIT_COLUMNS = [
+    ('api_status', 'string'),
+    ('apple_music_url', 'string'),
+    ('genre_names', 'string'),
+    ('composer_names', 'string'),
+    ('composer_count', 'int16'),
+    ('main_artist_ipi', 'string'),
+    ('writer_ipis', 'writer_ipis'),
+    ('total_ipis_found', 'int16'),
+    ('all_ipi_string', 'string'),
+    ('writer_search_incomplete', 'bool_'),
+]
+
+
+def export_columns(include_streams=False, include_credits=False):
+    """Typed columns for an export of harvested tracks, optionally with streams and credits"""
+    return TRACK_COLUMNS + (STREAMS_COLUMNS if include_streams else []) + (CREDIT_COLUMNS if include_credits else [])
+
+
+def parquet_available():
+    return _arrow() is not None
+
+
+def format_writer_ipis(writers):
+    """writer_ipis as one CSV cell: "Name (IPI); Name (IPI)" """
+    return '; '.join(f"{writer.get('name')} ({writer.get('ipi')})" for writer in writers or []) or None
+
+
+def _arrow_type(pa, kind, flat):
+    if kind == 'timestamp':
+        return pa.timestamp('s', tz='UTC')
+    if kind == 'writer_ipis':
+        if flat:
+            return pa.string()
+        return pa.list_(pa.struct([('name', pa.string()), ('ipi', pa.string()), ('found_as', pa.string())]))
+    return getattr(pa, kind)()
+
+
+def _int_or_none(value):
+    try:
+        return int(value) if value is not None and value != '' else None
+    except (TypeError, ValueError):
+        return None
+
+
+def build_table(rows, columns, flat=False):
+    """
+    Typed pyarrow.Table for one batch of row dicts
+
+    flat=True turns nested columns into strings for CSV. Values that do not
+    fit their column's type become null instead of failing the export.
+    """
+    pa = _arrow()
+    types = {name: _arrow_type(pa, kind, flat) for name, kind in columns}
+    # Arrow converts the dicts in one pass; timestamps arrive as ISO strings and are cast after
+    direct = [(name, kind) for name, kind in columns if not (flat and kind == 'writer_ipis')]
+    source = pa.struct([(name, pa.string() if kind == 'timestamp' else types[name]) for name, kind in direct])
+    try:
+        converted = pa.Table.from_struct_array(pa.array(rows, type=source))
+        arrays = {name: converted.column(name) for name, _ in direct}
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+        # Some value does not fit its column's type: coerce column by column
+        arrays = {name: _coerce_column(pa, [row.get(name) for row in rows], kind, source.field(name).type)
+                  for name, kind in direct}
+
+    for name, kind in columns:
+        if kind == 'timestamp':
+            arrays[name] = _cast_timestamps(pa, arrays[name], types[name])
+        elif flat and kind == 'writer_ipis':
+            arrays[name] = pa.array([format_writer_ipis(row.get(name)) for row in rows], type=types[name])
+    return pa.Table.from_arrays([arrays[name] for name, _ in columns],
+                                schema=pa.schema([(name, types[name]) for name, _ in columns]))
+
+
+def _coerce_column(pa, values, kind, arrow_type):
+    if kind.startswith('int'):
+        return pa.array([_int_or_none(value) for value in values], type=arrow_type)
+    if kind == 'bool_':
+        return pa.array([bool(value) if value is not None else None for value in values], type=arrow_type)
+    if kind == 'writer_ipis':
+        return pa.array([value if isinstance(value, list) else None for value in values], type=arrow_type)
+    return pa.array([str(value) if value else None for value in values], type=arrow_type)
+
+
+def _cast_timestamps(pa, array, arrow_type):
+    try:
+        return array.cast(arrow_type)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return pa.array([_parse_timestamp(pa, value, arrow_type) for value in array.to_pylist()], type=arrow_type)
+
+
+def _parse_timestamp(pa, value, arrow_type):
+    if not value:
+        return None
+    try:
+        return pa.scalar(value).cast(arrow_type).as_py()
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return None
+
+
+def new_export_path(fmt, prefix='tracks', directory=None):
+    """Fresh output path under EXPORT_DIR (a .parquet file, or a directory of CSV parts)"""
+    directory = directory or EXPORT_DIR
+    os.makedirs(directory, exist_ok=True)
+    name = f"{prefix}-{time.strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(3)}"
+    return os.path.join(directory, name + ('.parquet' if fmt == 'parquet' else '-csv'))
+
+
+class TrackExporter:
+    """
+    Buffered writer of track rows to Parquet or chunked CSV
+
+    Use as a context manager: rows are written with write_rows() and the
+    output is finalized on exit (or removed when the block raised).
+    """
+
+    def __init__(self, path, fmt='parquet', columns=None, batch_rows=EXPORT_BATCH_ROWS,
+                 csv_chunk_rows=CSV_CHUNK_ROWS):
+        """
+        Args:
+            path: Output .parquet file, or a directory for CSV part files
+            fmt: 'parquet' (requires pyarrow) or 'csv'
+            columns: [(name, type)] from export_columns(); defaults to the harvested track columns
+            batch_rows: Rows buffered per write
+            csv_chunk_rows: Rows per CSV part file
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}")
+        if fmt == 'parquet' and not parquet_available():
+            raise RuntimeError('Parquet export requires pyarrow')
+        self.path = path
+        self.fmt = fmt
+        self.columns = columns or TRACK_COLUMNS
+        self.batch_rows = batch_rows
+        self.csv_chunk_rows = csv_chunk_rows
+        self.files = []
+        self.rows_written = 0
+        self._buffer = []
+        self._writer = None
+        self._part = None  # open CSV part file
+        self._part_rows = 0
+        self._started = time.time()
+        if fmt == 'csv':
+            os.makedirs(path, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def write_rows(self, rows):
+        self._buffer.extend(rows)
+        while len(self._buffer) >= self.batch_rows:
+            batch, self._buffer = self._buffer[:self.batch_rows], self._buffer[self.batch_rows:]
+            self._write_batch(batch)
+
+    def _write_batch(self, rows):
+        if not rows:
+            return
+        if self.fmt == 'parquet':
+            self._write_parquet(rows)
+        else:
+            # A batch that crosses the chunk size is split between two part files
+            while rows:
+                if self._part is None or self._part_rows >= self.csv_chunk_rows:
+                    self._open_part()
+                room = self.csv_chunk_rows - self._part_rows
+                self._write_csv(rows[:room])
+                rows = rows[room:]
+
+    def _write_parquet(self, rows):
+        import pyarrow.parquet as pq
+        table = build_table(rows, self.columns)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, table.schema, compression=PARQUET_COMPRESSION)
+            self.files.append(self.path)
+        self._writer.write_table(table)
+        self.rows_written += len(rows)
+
+    def _write_csv(self, rows):
+        if parquet_available():
+            import pyarrow.csv as pacsv
+            table = build_table(rows, self.columns, flat=True)
+            if self._writer is None:
+                self._writer = pacsv.CSVWriter(self._part, table.schema)
+            self._writer.write_table(table)
+        else:
+            # stdlib fallback: same columns, nested values flattened the same way
+            writer = csv.writer(self._part)
+            for row in rows:
+                writer.writerow([format_writer_ipis(row.get(name)) if kind == 'writer_ipis' else row.get(name)
+                                 for name, kind in self.columns])
+        self._part_rows += len(rows)
+        self.rows_written += len(rows)
+
+    def _open_part(self):
+        self._close_part()
+        part_path = os.path.join(self.path, f"part-{len(self.files) + 1:05d}.csv")
+        self.files.append(part_path)
+        if parquet_available():
+            self._part = open(part_path, 'wb')
+        else:
+            self._part = open(part_path, 'w', newline='', encoding='utf-8')
+            csv.writer(self._part).writerow([name for name, _ in self.columns])
+        self._part_rows = 0
+
+    def _close_part(self):
+        if self._writer is not None and self.fmt == 'csv':
+            self._writer.close()
+            self._writer = None
+        if self._part is not None:
+            self._part.close()
+            self._part = None
+
+    def close(self):
+        """Write the last partial batch and finalize the files; returns the export summary"""
+        self._write_batch(self._buffer)
+        self._buffer = []
+        if self.fmt == 'parquet':
+            if self._writer is None:
+                # Nothing exported: still produce a valid, empty file with the schema
+                self._write_parquet([])
+            self._writer.close()
+            self._writer = None
+        else:
+            if self._part is None:
+                self._open_part()
+            self._close_part()
+        return self.summary()
+
+    def abort(self):
+        """Close and delete partial output"""
+        try:
+            if self.fmt == 'parquet' and self._writer is not None:
+                self._writer.close()
+            self._close_part()
+        finally:
+            self._writer = None
+            if os.path.isdir(self.path):
+                shutil.rmtree(self.path, ignore_errors=True)
+            elif os.path.exists(self.path):
+                os.remove(self.path)
+
+    def summary(self):
+        return {
+            'format': self.fmt,
+            'path': self.path,
+            'files': list(self.files),
+            'rows': self.rows_written,
+            'bytes': sum(os.path.getsize(path) for path in self.files if os.path.exists(path)),
+            'columns': [name for name, _ in self.columns],
+            'elapsed_seconds': round(time.time() - self._started, 2),
+        }
+
+
+def export_rows(batches, path, fmt='parquet', columns=None, **kwargs):
+    """Write every batch of row dicts to path; returns the export summary"""
+    with TrackExporter(path, fmt, columns, **kwargs) as exporter:
+        for rows in batches:
+            exporter.write_rows(rows)
+    return exporter.summary()
+
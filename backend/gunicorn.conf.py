@@ -0,0 +1,64 @@
+"""
+Gunicorn configuration for the music intelligence backend
+Threaded workers (gthread) so streaming enrichment and Spotify/Apple calls
+overlap inside each process. Shared state (Spotify token, market registry) is
+loaded once in the master and inherited by every worker; each worker then
+reopens its own SQLite / Snowflake connections and event loop after fork.
+On SIGTERM a worker stops accepting, reports not-ready on /readyz and keeps
+serving in-flight requests (including NDJSON streams) for up to
+graceful_timeout seconds.
+"""
+
+import os
+import tempfile
+
+_backend_dir = os.path.dirname(os.path.abspath(__file__))
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5001')}"
+workers = int(os.getenv('WEB_CONCURRENCY', str(min(os.cpu_count() or 1, 4) + 1)))
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+worker_class = 'gthread'
+chdir = _backend_dir
+
+# Streams of large enrichments can run for minutes between worker heartbeats
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '300'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '120'))
+keepalive = 5
+
+# DuckDB connections cannot be shared across fork, so the local backend loads per worker
+preload_app = os.getenv('GUNICORN_PRELOAD', '0' if os.getenv('PROFILING_BACKEND', 'mock').lower() == 'local' else '1') == '1'
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+# Discovery results shared by all workers; one worker (the lock holder) pre-warms them.
+# Identical in-flight /api/analyze and /api/profile requests are coalesced across workers,
+# and outbound Spotify / Apple Music calls share one rate budget.
+os.environ.setdefault('DISCOVERY_STORE_PATH', os.path.join(_backend_dir, 'discovery_store.sqlite3'))
+os.environ.setdefault('RATE_GOVERNOR_PATH', os.path.join(tempfile.gettempdir(), 'music-intelligence-rate.sqlite3'))
+os.environ.setdefault('COALESCE_DIR', os.path.join(tempfile.gettempdir(), 'music-intelligence-coalesce'))
+os.environ.setdefault('PREWARM_LEADER_LOCK', os.path.join(tempfile.gettempdir(), 'music-intelligence-prewarm.lock'))
+
+
+def when_ready(server):
+    if preload_app:
+        import simple_working
+        simple_working.preload_shared_state()
+    server.log.info(f"🚀 Serving on {bind} with {workers} workers x {threads} threads (preload={preload_app})")
+
+
+def post_fork(server, worker):
+    import simple_working
+    simple_working.after_fork(worker)
+
+
+def worker_int(worker):
+    # Ctrl-C / SIGINT: stop the pre-warm thread before the worker exits
+    import simple_working
+    simple_working.prewarmer.stop()
+
+
+def worker_exit(server, worker):
+    import simple_working
+    simple_working.prewarmer.stop()
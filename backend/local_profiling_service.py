@@ -0,0 +1,103 @@
+"""
+Local profiling backend running the real profiling SQL on embedded DuckDB
+Lets us test and benchmark profiling_queries.py (query shapes, bulk
+rollups, caching, guardrails) without a Snowflake account.
+"""
+
+import os
+import threading
+import time
+
+import duckdb
+
+from profiling_service import ProfilingService
+from query_guardrails import POLL_INTERVAL_SECONDS, QueryCancelled
+from synthetic_data import SCHEMA, generate_synthetic_tables, prepare_catalog
+
+
+class LocalProfilingService(ProfilingService):
+    """ProfilingService backed by a local DuckDB database"""
+
+    def __init__(self, database_path=None, cache=None):
+        """
+        Args:
+            database_path: DuckDB file holding the RIGHTSAPP_INSIGHTS tables
+                           (defaults to LOCAL_PROFILING_DB, else in-memory)
+            cache: Optional shared ProfileCache
+        """
+        self.database_path = database_path or os.getenv('LOCAL_PROFILING_DB', ':memory:')
+        conn = duckdb.connect()
+        prepare_catalog(conn, self.database_path)
+        super().__init__(conn, cache)
+
+    def load_synthetic_data(self, **kwargs):
+        """Generate synthetic Luminate/playlist tables (see synthetic_data.py)"""
+        counts = generate_synthetic_tables(self.conn, **kwargs)
+        self.cache.invalidate()
+        self._data_version = None
+        self.logger.info(f"🧪 Synthetic data loaded: {counts}")
+        return counts
+
+    def has_data(self):
+        tables = self.conn.execute(
+            "SELECT table_name FROM duckdb_tables() WHERE database_name = 'RIGHTSAPP_INSIGHTS'"
+        ).fetchall()
+        return any(name.upper() == 'LUMINATEMONTHLYSTREAMSBYRECORDING' for (name,) in tables)
+
+    def get_data_version(self):
+        """Synthetic data is versioned by its load timestamp"""
+        try:
+            row = self.conn.cursor().execute(
+                f"SELECT loaded_at FROM {SCHEMA}.SYNTHETIC_LOAD_METADATA"
+            ).fetchone()
+            version = row[0] if row else 'empty'
+        except duckdb.Error:
+            version = 'external'
+        if self._data_version is not None and version != self._data_version:
+            self.cache.invalidate(lambda key: key[2] != version)
+        self._data_version = version
+        return version
+
+    def _run_statement(self, cursor, query, query_name, guard):
+        """Execute on DuckDB with a watchdog that interrupts on timeout/cancel"""
+        timeout = guard.timeout_for(query_name)
+        if timeout <= 0:
+            raise QueryCancelled(f"{query_name}: request deadline exceeded")
+
+        deadline = time.monotonic() + timeout
+        finished = threading.Event()
+        interrupted = []
+
+        def watchdog():
+            while not finished.wait(POLL_INTERVAL_SECONDS):
+                if guard.cancelled or time.monotonic() >= deadline:
+                    interrupted.append(guard.reason or f"timed out after {timeout:.0f}s")
+                    cursor.interrupt()
+                    return
+
+        watcher = threading.Thread(target=watchdog, daemon=True)
+        watcher.start()
+        try:
+            cursor.execute(query)
+        except duckdb.InterruptException:
+            raise QueryCancelled(f"{query_name}: {interrupted[0] if interrupted else 'interrupted'}")
+        finally:
+            finished.set()
+        return None
+
+    def _record_query_cost(self, query_name, query_id, started):
+        # No query history locally: record elapsed time only
+        elapsed_ms = int((time.monotonic() - started) * 1000)
+        self.cost_tracker.record(query_name, query_id, None, elapsed_ms)
+
+    def test_connection(self):
+        try:
+            self.conn.execute("SELECT 1").fetchone()
+            return {
+                'status': 'success',
+                'message': 'Local DuckDB profiling backend',
+                'database': self.database_path,
+                'has_data': self.has_data()
+            }
+        except Exception as e:
+            return {'status': 'error', 'message': f'Connection failed: {e}'}
@@ -0,0 +1,236 @@
+"""
+Market / genre registry shared by playlist discovery and profiling
+Loads market_config.json once, precomputes search-query lists, skip-term
+sets and compiled playlist scorers per (market, genre), and swaps in a new
+snapshot when the file changes on disk (no restart needed).
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+from playlist_scoring import PlaylistScorer
+
+MARKET_CONFIG_PATH = os.getenv(
+    'MARKET_CONFIG_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'market_config.json')
+)
+
+# Check the file's mtime at most this often
+RELOAD_CHECK_SECONDS = int(os.getenv('MARKET_CONFIG_RELOAD_CHECK_SECONDS', '5'))
+
+# Search queries sent to Spotify per discovery request
+MAX_SEARCH_QUERIES = 10
+
+
+class MarketConfigError(ValueError):
+    """market_config.json is missing or malformed"""
+
+
+class MarketSnapshot:
+    """Immutable view of one version of market_config.json with derived structures"""
+
+    def __init__(self, data, loaded_from=None, mtime=None):
+        self.loaded_from = loaded_from
+        self.mtime = mtime
+        self.config_version = data.get('version')
+        self.markets = {}  # market name -> market config
+        self.codes = {}  # market name or alias -> territory code
+        self._canonical = {}  # market name or alias -> market name
+        self._skip_rules = data.get('skip_rules', {})
+        self._search_queries = {}  # (market, genre_lower) -> [query]
+        self._skip_terms = {}  # (market, genre_lower) -> frozenset of terms
+        self._scorers = {}  # (market, genre_lower) -> PlaylistScorer
+        self._lock = threading.Lock()
+
+        for name, market in data.get('markets', {}).items():
+            if not market.get('code'):
+                raise MarketConfigError(f"Market '{name}' has no code")
+            self.markets[name] = market
+            for key in [name] + list(market.get('aliases', [])):
+                self.codes[key] = market['code']
+                self._canonical[key] = name
+
+        # Precompile every configured discovery market x genre
+        genres = set(self._skip_rules.get('genres', {}))
+        for market in self.markets.values():
+            genres.update(market.get('genre_translations', {}))
+        for name, market in self.markets.items():
+            if market.get('discovery', True):
+                for genre in genres:
+                    self._build(name, genre)
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+    def market_code(self, market_name):
+        """Territory code for a market name or alias (unknown names pass through)"""
+        return self.codes.get(market_name, market_name)
+
+    def market_config(self, market_name):
+        """Config for a market name or alias, with a generic fallback for unknown markets"""
+        name = self._canonical.get(market_name)
+        if name is None:
+            return {'code': market_name, 'aliases': [], 'terms': [market_name.lower()], 'genre_translations': {}}
+        return self.markets[name]
+
+    def canonical_name(self, market_name):
+        return self._canonical.get(market_name, market_name)
+
+    def search_queries(self, market_name, genre):
+        """Spotify search queries for discovery, most specific first"""
+        return self._derived(market_name, genre)[0]
+
+    def skip_terms(self, market_name, genre):
+        return self._derived(market_name, genre)[1]
+
+    def scorer(self, market_name, genre):
+        """Compiled PlaylistScorer for (market, genre)"""
+        return self._derived(market_name, genre)[2]
+
+    def _derived(self, market_name, genre):
+        key = (self.canonical_name(market_name), genre.lower())
+        if key not in self._scorers:
+            # Markets / genres outside the config are compiled on first use
+            with self._lock:
+                if key not in self._scorers:
+                    self._build(*key)
+        return self._search_queries[key], self._skip_terms[key], self._scorers[key]
+
+    def _build(self, market_name, genre_lower):
+        key = (market_name, genre_lower)
+        config = self.market_config(market_name)
+        code = config['code']
+        translations = config.get('genre_translations', {}).get(genre_lower, [])
+
+        # 1. Local language genre terms, 2. market term + genre, 3. code + genre,
+        # 4. market-specific extra searches, 5. generic genre
+        queries = list(translations)
+        queries.extend(f"{term} {genre_lower}" for term in config.get('terms', []))
+        queries.append(f"{code} {genre_lower}")
+        queries.extend(config.get('extra_searches', {}).get(genre_lower, []))
+        queries.append(genre_lower)
+        self._search_queries[key] = queries[:MAX_SEARCH_QUERIES]
+
+        skip_terms = self._evaluate_skip_rules(market_name, genre_lower)
+        self._skip_terms[key] = frozenset(skip_terms)
+        self._scorers[key] = PlaylistScorer(
+            config.get('terms', []), translations, skip_terms,
+            config.get('boost_terms', {}).get(genre_lower, [])
+        )
+
+    def _evaluate_skip_rules(self, market_name, genre_lower):
+        """base + genre rules that apply to the market + generic skip terms"""
+        genre_rules = self._skip_rules.get('genres', {})
+        rules = genre_rules.get(genre_lower, [])
+        if isinstance(rules, str):
+            # Genre alias ("rap": "hip-hop")
+            rules = genre_rules.get(rules, [])
+
+        terms = list(self._skip_rules.get('base', []))
+        for rule in rules:
+            if 'only_markets' in rule and market_name not in rule['only_markets']:
+                continue
+            if market_name in rule.get('except_markets', []):
+                continue
+            terms.extend(rule.get('terms', []))
+        terms.extend(self._skip_rules.get('generic', []))
+        return terms
+
+    def summary(self):
+        return {
+            'config_version': self.config_version,
+            'loaded_from': self.loaded_from,
+            'markets': {name: market['code'] for name, market in self.markets.items()},
+            'compiled_pairs': len(self._scorers),
+        }
+
+
+class MarketRegistry:
+    """Holds the current MarketSnapshot and reloads it when the file changes"""
+
+    def __init__(self, path=MARKET_CONFIG_PATH):
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self._rejected_mtime = None  # mtime of a file that failed to load (not retried until it changes)
+        self.stats = {'loads': 0, 'reloads': 0, 'failed_reloads': 0, 'last_load_seconds': None, 'last_error': None}
+        self._snapshot = self._load()
+
+    def _load(self):
+        started = time.monotonic()
+        try:
+            mtime = os.path.getmtime(self.path)
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            raise MarketConfigError(f"Could not read {self.path}: {e}")
+        snapshot = MarketSnapshot(data, loaded_from=self.path, mtime=mtime)
+        self.stats['loads'] += 1
+        self.stats['last_load_seconds'] = round(time.monotonic() - started, 3)
+        self.logger.info(f"🌍 Market registry: {len(snapshot.markets)} markets, "
+                         f"{len(snapshot._scorers)} compiled market/genre pairs ({self.stats['last_load_seconds']}s)")
+        return snapshot
+
+    def current(self):
+        """Current snapshot, reloading first if the file changed"""
+        now = time.monotonic()
+        if self._checked_at is None or now - self._checked_at >= RELOAD_CHECK_SECONDS:
+            self._checked_at = now
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                mtime = self._snapshot.mtime
+            if mtime not in (self._snapshot.mtime, self._rejected_mtime):
+                self.reload()
+        return self._snapshot
+
+    def reload(self):
+        """
+        Load the file again and swap in the new snapshot
+
+        A broken file keeps the previous snapshot in service.
+
+        Returns:
+            dict: success flag plus the snapshot summary or the error
+        """
+        with self._lock:
+            try:
+                snapshot = self._load()
+            except (MarketConfigError, ValueError, TypeError, AttributeError) as e:
+                try:
+                    self._rejected_mtime = os.path.getmtime(self.path)
+                except OSError:
+                    pass
+                self.stats['failed_reloads'] += 1
+                self.stats['last_error'] = str(e)
+                self.logger.error(f"❌ Market registry reload failed, keeping previous config: {e}")
+                return {'success': False, 'error': str(e)}
+            self._snapshot = snapshot
+            self.stats['reloads'] += 1
+            self.stats['last_error'] = None
+            return {'success': True, **snapshot.summary()}
+
+    def get_stats(self):
+        return dict(self.stats, **self._snapshot.summary())
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_market_registry():
+    """Process-wide registry, loaded on first use"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = MarketRegistry()
+    return _registry
+
+
+def get_markets():
+    """Current MarketSnapshot (hot-reloaded)"""
+    return get_market_registry().current()
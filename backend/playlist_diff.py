@@ -0,0 +1,156 @@
+"""
+Incremental playlist harvests with add / remove diffs
+Uses the snapshot_id and max added_at remembered by the playlist store to
+fetch only what changed since the last harvest: nothing when the snapshot is
+unchanged, only the tail pages when the playlist is appended in date order,
+and a full harvest (diffed against the previous one) otherwise. Tail runs are
+bounded: after TAIL_MAX_RUNS of them, or TAIL_MAX_AGE_SECONDS since the last
+full harvest, the next change is harvested in full again.
+"""
+
+import logging
+import os
+import time
+from collections import Counter
+
+PAGE_SIZE = 100
+
+# A tail run trusts everything before the boundary page unseen, so tail-derived
+# harvests only stand in for a full one this many times / this long
+TAIL_MAX_RUNS = int(os.getenv('PLAYLIST_TAIL_MAX_RUNS', '5'))
+TAIL_MAX_AGE_SECONDS = int(os.getenv('PLAYLIST_TAIL_MAX_AGE_SECONDS', str(7 * 86400)))
+
+logger = logging.getLogger(__name__)
+
+
+def track_key(track):
+    """Identity of a harvested track for diffing"""
+    return track.get('spotify_link') or track.get('isrc') or (track.get('track_name'), track.get('track_artist'))
+
+
+def _is_date_ordered(tracks):
+    added = [track.get('track_added_at') for track in tracks]
+    return all(added) and all(a <= b for a, b in zip(added, added[1:]))
+
+
+def diff_tracks(previous, current):
+    """(added, removed) between two harvests, as multisets of track keys"""
+    before = Counter(track_key(track) for track in previous)
+    after = Counter(track_key(track) for track in current)
+    added_keys = after - before
+    removed_keys = before - after
+
+    def pick(tracks, keys):
+        picked = []
+        for track in tracks:
+            key = track_key(track)
+            if keys[key] > 0:
+                keys[key] -= 1
+                picked.append(track)
+        return picked
+
+    return pick(current, added_keys), pick(previous, removed_keys)
+
+
+def _tail_since(fetch_page, total, max_added_at, stats):
+    """
+    Walk pages backwards from the end collecting tracks added after max_added_at
+
+    Returns:
+        (new_tail, overlap_offset, overlap) - overlap is the part of the page
+        holding the boundary (the last track at or before max_added_at) up to
+        and including it, starting at position overlap_offset; empty if the
+        walk reached the start. None on a failed page.
+    """
+    tail = []
+    offset = max(total - PAGE_SIZE, 0)
+    end = total
+    while end > 0:
+        page = fetch_page(offset, end - offset)
+        stats['pages'] += 1
+        if page is None:
+            return None
+        for position in range(len(page) - 1, -1, -1):
+            track = page[position]
+            if track.get('track_added_at') and track['track_added_at'] <= max_added_at:
+                return page[position + 1:] + tail, offset, page[:position + 1]
+        tail = page + tail
+        end = offset
+        offset = max(offset - PAGE_SIZE, 0)
+    return tail, 0, []
+
+
+def _tail_allowed(previous):
+    """Whether the stored harvest may be extended by a tail run instead of re-harvested"""
+    if not previous['max_added_at'] or not _is_date_ordered(previous['tracks']):
+        return False
+    if previous['full_harvested_at'] is None or previous['tail_runs'] >= TAIL_MAX_RUNS:
+        return False
+    return time.time() - previous['full_harvested_at'] < TAIL_MAX_AGE_SECONDS
+
+
+def harvest_incremental(store, playlist_id, metadata, fetch_page, harvest_full):
+    """
+    Bring a playlist's stored harvest up to date and report what changed
+
+    Args:
+        store: PlaylistStore holding the previous harvest
+        playlist_id: Spotify playlist ID
+        metadata: Current metadata (snapshot_id, track_count) from the store
+        fetch_page: callable(offset, limit) -> list of track dicts, or None on failure
+        harvest_full: callable() -> (tracks, complete)
+
+    Returns:
+        dict: mode ('initial', 'unchanged', 'tail' or 'full'), snapshot ids,
+        added / removed track lists, pages fetched and the track total
+    """
+    stats = {'pages': 0}
+    previous = store.get_harvest(playlist_id)
+    snapshot_id = metadata.get('snapshot_id')
+    result = {
+        'playlist_id': playlist_id,
+        'playlist_name': metadata.get('name'),
+        'snapshot_id': snapshot_id,
+        'previous_snapshot_id': previous['snapshot_id'] if previous else None,
+    }
+
+    if previous is not None and snapshot_id and previous['snapshot_id'] == snapshot_id:
+        return dict(result, mode='unchanged', added=[], removed=[], pages_fetched=0,
+                    total_tracks=len(previous['tracks']))
+
+    tracks = None
+    mode = 'full'
+    if previous is not None and _tail_allowed(previous):
+        total = metadata.get('track_count') or 0
+        walked = _tail_since(fetch_page, total, previous['max_added_at'], stats)
+        if walked is not None:
+            new_tail, overlap_offset, overlap = walked
+            kept = total - len(new_tail)
+            old = previous['tracks']
+            # Append-only change: the count before the new tail matches the old harvest and
+            # the fetched rows of the boundary page are the old tracks at the same positions
+            # (a removal plus an earlier insertion keeps the count but shifts this page)
+            if (kept == len(old) and overlap_offset + len(overlap) == kept
+                    and [track_key(track) for track in overlap]
+                    == [track_key(track) for track in old[overlap_offset:kept]]):
+                tracks = old + new_tail
+                added, removed = new_tail, []
+                mode = 'tail'
+
+    if tracks is None:
+        tracks, complete = harvest_full()
+        stats['pages'] += max((len(tracks) + PAGE_SIZE - 1) // PAGE_SIZE, 1)
+        if not complete:
+            return dict(result, mode='failed', added=[], removed=[], pages_fetched=stats['pages'],
+                        total_tracks=len(tracks))
+        if previous is None:
+            mode = 'initial'
+            added, removed = tracks, []
+        else:
+            added, removed = diff_tracks(previous['tracks'], tracks)
+
+    if snapshot_id:
+        store.put_tracks(playlist_id, snapshot_id, tracks, tail=mode == 'tail')
+    logger.info(f"🔁 Playlist {playlist_id}: {mode}, +{len(added)} / -{len(removed)} ({stats['pages']} pages)")
+    return dict(result, mode=mode, added=added, removed=removed, pages_fetched=stats['pages'],
+                total_tracks=len(tracks))
@@ -0,0 +1,121 @@
+"""
+Precompiled playlist priority scoring for playlist discovery
+Every term the universal priority and skip rules look for is compiled into
+one regex per (market, genre) config, so a playlist name is scanned once
+instead of once per term. Scores are identical to the original
+per-term substring checks. Market terms, skip terms and boost terms come
+from the market registry (market_registry.py).
+"""
+
+import re
+
+# Priority rules (same weights as the original calculate_universal_priority)
+MARKET_TERM_BOOST = 20  # per market term found
+GENRE_TRANSLATION_BOOST = 15  # per genre translation whose words are all found
+RECENT_TERMS = ["2025", "2024", "new", "fresh", "latest", "now"]
+RECENT_BOOST = 8
+QUALITY_TERMS = ["best", "top", "hits", "bangers", "essential", "ultimate", "must hear"]
+QUALITY_POINTS = 3
+QUALITY_CAP = 9
+OFFICIAL_TERMS = ["official", "spotify", "curated", "editorial", "new music friday"]
+OFFICIAL_BOOST = 8
+BOOST_TERMS_BOOST = 5  # market/genre boost_terms from market_config.json (UK electronic dance playlists)
+
+
+def _trie_pattern(words):
+    """Regex matching any of words, factored by common prefix so each position is tried once per branch"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        terminal = '' in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if terminal:
+            return ('(?:' + body + ')?') if len(branches) > 1 or len(body) > 1 else body + '?'
+        return body
+
+    return build(trie)
+
+
+class PlaylistScorer:
+    """Scores and filters playlist names for one (market, genre) config"""
+
+    def __init__(self, market_terms, genre_translations, skip_terms, boost_terms=()):
+        """
+        Args:
+            market_terms: The market's terms
+            genre_translations: The market's translations of the genre
+            skip_terms: Playlist names containing any of these are skipped
+            boost_terms: Terms worth BOOST_TERMS_BOOST for this market/genre
+        """
+        needles = {}  # needle -> bit
+
+        def bit(needle):
+            if needle not in needles:
+                needles[needle] = 1 << len(needles)
+            return needles[needle]
+
+        def any_mask(terms):
+            mask = 0
+            for term in terms:
+                mask |= bit(term)
+            return mask
+
+        self._market_bits = [bit(term) for term in market_terms]
+        self._translation_masks = [any_mask(translation.split()) for translation in genre_translations]
+        self._recent_mask = any_mask(RECENT_TERMS)
+        self._quality_bits = [bit(term) for term in QUALITY_TERMS]
+        self._official_mask = any_mask(OFFICIAL_TERMS)
+        self._boost_mask = any_mask(boost_terms)
+        self._skip_mask = any_mask(skip_terms)
+
+        # The trie pattern is greedy, so the lookahead reports the longest
+        # needle at each position; every shorter needle starting there is one
+        # of its prefixes
+        self._pattern = re.compile('(?=(' + _trie_pattern(needles) + '))')
+        self._closure = {
+            longer: sum(needles[n] for n in needles if longer.startswith(n))
+            for longer in needles
+        }
+
+    def _found_mask(self, name_lower):
+        """Bit mask of every needle that occurs anywhere in the name"""
+        found = 0
+        closure = self._closure
+        for match in self._pattern.finditer(name_lower):
+            found |= closure[match.group(1)]
+        return found
+
+    def score(self, playlist_name):
+        """(priority, should_skip) for one playlist name"""
+        found = self._found_mask((playlist_name or '').lower())
+
+        priority = MARKET_TERM_BOOST * sum(1 for b in self._market_bits if found & b)
+        priority += GENRE_TRANSLATION_BOOST * sum(1 for m in self._translation_masks if found & m == m)
+        if found & self._recent_mask:
+            priority += RECENT_BOOST
+        priority += min(QUALITY_POINTS * sum(1 for b in self._quality_bits if found & b), QUALITY_CAP)
+        if found & self._official_mask:
+            priority += OFFICIAL_BOOST
+        if found & self._boost_mask:
+            priority += BOOST_TERMS_BOOST
+
+        return priority, bool(found & self._skip_mask)
+
+    def score_batch(self, playlist_names):
+        """[(priority, should_skip)] for a batch of playlist names"""
+        return [self.score(name) for name in playlist_names]
+
+
+def select_candidates(scorer, items, limit=60):
+    """[(item, priority)] for the first limit search results that pass the skip rules"""
+    candidates = [item for item in items[:limit] if item]
+    verdicts = scorer.score_batch([item.get("name", "") for item in candidates])
+    return [(item, priority) for item, (priority, should_skip) in zip(candidates, verdicts) if not should_skip]
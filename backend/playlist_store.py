@@ -0,0 +1,334 @@
+"""
+Local playlist metadata store with conditional refresh
+Keeps name, owner, followers, snapshot_id and track count per Spotify
+playlist in SQLite, refreshed in tiers by age (served as-is, revalidated with
+the playlist's ETag, or fully refetched). Harvested tracks are stored with
+the snapshot_id they came from and only re-harvested when it changes.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+
+from coalescing import RequestCoalescer
+from resilience import get_upstreams
+
+PLAYLIST_STORE_PATH = os.getenv(
+    'PLAYLIST_STORE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'playlist_store.sqlite3')
+)
+
+# Refresh tiers by age of the stored metadata:
+#   < FRESH: served without calling Spotify
+#   < MAX_AGE: revalidated with If-None-Match (a 304 costs no payload)
+#   older: refetched unconditionally
+METADATA_FRESH_SECONDS = int(os.getenv('PLAYLIST_METADATA_FRESH_SECONDS', '3600'))
+METADATA_MAX_AGE_SECONDS = int(os.getenv('PLAYLIST_METADATA_MAX_AGE_SECONDS', '86400'))
+
+# Only the fields we keep, so a metadata refresh does not download the first 100 tracks
+METADATA_FIELDS = 'id,name,owner(display_name),followers(total),snapshot_id,tracks(total)'
+
+def playlist_metadata_url(playlist_id):
+    return f"https://api.spotify.com/v1/playlists/{playlist_id}"
+
+
+def format_playlist_track(item, playlist_id, playlist_name, followers):
+    """Flatten one Spotify playlist item into a harvested track row (None for removed/local tracks)"""
+    track = item.get("track")
+    if not track:
+        return None
+
+    return {
+        "playlist_name": playlist_name,
+        "playlist_id": playlist_id,
+        "playlist_followers": followers,
+        "track_name": track.get("name"),
+        "track_artist": ", ".join([a["name"] for a in track.get("artists", [])]),
+        "track_added_at": item.get("added_at"),
+        "track_release_date": track.get("album", {}).get("release_date"),
+        "track_popularity": track.get("popularity"),
+        "isrc": track.get("external_ids", {}).get("isrc"),
+        "spotify_link": track.get("external_urls", {}).get("spotify")
+    }
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS playlists (
+    playlist_id TEXT PRIMARY KEY,
+    name TEXT,
+    owner TEXT,
+    followers INTEGER,
+    snapshot_id TEXT,
+    track_count INTEGER,
+    etag TEXT,
+    fetched_at REAL
+);
+CREATE TABLE IF NOT EXISTS playlist_tracks (
+    playlist_id TEXT PRIMARY KEY,
+    snapshot_id TEXT,
+    tracks_json TEXT,
+    harvested_at REAL,
+    max_added_at TEXT,
+    tail_runs INTEGER DEFAULT 0,
+    full_harvested_at REAL
+);
+"""
+
+
+class PlaylistStore:
+    """SQLite-backed playlist metadata and track cache"""
+
+    def __init__(self, path=PLAYLIST_STORE_PATH):
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        # Concurrent lookups of one playlist (found by several markets' searches) share one fetch
+        self._metadata_flights = RequestCoalescer(lock_dir=None)
+        self._connect()
+        self.stats = {'fresh': 0, 'revalidated': 0, 'not_modified': 0, 'fetched': 0, 'fetch_errors': 0,
+                      'tracks_reused': 0, 'tracks_harvested': 0}
+
+    def _connect(self):
+        # WAL + busy timeout so several worker processes can share one store file
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+        self._conn.row_factory = sqlite3.Row
+        if self.path != ':memory:':
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+
+    def reopen(self):
+        """New connection after fork (SQLite connections must not cross processes)"""
+        self._lock = threading.Lock()
+        self._metadata_flights.reopen()
+        self._connect()
+
+    def _migrate(self):
+        """Add columns introduced after a store file was created"""
+        columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(playlist_tracks)")}
+        if 'max_added_at' not in columns:
+            with self._conn:
+                self._conn.execute("ALTER TABLE playlist_tracks ADD COLUMN max_added_at TEXT")
+        if 'tail_runs' not in columns:
+            # Existing harvests get no full_harvested_at, so their next incremental run is a full one
+            with self._conn:
+                self._conn.execute("ALTER TABLE playlist_tracks ADD COLUMN tail_runs INTEGER DEFAULT 0")
+                self._conn.execute("ALTER TABLE playlist_tracks ADD COLUMN full_harvested_at REAL")
+
+    # ------------------------------------------------------------------
+    # Metadata
+    # ------------------------------------------------------------------
+    def _row(self, playlist_id):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT * FROM playlists WHERE playlist_id = ?", (playlist_id,)
+            ).fetchone()
+
+    def get_metadata(self, playlist_id, token, max_age_seconds=None):
+        """
+        Playlist metadata, refreshed from Spotify according to its age tier
+
+        Args:
+            playlist_id: Spotify playlist ID
+            token: Spotify access token
+            max_age_seconds: Override of METADATA_FRESH_SECONDS (0 forces a revalidation)
+
+        Returns:
+            dict or None: playlist_id, name, owner, followers, snapshot_id,
+            track_count, fetched_at. Stored metadata is returned when Spotify
+            cannot be reached; None when nothing is known about the playlist.
+        """
+        return self._metadata_flights.run(
+            (playlist_id, max_age_seconds), lambda: self._fetch_metadata(playlist_id, token, max_age_seconds)
+        )
+
+    def _fetch_metadata(self, playlist_id, token, max_age_seconds):
+        fresh, conditional_headers, row = self.refresh_plan(playlist_id, max_age_seconds)
+        if fresh is not None:
+            return fresh
+
+        try:
+            response = get_upstreams().get(
+                'spotify',
+                playlist_metadata_url(playlist_id),
+                headers={"Authorization": f"Bearer {token}", **conditional_headers},
+                params={"fields": METADATA_FIELDS}, timeout=15
+            )
+        except requests.RequestException as e:
+            self.logger.warning(f"⚠️ Playlist {playlist_id} metadata fetch failed: {e}")
+            return self.apply_refresh(playlist_id, row, None)
+
+        payload = response.json() if response.status_code == 200 else None
+        return self.apply_refresh(playlist_id, row, response.status_code, payload, response.headers.get('ETag'))
+
+    def refresh_plan(self, playlist_id, max_age_seconds=None):
+        """
+        Decide how to refresh a playlist's metadata (shared with the async client)
+
+        Returns:
+            (fresh, conditional_headers, row): fresh is the stored metadata when
+            it can be served as-is; otherwise conditional_headers holds
+            If-None-Match for rows young enough to revalidate
+        """
+        fresh_seconds = METADATA_FRESH_SECONDS if max_age_seconds is None else max_age_seconds
+        row = self._row(playlist_id)
+        age = time.time() - row['fetched_at'] if row is not None else None
+
+        if row is not None and age < fresh_seconds:
+            self.stats['fresh'] += 1
+            return self._metadata(row), {}, row
+
+        conditional_headers = {}
+        if row is not None and row['etag'] and age < METADATA_MAX_AGE_SECONDS:
+            conditional_headers["If-None-Match"] = row['etag']
+            self.stats['revalidated'] += 1
+        return None, conditional_headers, row
+
+    def apply_refresh(self, playlist_id, row, status_code, payload=None, etag=None):
+        """Store the outcome of a metadata request planned by refresh_plan (status_code None = request failed)"""
+        if status_code == 304 and row is not None:
+            self.stats['not_modified'] += 1
+            with self._lock, self._conn:
+                self._conn.execute("UPDATE playlists SET fetched_at = ? WHERE playlist_id = ?",
+                                   (time.time(), playlist_id))
+            return dict(self._metadata(row), fetched_at=time.time())
+
+        if status_code != 200:
+            self.stats['fetch_errors'] += 1
+            return self._metadata(row) if row is not None else None
+
+        self.stats['fetched'] += 1
+        return self.put_metadata(playlist_id, payload, etag=etag)
+
+    def put_metadata(self, playlist_id, payload, etag=None):
+        """Store metadata from a Spotify playlist object (full or fields-filtered)"""
+        metadata = {
+            'playlist_id': playlist_id,
+            'name': payload.get('name'),
+            'owner': (payload.get('owner') or {}).get('display_name'),
+            'followers': (payload.get('followers') or {}).get('total'),
+            'snapshot_id': payload.get('snapshot_id'),
+            'track_count': (payload.get('tracks') or {}).get('total'),
+            'fetched_at': time.time(),
+        }
+        with self._lock, self._conn:
+            self._conn.execute(
+                """INSERT OR REPLACE INTO playlists
+                   (playlist_id, name, owner, followers, snapshot_id, track_count, etag, fetched_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (playlist_id, metadata['name'], metadata['owner'], metadata['followers'],
+                 metadata['snapshot_id'], metadata['track_count'], etag, metadata['fetched_at'])
+            )
+        return metadata
+
+    @staticmethod
+    def _metadata(row):
+        return {key: row[key] for key in
+                ('playlist_id', 'name', 'owner', 'followers', 'snapshot_id', 'track_count', 'fetched_at')}
+
+    # ------------------------------------------------------------------
+    # Tracks
+    # ------------------------------------------------------------------
+    def get_tracks(self, playlist_id, token, harvest):
+        """
+        Harvested tracks for a playlist, re-harvested only when snapshot_id changed
+
+        Args:
+            playlist_id: Spotify playlist ID
+            token: Spotify access token
+            harvest: callable(metadata) -> (tracks, complete); incomplete
+                     harvests (pagination cut short) are returned but not stored
+
+        Returns:
+            (metadata, tracks, complete): metadata is None (and tracks empty)
+            when the playlist cannot be fetched; complete is False for a cut-short harvest
+        """
+        metadata = self.get_metadata(playlist_id, token)
+        if metadata is None:
+            return None, [], False
+
+        tracks = self.stored_tracks(playlist_id, metadata)
+        if tracks is not None:
+            return metadata, tracks, True
+
+        tracks, complete = harvest(metadata)
+        self.record_harvest(playlist_id, metadata, tracks, complete)
+        return metadata, tracks, complete
+
+    def stored_tracks(self, playlist_id, metadata):
+        """Stored tracks when they were harvested from metadata's snapshot_id, else None"""
+        with self._lock:
+            stored = self._conn.execute(
+                "SELECT snapshot_id, tracks_json FROM playlist_tracks WHERE playlist_id = ?", (playlist_id,)
+            ).fetchone()
+
+        if stored is None or not metadata['snapshot_id'] or stored['snapshot_id'] != metadata['snapshot_id']:
+            return None
+        self.stats['tracks_reused'] += 1
+        tracks = json.loads(stored['tracks_json'])
+        # Contents are unchanged but follower counts move independently
+        for track in tracks:
+            track['playlist_followers'] = metadata['followers']
+        return tracks
+
+    def record_harvest(self, playlist_id, metadata, tracks, complete):
+        """Keep a fresh harvest for its snapshot_id (incomplete harvests are not kept)"""
+        self.stats['tracks_harvested'] += 1
+        if complete and metadata['snapshot_id']:
+            self.put_tracks(playlist_id, metadata['snapshot_id'], tracks)
+
+    def put_tracks(self, playlist_id, snapshot_id, tracks, tail=False):
+        """
+        Store a harvest under its snapshot_id
+
+        tail=True marks tracks derived from the previous harvest plus newly
+        appended pages: the tail run count goes up and the time of the last
+        full harvest is carried over, so callers can bound how long such
+        derived lists stand in for a real harvest.
+        """
+        added = [track.get('track_added_at') for track in tracks if track.get('track_added_at')]
+        now = time.time()
+        with self._lock, self._conn:
+            if tail:
+                previous = self._conn.execute(
+                    "SELECT tail_runs, full_harvested_at FROM playlist_tracks WHERE playlist_id = ?", (playlist_id,)
+                ).fetchone()
+                tail_runs = ((previous['tail_runs'] or 0) if previous else 0) + 1
+                full_harvested_at = previous['full_harvested_at'] if previous else None
+            else:
+                tail_runs, full_harvested_at = 0, now
+            self._conn.execute(
+                "INSERT OR REPLACE INTO playlist_tracks "
+                "(playlist_id, snapshot_id, tracks_json, harvested_at, max_added_at, tail_runs, full_harvested_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (playlist_id, snapshot_id, json.dumps(tracks), now, max(added) if added else None,
+                 tail_runs, full_harvested_at)
+            )
+
+    def get_harvest(self, playlist_id):
+        """
+        Last stored harvest (None if never harvested): snapshot_id, tracks,
+        max_added_at, harvested_at, tail_runs since the last full harvest and
+        full_harvested_at (None when unknown)
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT snapshot_id, tracks_json, max_added_at, harvested_at, tail_runs, full_harvested_at "
+                "FROM playlist_tracks WHERE playlist_id = ?", (playlist_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {'snapshot_id': row['snapshot_id'], 'tracks': json.loads(row['tracks_json']),
+                'max_added_at': row['max_added_at'], 'harvested_at': row['harvested_at'],
+                'tail_runs': row['tail_runs'] or 0, 'full_harvested_at': row['full_harvested_at']}
+
+    def get_stats(self):
+        with self._lock:
+            playlists = self._conn.execute("SELECT COUNT(*) FROM playlists").fetchone()[0]
+            harvested = self._conn.execute("SELECT COUNT(*) FROM playlist_tracks").fetchone()[0]
+        return dict(self.stats, playlists=playlists, harvested_playlists=harvested, path=self.path,
+                    metadata_coalesced=self._metadata_flights.stats['coalesced'])
@@ -0,0 +1,308 @@
+"""
+Background pre-warming of discovery and profiling results
+A scheduler thread walks every configured (market, genre) pair from the
+market registry, re-running Spotify playlist discovery (which also refreshes
+follower counts) and profiles close to expiry, spaced out so the cycle stays
+well inside Spotify's rate limits. Request paths read the warm store and only
+fall back to a live discovery for pairs nobody has warmed yet.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    import fcntl  # leader election between worker processes (not available on Windows)
+except ImportError:
+    fcntl = None
+
+from market_registry import get_markets
+from query_guardrails import query_guard
+
+# One full pass over every configured pair
+PREWARM_INTERVAL_SECONDS = int(os.getenv('PREWARM_INTERVAL_SECONDS', '21600'))
+
+# Minimum pause between two discovery refreshes (each costs ~70 Spotify calls)
+PREWARM_MIN_GAP_SECONDS = int(os.getenv('PREWARM_MIN_GAP_SECONDS', '30'))
+
+# Served discovery results older than this trigger an out-of-cycle refresh
+DISCOVERY_MAX_AGE_SECONDS = int(os.getenv('DISCOVERY_MAX_AGE_SECONDS', str(PREWARM_INTERVAL_SECONDS)))
+
+# Pause growth after a refresh comes back empty (usually Spotify rate limiting)
+BACKOFF_FACTOR = 2
+MAX_BACKOFF_SECONDS = 1800
+
+
+class DiscoveryStore:
+    """Latest discovery result per (market, genre), with request demand counts"""
+
+    def __init__(self, max_age_seconds=DISCOVERY_MAX_AGE_SECONDS, path=None):
+        """
+        Args:
+            max_age_seconds: Results older than this are served as stale
+            path: Optional SQLite file so all worker processes share warm results
+                  (in-process dict when None)
+        """
+        self.max_age_seconds = max_age_seconds
+        self.path = path
+        self._entries = {}  # (market, genre_lower) -> (refreshed_at, playlists, failed_queries), without a path
+        self._demand = {}  # (market, genre_lower) -> request count (per process)
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            self._connect()
+        self.stats = {'warm_hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0}
+
+    def _connect(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+        if self.path != ':memory:':
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS discovery_results (market TEXT, genre TEXT, refreshed_at REAL, "
+            "playlists_json TEXT, failed_queries_json TEXT, PRIMARY KEY (market, genre))"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(discovery_results)")}
+        if 'failed_queries_json' not in columns:
+            with self._conn:
+                self._conn.execute("ALTER TABLE discovery_results ADD COLUMN failed_queries_json TEXT")
+
+    def reopen(self):
+        """New connection after fork (SQLite connections must not cross processes)"""
+        self._lock = threading.Lock()
+        if self.path:
+            self._connect()
+
+    @staticmethod
+    def key(market, genre):
+        return get_markets().canonical_name(market), genre.strip().lower()
+
+    def _load(self, key):
+        if self._conn is None:
+            return self._entries.get(key)
+        row = self._conn.execute(
+            "SELECT refreshed_at, playlists_json, failed_queries_json FROM discovery_results "
+            "WHERE market = ? AND genre = ?", key
+        ).fetchone()
+        return (row[0], json.loads(row[1]), json.loads(row[2] or '[]')) if row else None
+
+    def _save(self, key, refreshed_at, playlists, failed_queries):
+        if self._conn is None:
+            self._entries[key] = (refreshed_at, playlists, failed_queries)
+            return
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO discovery_results "
+                "(market, genre, refreshed_at, playlists_json, failed_queries_json) VALUES (?, ?, ?, ?, ?)",
+                key + (refreshed_at, json.dumps(playlists), json.dumps(failed_queries))
+            )
+
+    def get(self, market, genre):
+        """
+        Return (playlists, is_stale, failed_queries) for a request, or None when the pair is cold
+
+        Partial (failed_queries not empty) and empty results are always stale,
+        so they are refreshed instead of being served until they age out.
+        Every call counts as demand, which the scheduler uses to order its cycle.
+        """
+        key = self.key(market, genre)
+        with self._lock:
+            self._demand[key] = self._demand.get(key, 0) + 1
+            entry = self._load(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            refreshed_at, playlists, failed_queries = entry
+            stale = (time.time() - refreshed_at > self.max_age_seconds) or bool(failed_queries) or not playlists
+            self.stats['stale_hits' if stale else 'warm_hits'] += 1
+            return playlists, stale, failed_queries
+
+    def put(self, market, genre, playlists, failed_queries=None):
+        """
+        Store a discovery result
+
+        An empty result never replaces a non-empty one, and a partial one
+        (failed_queries: searches that failed) never replaces a complete one,
+        but any non-empty result replaces a partial one.
+        """
+        key = self.key(market, genre)
+        failed_queries = list(failed_queries or [])
+        with self._lock:
+            current = self._load(key)
+            if current is not None:
+                _, current_playlists, current_failed = current
+                if (not playlists and current_playlists) or (failed_queries and not current_failed):
+                    return False
+            self._save(key, time.time(), playlists, failed_queries)
+            self.stats['refreshes'] += 1
+            return True
+
+    def demand(self, key):
+        with self._lock:
+            return self._demand.get(key, 0)
+
+    def get_stats(self):
+        with self._lock:
+            if self._conn is None:
+                refreshed = [entry[0] for entry in self._entries.values()]
+            else:
+                refreshed = [row[0] for row in self._conn.execute("SELECT refreshed_at FROM discovery_results")]
+        now = time.time()
+        return dict(self.stats, pairs=len(refreshed), shared=self._conn is not None,
+                    oldest_age_seconds=round(now - min(refreshed)) if refreshed else None)
+
+
+class PrewarmScheduler:
+    """Daemon thread that keeps the discovery store and profile cache warm"""
+
+    def __init__(self, discover, store, profiling_service=None,
+                 interval_seconds=PREWARM_INTERVAL_SECONDS, min_gap_seconds=PREWARM_MIN_GAP_SECONDS,
+                 leader_lock_path=None):
+        """
+        Args:
+            discover: callable(market, genre, report) -> playlists (live Spotify discovery;
+                      report receives failed_queries)
+            store: DiscoveryStore read by the request paths
+            profiling_service: Optional ProfilingService whose profiles are kept warm
+            interval_seconds: Target time for one pass over every pair
+            min_gap_seconds: Minimum pause between two discovery refreshes
+            leader_lock_path: Optional lock file so only one worker process
+                              refreshes a shared store (the others stand by)
+        """
+        self.discover = discover
+        self.store = store
+        self.profiling_service = profiling_service
+        self.interval_seconds = interval_seconds
+        self.min_gap_seconds = min_gap_seconds
+        self.logger = logging.getLogger(__name__)
+        self._urgent = []  # pairs requested out of cycle (stale or cold reads)
+        self._urgent_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._backoff = 0
+        self.leader_lock_path = leader_lock_path
+        self._leader_file = None
+        self._leader = False
+        self.stats = {'cycles': 0, 'discovery_refreshes': 0, 'discovery_failures': 0,
+                      'profile_refreshes': 0, 'profile_failures': 0, 'last_refresh': None}
+
+    def pairs(self):
+        """Every configured discovery (market, genre), most requested first"""
+        markets = get_markets()
+        pairs = [
+            (name, genre)
+            for name, market in markets.markets.items() if market.get('discovery', True)
+            for genre in market.get('genre_translations', {})
+        ]
+        # Stable sort keeps config order among pairs with equal demand
+        return sorted(pairs, key=lambda pair: -self.store.demand(pair))
+
+    def ensure_started(self):
+        """Start the scheduler thread once (safe to call on every request)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            # A thread object inherited through fork is never alive in the child
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='prewarm', daemon=True)
+                self._thread.start()
+                self.logger.info(f"🔥 Pre-warm scheduler started ({len(self.pairs())} pairs, "
+                                 f"{self.interval_seconds}s cycle)")
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def request_refresh(self, market, genre):
+        """Queue a pair ahead of the regular cycle (served stale or cold)"""
+        key = DiscoveryStore.key(market, genre)
+        with self._urgent_lock:
+            if key not in self._urgent:
+                self._urgent.append(key)
+        self._wake.set()
+
+    def _acquire_leadership(self):
+        """Block (until stopped) on the leader lock; True once this process holds it"""
+        if not self.leader_lock_path or fcntl is None:
+            self._leader = True
+            return True
+        self._leader_file = open(self.leader_lock_path, 'a')
+        while not self._stop.is_set():
+            try:
+                fcntl.flock(self._leader_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                self.logger.info(f"🔥 Pre-warm leader is pid {os.getpid()}")
+                self._leader = True
+                return True
+            except OSError:
+                self._stop.wait(self.min_gap_seconds)
+        return False
+
+    def _run(self):
+        if not self._acquire_leadership():
+            return
+        while not self._stop.is_set():
+            pairs = self.pairs()
+            gap = max(self.min_gap_seconds, self.interval_seconds / max(len(pairs), 1))
+            for market, genre in pairs:
+                self._drain_urgent(gap)
+                if self._stop.is_set():
+                    return
+                self.refresh_pair(market, genre)
+                self._pause(gap)
+            self.stats['cycles'] += 1
+
+    def _drain_urgent(self, gap):
+        while not self._stop.is_set():
+            with self._urgent_lock:
+                if not self._urgent:
+                    return
+                market, genre = self._urgent.pop(0)
+            self.refresh_pair(market, genre, profile=False)
+            self._pause(gap)
+
+    def _pause(self, gap):
+        """Sleep until the next refresh slot; urgent requests only wait min_gap_seconds"""
+        self._wake.clear()
+        if self._wake.wait(gap + self._backoff) and not self._stop.is_set():
+            self._stop.wait(self.min_gap_seconds + self._backoff)
+
+    def refresh_pair(self, market, genre, profile=True):
+        """Refresh discovery (and optionally the profile) for one pair"""
+        try:
+            report = {}
+            playlists = self.discover(market, genre, report)
+            self.store.put(market, genre, playlists, failed_queries=report.get('failed_queries'))
+            self.stats['discovery_refreshes'] += 1
+            if playlists:
+                self._backoff = 0
+            else:
+                self._backoff = min(max(self._backoff * BACKOFF_FACTOR, self.min_gap_seconds), MAX_BACKOFF_SECONDS)
+                self.logger.warning(f"⚠️ Pre-warm {market}/{genre}: no playlists, backing off {self._backoff}s")
+        except Exception as e:
+            self.stats['discovery_failures'] += 1
+            self._backoff = min(max(self._backoff * BACKOFF_FACTOR, self.min_gap_seconds), MAX_BACKOFF_SECONDS)
+            self.logger.error(f"❌ Pre-warm discovery failed for {market}/{genre}: {e}")
+
+        if profile and self.profiling_service is not None:
+            try:
+                with query_guard():
+                    # Only profiles that would expire before the next pass are re-run
+                    if self.profiling_service.refresh_profile(market, genre, self.interval_seconds):
+                        self.stats['profile_refreshes'] += 1
+            except Exception as e:
+                self.stats['profile_failures'] += 1
+                self.logger.error(f"❌ Pre-warm profile failed for {market}/{genre}: {e}")
+
+        self.stats['last_refresh'] = f"{market}/{genre}"
+
+    def get_stats(self):
+        with self._urgent_lock:
+            urgent = len(self._urgent)
+        running = self._thread is not None and self._thread.is_alive()
+        return dict(self.stats, running=running, leader=running and self._leader, pid=os.getpid(),
+                    queued=urgent, backoff_seconds=self._backoff, store=self.store.get_stats())
@@ -0,0 +1,141 @@
+"""
+Profile result cache shared by /api/profile and /api/insights
+Entries are keyed by (market_code, genre, data_version) and expire after a TTL.
+Concurrent identical requests are deduplicated so only one profile runs.
+"""
+
+import threading
+import time
+
+from query_guardrails import QueryCancelled, current_query_guard
+
+# How often a waiting caller checks its own request's QueryGuard (deadline / disconnect)
+WAIT_POLL_SECONDS = 0.25
+
+
+class _Flight:
+    """One in-progress computation that other callers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ProfileCache:
+    """Thread-safe TTL cache with single-flight deduplication"""
+
+    def __init__(self, ttl_seconds=3600, max_entries=256, ttl_for=None):
+        """
+        Args:
+            ttl_seconds: Default lifetime of a cached profile
+            max_entries: Oldest entries are evicted beyond this size
+            ttl_for: Optional callable(value) -> ttl seconds; return 0 to skip caching
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.ttl_for = ttl_for
+        self._entries = {}  # key -> (expires_at, value)
+        self._inflight = {}  # key -> _Flight
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'recomputed': 0, 'invalidated': 0}
+
+    def get(self, key):
+        """Return a cached value or None"""
+        with self._lock:
+            value = self._get_locked(key)
+            if value is not None:
+                self.stats['hits'] += 1
+            return value
+
+    def _get_locked(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        return value
+
+    def expires_in(self, key):
+        """Seconds until key expires (None when it is not cached)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            return max(entry[0] - time.monotonic(), 0.0)
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached value for key, computing it at most once
+
+        Callers arriving while the same key is being computed wait for that
+        result instead of starting a second computation. When the leader's
+        request is cancelled (its deadline or its client), waiters compute
+        under their own guard instead of inheriting the cancellation; a
+        waiter whose own guard is cancelled stops waiting with QueryCancelled.
+        """
+        while True:
+            with self._lock:
+                value = self._get_locked(key)
+                if value is not None:
+                    self.stats['hits'] += 1
+                    return value
+
+                flight = self._inflight.get(key)
+                if flight is not None:
+                    self.stats['coalesced'] += 1
+                    leader = False
+                else:
+                    self.stats['misses'] += 1
+                    flight = _Flight()
+                    self._inflight[key] = flight
+                    leader = True
+
+            if leader:
+                break
+            guard = current_query_guard()
+            while not flight.done.wait(WAIT_POLL_SECONDS):
+                guard.raise_if_cancelled('profile wait')
+            if isinstance(flight.error, QueryCancelled):
+                self.stats['recomputed'] += 1
+                continue
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+            self.set(key, flight.value)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def set(self, key, value):
+        ttl = self.ttl_for(value) if self.ttl_for else self.ttl_seconds
+        if not ttl:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            while len(self._entries) > self.max_entries:
+                oldest = min(self._entries, key=lambda k: self._entries[k][0])
+                del self._entries[oldest]
+
+    def invalidate(self, predicate=None):
+        """Drop entries whose key matches predicate (all entries if None)"""
+        with self._lock:
+            keys = [k for k in self._entries if predicate is None or predicate(k)]
+            for key in keys:
+                del self._entries[key]
+            self.stats['invalidated'] += len(keys)
+        return len(keys)
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries), inflight=len(self._inflight))
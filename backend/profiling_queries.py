@@ -4,6 +4,9 @@ Advanced profiling with baseline vs incremental analysis and gateway detection
 The key innovation: Track WHEN songs were added to playlists and their streams at that moment
 """
 
+from market_registry import get_markets
+
+
 def get_hit_songs_base_query(market_code):
     """
     Base CTE to identify all 5-50M hit songs in a market
@@ -382,30 +385,769 @@ def get_summary_stats_query(market_code, genre):
     """
 
 
+# ============================================================================
+# BULK QUERIES: Same five profiles for many territories in one scan each
+# ============================================================================
+# Every bulk query adds a leading `territory` column and restricts the
+# Luminate scan with Territory IN (...). Splitting the output by territory
+# gives exactly the rows the single-market query returns for that market.
+
+def _territory_list(market_codes):
+    """SQL literal list for Territory IN (...)"""
+    return ', '.join(f"'{code}'" for code in market_codes)
+
+
+def get_bulk_playlist_performance_query(market_codes, genre):
+    """Bulk version of get_playlist_performance_query (top 50 per territory)"""
+    territories = _territory_list(market_codes)
+    return f"""
+    WITH hit_songs_5_50m AS (
+        SELECT Territory as territory, ISRC
+        FROM RIGHTSAPP_INSIGHTS.PUBLIC.LUMINATEMONTHLYSTREAMSBYRECORDING
+        WHERE Territory IN ({territories})
+        GROUP BY Territory, ISRC
+        HAVING MAX("Streams ATD") BETWEEN 5000000 AND 50000000
+    ),
+    
+    playlist_performance AS (
+        SELECT 
+            l.territory,
+            high_value.playlist_name,
+            high_value.playlist_id,
+            COUNT(DISTINCT high_value.isrc) as total_songs,
+            COUNT(DISTINCT CASE WHEN hs.ISRC IS NOT NULL THEN high_value.isrc END) as songs_hit_5_50m,
+            ROUND(
+                COUNT(DISTINCT CASE WHEN hs.ISRC IS NOT NULL THEN high_value.isrc END) * 1.0 /
+                NULLIF(COUNT(DISTINCT high_value.isrc), 0), 3
+            ) as hit_rate_5_50m_percent,
+            AVG(p.playlist_popularity) as avg_playlist_popularity,
+            AVG(l."Streams ATD") as avg_song_streams
+        FROM RIGHTSAPP_INSIGHTS.PUBLIC.SPOTHIGHVALUE_ISRCS high_value
+        LEFT JOIN RIGHTSAPP_INSIGHTS.PUBLIC.SPOTIFY_PLAYLIST_DATA p 
+            ON high_value.isrc = p.isrc AND high_value.playlist_id = p.playlist_id
+        LEFT JOIN (
+            SELECT Territory as territory, ISRC, MAX("Streams ATD") as "Streams ATD"
+            FROM RIGHTSAPP_INSIGHTS.PUBLIC.LUMINATEMONTHLYSTREAMSBYRECORDING
+            WHERE Territory IN ({territories})
+            GROUP BY Territory, ISRC
+        ) l ON high_value.isrc = l.ISRC
+        LEFT JOIN hit_songs_5_50m hs ON high_value.isrc = hs.ISRC AND hs.territory = l.territory
+        WHERE TRY_TO_DATE(p.added_at) <= CURRENT_DATE()
+        AND l."Streams ATD" IS NOT NULL
+        GROUP BY l.territory, high_value.playlist_name, high_value.playlist_id
+        HAVING COUNT(DISTINCT high_value.isrc) >= 10
+    ),
+    
+    playlist_activity AS (
+        SELECT 
+            playlist_name,
+            MAX(TRY_TO_DATE(added_at)) as last_song_added,
+            DATEDIFF('day', MAX(TRY_TO_DATE(added_at)), CURRENT_DATE()) as days_since_last_update,
+            COUNT(DISTINCT isrc) as total_songs_ever_added,
+            DATEDIFF('month', MIN(TRY_TO_DATE(added_at)), MAX(TRY_TO_DATE(added_at))) as months_active
+        FROM RIGHTSAPP_INSIGHTS.PUBLIC.SPOTIFY_PLAYLIST_DATA
+        WHERE TRY_TO_DATE(added_at) IS NOT NULL
+        GROUP BY playlist_name
+    )
+    
+    SELECT 
+        pp.territory,
+        pp.playlist_name,
+        pp.total_songs,
+        pp.songs_hit_5_50m,
+        pp.hit_rate_5_50m_percent,
+        CONCAT(ROUND(pp.avg_playlist_popularity/1000000, 1), 'M') as followers,
+        ROUND(pp.avg_song_streams/1000000, 1) as avg_song_streams_millions,
+        pa.last_song_added,
+        pa.days_since_last_update,
+        CASE 
+            WHEN pa.months_active = 0 THEN pa.total_songs_ever_added
+            ELSE ROUND(pa.total_songs_ever_added * 1.0 / GREATEST(pa.months_active, 1), 1)
+        END as avg_songs_per_month,
+        CASE 
+            WHEN pa.days_since_last_update <= 7 THEN 'Very Active'
+            WHEN pa.days_since_last_update <= 30 THEN 'Active'
+            WHEN pa.days_since_last_update <= 90 THEN 'Moderate'
+            WHEN pa.days_since_last_update <= 180 THEN 'Low Activity'
+            ELSE 'Inactive'
+        END as activity_status,
+        CASE 
+            WHEN pa.days_since_last_update <= 30 AND pp.hit_rate_5_50m_percent >= 0.20 THEN 'High Priority'
+            WHEN pa.days_since_last_update <= 90 AND pp.hit_rate_5_50m_percent >= 0.15 THEN 'Medium Priority'
+            WHEN pa.days_since_last_update <= 180 AND pp.hit_rate_5_50m_percent >= 0.10 THEN 'Low Priority'
+            ELSE 'Deprioritize'
+        END as ml_model_priority
+    FROM playlist_performance pp
+    LEFT JOIN playlist_activity pa ON pp.playlist_name = pa.playlist_name
+    WHERE pa.last_song_added IS NOT NULL
+    QUALIFY ROW_NUMBER() OVER (
+        PARTITION BY pp.territory
+        ORDER BY 
+            CASE 
+                WHEN pa.days_since_last_update <= 30 AND pp.hit_rate_5_50m_percent >= 0.20 THEN 1
+                WHEN pa.days_since_last_update <= 90 AND pp.hit_rate_5_50m_percent >= 0.15 THEN 2
+                WHEN pa.days_since_last_update <= 180 AND pp.hit_rate_5_50m_percent >= 0.10 THEN 3
+                ELSE 4
+            END,
+            pp.hit_rate_5_50m_percent DESC
+    ) <= 50
+    ORDER BY 
+        pp.territory,
+        CASE 
+            WHEN pa.days_since_last_update <= 30 AND pp.hit_rate_5_50m_percent >= 0.20 THEN 1
+            WHEN pa.days_since_last_update <= 90 AND pp.hit_rate_5_50m_percent >= 0.15 THEN 2
+            WHEN pa.days_since_last_update <= 180 AND pp.hit_rate_5_50m_percent >= 0.10 THEN 3
+            ELSE 4
+        END,
+        pp.hit_rate_5_50m_percent DESC;
+    """
+
+
+def get_bulk_timing_analysis_query(market_codes, genre):
+    """Bulk version of get_timing_analysis_query"""
+    territories = _territory_list(market_codes)
+    return f"""
+    WITH playlist_songs AS (
+        SELECT DISTINCT 
+            high_value.isrc,
+            p.name as song_name,
+            p.artist,
+            MIN(TRY_TO_DATE(p.added_at)) as first_playlist_date
+        FROM RIGHTSAPP_INSIGHTS.PUBLIC.SPOTHIGHVALUE_ISRCS high_value
+        LEFT JOIN RIGHTSAPP_INSIGHTS.PUBLIC.SPOTIFY_PLAYLIST_DATA p 
+            ON high_value.isrc = p.isrc AND high_value.playlist_id = p.playlist_id
+        WHERE TRY_TO_DATE(p.added_at) <= CURRENT_DATE()
+        GROUP BY high_value.isrc, p.name, p.artist
+    ),
+    
+    monthly_progression AS (
+        SELECT 
+            l.Territory as territory,
+            ps.isrc,
+            ps.song_name,
+            ps.artist,
+            ps.first_playlist_date,
+            l."Activity Year",
+            l."Activity Month",
+            l."Streams ATD" as cumulative_streams,
+            ROW_NUMBER() OVER (
+                PARTITION BY l.Territory, ps.isrc 
+                ORDER BY l."Activity Year", l."Activity Month"
+            ) as month_number
+        FROM playlist_songs ps
+        JOIN RIGHTSAPP_INSIGHTS.PUBLIC.LUMINATEMONTHLYSTREAMSBYRECORDING l 
+            ON ps.isrc = l.ISRC
+        WHERE l.Territory IN ({territories})
+    ),
+    
+    hit_timing AS (
+        SELECT 
+            territory,
+            isrc,
+            song_name,
+            artist,
+            first_playlist_date,
+            MIN(CASE WHEN cumulative_streams >= 5000000 THEN month_number END) as months_to_5m,
+            MAX(cumulative_streams) as final_total_streams
+        FROM monthly_progression
+        GROUP BY territory, isrc, song_name, artist, first_playlist_date
+        HAVING MAX(cumulative_streams) BETWEEN 5000000 AND 50000000
+    )
+    
+    SELECT 
+        territory,
+        CASE 
+            WHEN months_to_5m <= 3 THEN '1-3 months to 5M'
+            WHEN months_to_5m <= 6 THEN '4-6 months to 5M'
+            WHEN months_to_5m <= 12 THEN '7-12 months to 5M'
+            ELSE 'Over 1 year to 5M'
+        END as time_to_5m,
+        COUNT(*) as song_count,
+        ROUND(COUNT(*) * 1.0 / SUM(COUNT(*)) OVER (PARTITION BY territory), 3) as percentage,
+        ROUND(AVG(final_total_streams/1000000), 1) as avg_final_streams_millions
+    FROM hit_timing
+    WHERE months_to_5m IS NOT NULL
+    GROUP BY 
+        territory,
+        CASE 
+            WHEN months_to_5m <= 3 THEN '1-3 months to 5M'
+            WHEN months_to_5m <= 6 THEN '4-6 months to 5M'
+            WHEN months_to_5m <= 12 THEN '7-12 months to 5M'
+            ELSE 'Over 1 year to 5M'
+        END
+    ORDER BY 
+        territory,
+        CASE time_to_5m
+            WHEN '1-3 months to 5M' THEN 1
+            WHEN '4-6 months to 5M' THEN 2
+            WHEN '7-12 months to 5M' THEN 3
+            ELSE 4
+        END;
+    """
+
+
+def get_bulk_seasonality_query(market_codes, genre):
+    """Bulk version of get_seasonality_query"""
+    territories = _territory_list(market_codes)
+    territory_rows = ', '.join(f"('{code}')" for code in market_codes)
+    return f"""
+    WITH hit_songs_5_50m AS (
+        SELECT Territory as territory, ISRC
+        FROM RIGHTSAPP_INSIGHTS.PUBLIC.LUMINATEMONTHLYSTREAMSBYRECORDING
+        WHERE Territory IN ({territories})
+        GROUP BY Territory, ISRC
+        HAVING MAX("Streams ATD") BETWEEN 5000000 AND 50000000
+    ),
+    
+    territories AS (
+        SELECT territory FROM (VALUES {territory_rows}) AS t (territory)
+    )
+    
+    SELECT
+        t.territory,
+        EXTRACT(MONTH FROM TRY_TO_DATE(p.added_at)) as playlist_month,
+        MONTHNAME(TRY_TO_DATE(p.added_at)) as month_name,
+        COUNT(*) as songs_added,
+        ROUND(
+            AVG(CASE WHEN hs.ISRC IS NOT NULL THEN 1 ELSE 0 END), 3
+        ) as hit_rate_5_50m_percent
+    FROM RIGHTSAPP_INSIGHTS.PUBLIC.SPOTIFY_PLAYLIST_DATA p
+    INNER JOIN RIGHTSAPP_INSIGHTS.PUBLIC.SPOTHIGHVALUE_ISRCS h 
+        ON p.isrc = h.isrc
+    CROSS JOIN territories t
+    LEFT JOIN hit_songs_5_50m hs ON p.isrc = hs.ISRC AND hs.territory = t.territory
+    WHERE TRY_TO_DATE(p.added_at) <= CURRENT_DATE()
+    AND TRY_TO_DATE(p.added_at) IS NOT NULL
+    GROUP BY 
+        t.territory,
+        EXTRACT(MONTH FROM TRY_TO_DATE(p.added_at)), 
+        MONTHNAME(TRY_TO_DATE(p.added_at))
+    ORDER BY t.territory, playlist_month;
+    """
+
+
+def get_bulk_most_common_playlists_query(market_codes, genre):
+    """Bulk version of get_most_common_playlists_query (top 30 per territory)"""
+    territories = _territory_list(market_codes)
+    return f"""
+    WITH hit_songs_5_50m AS (
+        SELECT Territory as territory, ISRC
+        FROM RIGHTSAPP_INSIGHTS.PUBLIC.LUMINATEMONTHLYSTREAMSBYRECORDING
+        WHERE Territory IN ({territories})
+        GROUP BY Territory, ISRC
+        HAVING MAX("Streams ATD") BETWEEN 5000000 AND 50000000
+    ),
+    
+    hit_totals AS (
+        SELECT territory, COUNT(*) as hit_count
+        FROM hit_songs_5_50m
+        GROUP BY territory
+    ),
+    
+    playlist_hits AS (
+        SELECT 
+            hs.territory,
+            h.playlist_name,
+            COUNT(DISTINCT h.isrc) as hit_songs_count,
+            ROUND(
+                COUNT(DISTINCT h.isrc) * 1.0 / MAX(ht.hit_count), 3
+            ) as percentage_of_5_50m_hits
+        FROM RIGHTSAPP_INSIGHTS.PUBLIC.SPOTHIGHVALUE_ISRCS h
+        INNER JOIN hit_songs_5_50m hs ON h.isrc = hs.ISRC
+        INNER JOIN hit_totals ht ON hs.territory = ht.territory
+        GROUP BY hs.territory, h.playlist_name
+    ),
+    
+    playlist_activity AS (
+        SELECT 
+            playlist_name,
+            MAX(TRY_TO_DATE(added_at)) as last_song_added,
+            DATEDIFF('day', MAX(TRY_TO_DATE(added_at)), CURRENT_DATE()) as days_since_last_update,
+            AVG(playlist_popularity) as avg_playlist_popularity
+        FROM RIGHTSAPP_INSIGHTS.PUBLIC.SPOTIFY_PLAYLIST_DATA
+        WHERE TRY_TO_DATE(added_at) IS NOT NULL
+        GROUP BY playlist_name
+    )
+    
+    SELECT 
+        ph.territory,
+        ph.playlist_name,
+        ph.hit_songs_count,
+        ph.percentage_of_5_50m_hits,
+        CONCAT(ROUND(pa.avg_playlist_popularity/1000000, 1), 'M') as followers,
+        pa.last_song_added,
+        pa.days_since_last_update,
+        CASE 
+            WHEN pa.days_since_last_update <= 7 THEN 'Very Active'
+            WHEN pa.days_since_last_update <= 30 THEN 'Active'
+            WHEN pa.days_since_last_update <= 90 THEN 'Moderate'
+            WHEN pa.days_since_last_update <= 180 THEN 'Low Activity'
+            ELSE 'Inactive'
+        END as activity_status
+    FROM playlist_hits ph
+    LEFT JOIN playlist_activity pa ON ph.playlist_name = pa.playlist_name
+    WHERE pa.last_song_added IS NOT NULL
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY ph.territory ORDER BY ph.hit_songs_count DESC) <= 30
+    ORDER BY ph.territory, ph.hit_songs_count DESC;
+    """
+
+
+def get_bulk_summary_stats_query(market_codes, genre):
+    """Bulk version of get_summary_stats_query (one row per territory)"""
+    territories = _territory_list(market_codes)
+    return f"""
+    WITH hit_songs_5_50m AS (
+        SELECT 
+            Territory as territory,
+            ISRC,
+            MAX("Streams ATD") as total_streams
+        FROM RIGHTSAPP_INSIGHTS.PUBLIC.LUMINATEMONTHLYSTREAMSBYRECORDING
+        WHERE Territory IN ({territories})
+        GROUP BY Territory, ISRC
+        HAVING MAX("Streams ATD") BETWEEN 5000000 AND 50000000
+    ),
+    
+    playlist_counts AS (
+        SELECT 
+            p.isrc,
+            COUNT(DISTINCT p.playlist_id) as playlist_count
+        FROM RIGHTSAPP_INSIGHTS.PUBLIC.SPOTIFY_PLAYLIST_DATA p
+        WHERE p.isrc IN (SELECT ISRC FROM hit_songs_5_50m)
+        GROUP BY p.isrc
+    )
+    
+    SELECT 
+        hs.territory,
+        COUNT(DISTINCT hs.ISRC) as total_5_50m_songs,
+        COUNT(DISTINCT p.playlist_id) as total_playlists,
+        ROUND(AVG(pc.playlist_count), 1) as avg_playlists_per_song,
+        ROUND(AVG(hs.total_streams) / 1000000, 1) as avg_streams_millions,
+        ROUND(PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY hs.total_streams) / 1000000, 1) as median_streams_millions
+    FROM hit_songs_5_50m hs
+    LEFT JOIN RIGHTSAPP_INSIGHTS.PUBLIC.SPOTIFY_PLAYLIST_DATA p ON hs.ISRC = p.isrc
+    LEFT JOIN playlist_counts pc ON hs.ISRC = pc.isrc
+    GROUP BY hs.territory;
+    """
+
+
+# ============================================================================
+# TOTAL STREAMS: WW-first total per ISRC (docs/LUMINATE_DATA_SPECIFICATION.md)
+# ============================================================================
+def get_bulk_total_streams_query(isrcs):
+    """
+    Total streams for many ISRCs in one scan
+    
+    Same rule as the two-step spec algorithm: the WW MAX("Streams ATD") when
+    the ISRC has WW rows, otherwise the sum of per-territory maxima.
+    ISRCs must already be validated (see streams_resolver.py).
+    
+    Outputs:
+    - isrc
+    - total_streams
+    - streams_source ('WW' or 'TERRITORY_SUM')
+    - territory_count (individual territories reporting the ISRC)
+    """
+    isrc_list = ', '.join(f"'{isrc}'" for isrc in isrcs)
+    return f"""
+    WITH territory_max AS (
+        SELECT 
+            ISRC,
+            Territory,
+            MAX("Streams ATD") as max_streams
+        FROM RIGHTSAPP_INSIGHTS.PUBLIC.LUMINATEMONTHLYSTREAMSBYRECORDING
+        WHERE ISRC IN ({isrc_list})
+        GROUP BY ISRC, Territory
+    )
+    
+    SELECT 
+        ISRC as isrc,
+        COALESCE(
+            MAX(CASE WHEN Territory = 'WW' THEN max_streams END),
+            SUM(CASE WHEN Territory != 'WW' THEN max_streams END)
+        ) as total_streams,
+        CASE WHEN MAX(CASE WHEN Territory = 'WW' THEN 1 ELSE 0 END) = 1
+             THEN 'WW' ELSE 'TERRITORY_SUM' END as streams_source,
+        SUM(CASE WHEN Territory != 'WW' THEN 1 ELSE 0 END) as territory_count
+    FROM territory_max
+    GROUP BY ISRC;
+    """
+
+
+# ============================================================================
+# ADOPTION TIMELINES: First add of each ISRC to each playlist (velocity_index.py)
+# ============================================================================
+# Add watermarks (here and in the streams engine queries) are dates, and rows
+# can be loaded after their day was first read. Incremental add queries
+# therefore re-read the watermark day (>=) and callers skip pairs they hold,
+# and the watermark queries also count the rows on the latest day so a late
+# load is noticed even when the latest date has not moved.
+def get_playlist_adds_watermark_query():
+    """
+    Latest playlist add date
+    
+    Outputs:
+    - latest_add_date
+    - latest_add_rows (playlist rows dated latest_add_date)
+    """
+    return """
+    WITH latest_add AS (
+        SELECT MAX(TRY_TO_DATE(added_at)) as latest_add_date
+        FROM RIGHTSAPP_INSIGHTS.PUBLIC.SPOTIFY_PLAYLIST_DATA
+        WHERE TRY_TO_DATE(added_at) <= CURRENT_DATE()
+    )
+    SELECT 
+        a.latest_add_date,
+        (
+            SELECT COUNT(*)
+            FROM RIGHTSAPP_INSIGHTS.PUBLIC.SPOTIFY_PLAYLIST_DATA p
+            WHERE TRY_TO_DATE(p.added_at) = a.latest_add_date
+        ) as latest_add_rows
+    FROM latest_add a;
+    """
+
+
+def get_playlist_first_adds_query(through_add_date, added_after=None):
+    """
+    First add date of every (ISRC, playlist) pair added in [added_after, through_add_date]
+    
+    A pair already indexed from an earlier add can come back with a later
+    date; AdoptionTimelineIndex keeps the one it has.
+    
+    Outputs:
+    - isrc, playlist_id, playlist_name, add_date
+    """
+    after_filter = f"AND TRY_TO_DATE(added_at) >= TRY_TO_DATE('{added_after}')" if added_after else ""
+    return f"""
+    SELECT 
+        isrc,
+        playlist_id,
+        MAX(playlist_name) as playlist_name,
+        MIN(TRY_TO_DATE(added_at)) as add_date
+    FROM RIGHTSAPP_INSIGHTS.PUBLIC.SPOTIFY_PLAYLIST_DATA
+    WHERE TRY_TO_DATE(added_at) <= TRY_TO_DATE('{through_add_date}')
+    {after_filter}
+    GROUP BY isrc, playlist_id;
+    """
+
+
+# ============================================================================
+# ISRC ENRICHMENT: Staged ISRC set joined server-side to Luminate + playlists
+# ============================================================================
+# Max rows per INSERT ... VALUES statement accepted by Snowflake
+STAGE_INSERT_MAX_ROWS = 16384
+
+
+def get_isrc_stage_table_query(stage_table):
+    """Session-scoped table holding one request's ISRC set"""
+    return f"""
+    CREATE TEMPORARY TABLE {stage_table} (
+        isrc VARCHAR(12),
+        request_position INTEGER
+    );
+    """
+
+
+def get_isrc_stage_insert_query(stage_table, isrcs, start_position=0):
+    """
+    Multi-row insert of validated ISRCs (one statement per STAGE_INSERT_MAX_ROWS)
+    """
+    rows = ', '.join(f"('{isrc}', {start_position + i})" for i, isrc in enumerate(isrcs))
+    return f"INSERT INTO {stage_table} (isrc, request_position) VALUES {rows};"
+
+
+def get_isrc_enrichment_query(stage_table):
+    """
+    Luminate + playlist metrics for every staged ISRC, in request order
+    
+    Outputs:
+    - isrc, request_position
+    - in_luminate (ISRC has Luminate rows)
+    - title, artist
+    - total_streams, streams_source (WW-first, same rule as get_bulk_total_streams_query)
+    - territory_count, top_territory, top_territory_streams
+    - latest_month_streams (WW, else summed across territories)
+    - playlist_count, first_playlist_date, last_playlist_date, max_playlist_popularity
+    """
+    return f"""
+    WITH luminate_rows AS (
+        SELECT 
+            l.ISRC,
+            l.Territory,
+            l."Title" as title,
+            l."Display Artist" as artist,
+            l."Streams" as streams,
+            l."Streams ATD" as streams_atd,
+            -- Streams ATD is cumulative, so the highest value is the latest month
+            ROW_NUMBER() OVER (
+                PARTITION BY l.ISRC, l.Territory 
+                ORDER BY l."Streams ATD" DESC
+            ) as recency_rank
+        FROM RIGHTSAPP_INSIGHTS.PUBLIC.LUMINATEMONTHLYSTREAMSBYRECORDING l
+        JOIN {stage_table} s ON s.isrc = l.ISRC
+    ),
+    
+    territory_totals AS (
+        SELECT 
+            ISRC,
+            Territory,
+            MAX(title) as title,
+            MAX(artist) as artist,
+            MAX(streams_atd) as max_streams,
+            MAX(CASE WHEN recency_rank = 1 THEN streams END) as latest_streams
+        FROM luminate_rows
+        GROUP BY ISRC, Territory
+    ),
+    
+    luminate_totals AS (
+        SELECT 
+            ISRC,
+            MAX(title) as title,
+            MAX(artist) as artist,
+            COALESCE(
+                MAX(CASE WHEN Territory = 'WW' THEN max_streams END),
+                SUM(CASE WHEN Territory != 'WW' THEN max_streams END)
+            ) as total_streams,
+            CASE WHEN MAX(CASE WHEN Territory = 'WW' THEN 1 ELSE 0 END) = 1
+                 THEN 'WW' ELSE 'TERRITORY_SUM' END as streams_source,
+            COALESCE(
+                MAX(CASE WHEN Territory = 'WW' THEN latest_streams END),
+                SUM(CASE WHEN Territory != 'WW' THEN latest_streams END)
+            ) as latest_month_streams,
+            SUM(CASE WHEN Territory != 'WW' THEN 1 ELSE 0 END) as territory_count
+        FROM territory_totals
+        GROUP BY ISRC
+    ),
+    
+    top_territory AS (
+        SELECT ISRC, Territory as top_territory, max_streams as top_territory_streams
+        FROM territory_totals
+        WHERE Territory != 'WW'
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY ISRC ORDER BY max_streams DESC) = 1
+    ),
+    
+    playlist_stats AS (
+        SELECT 
+            p.isrc,
+            COUNT(DISTINCT p.playlist_id) as playlist_count,
+            MIN(TRY_TO_DATE(p.added_at)) as first_playlist_date,
+            MAX(TRY_TO_DATE(p.added_at)) as last_playlist_date,
+            MAX(p.playlist_popularity) as max_playlist_popularity
+        FROM RIGHTSAPP_INSIGHTS.PUBLIC.SPOTIFY_PLAYLIST_DATA p
+        JOIN {stage_table} s ON s.isrc = p.isrc
+        GROUP BY p.isrc
+    )
+    
+    SELECT 
+        s.isrc,
+        s.request_position,
+        lt.ISRC IS NOT NULL as in_luminate,
+        lt.title,
+        lt.artist,
+        lt.total_streams,
+        lt.streams_source,
+        lt.territory_count,
+        tt.top_territory,
+        tt.top_territory_streams,
+        lt.latest_month_streams,
+        COALESCE(ps.playlist_count, 0) as playlist_count,
+        ps.first_playlist_date,
+        ps.last_playlist_date,
+        ps.max_playlist_popularity
+    FROM {stage_table} s
+    LEFT JOIN luminate_totals lt ON lt.ISRC = s.isrc
+    LEFT JOIN top_territory tt ON tt.ISRC = s.isrc
+    LEFT JOIN playlist_stats ps ON ps.isrc = s.isrc
+    ORDER BY s.request_position;
+    """
+
+
+# ============================================================================
+# BASELINE VS INCREMENTAL: Incremental inputs for streams_engine.py
+# ============================================================================
+# Months are compared as ordinals (year * 12 + month number) so watermark
+# filters work on "Activity Year" / "Activity Month" name columns.
+
+def _activity_month_ordinal(alias='l'):
+    """SQL expression for the month ordinal of a Luminate row"""
+    months = ' '.join(
+        f"WHEN '{name}' THEN {number}" for number, name in enumerate([
+            'January', 'February', 'March', 'April', 'May', 'June', 'July',
+            'August', 'September', 'October', 'November', 'December'
+        ], start=1)
+    )
+    return f"""(CAST({alias}."Activity Year" AS INTEGER) * 12 + CASE {alias}."Activity Month" {months} END)"""
+
+
+def get_streams_watermark_query(market_code):
+    """
+    Latest Luminate month for a territory and latest playlist add date
+    
+    Outputs:
+    - latest_month (month ordinal)
+    - latest_add_date (across all territories, like the adoption index watermark)
+    - latest_add_rows (count of playlist rows on latest_add_date)
+    """
+    return f"""
+    WITH latest_add AS (
+        SELECT MAX(TRY_TO_DATE(p.added_at)) as latest_add_date
+        FROM RIGHTSAPP_INSIGHTS.PUBLIC.SPOTIFY_PLAYLIST_DATA p
+        WHERE TRY_TO_DATE(p.added_at) <= CURRENT_DATE()
+    )
+    SELECT 
+        (
+            SELECT MAX({_activity_month_ordinal('l')})
+            FROM RIGHTSAPP_INSIGHTS.PUBLIC.LUMINATEMONTHLYSTREAMSBYRECORDING l
+            WHERE l.Territory = '{market_code}'
+        ) as latest_month,
+        a.latest_add_date,
+        (
+            SELECT COUNT(*)
+            FROM RIGHTSAPP_INSIGHTS.PUBLIC.SPOTIFY_PLAYLIST_DATA p
+            WHERE TRY_TO_DATE(p.added_at) = a.latest_add_date
+        ) as latest_add_rows
+    FROM latest_add a;
+    """
+
+
+def get_streams_engine_adds_query(market_code, through_month, through_add_date,
+                                  added_after=None, months_after=None):
+    """
+    Baseline and latest streams for (ISRC, playlist) adds not yet in the engine
+    
+    Covers adds made on or after `added_after` (all adds when None) plus every
+    add of ISRCs that first appeared in the territory after `months_after`;
+    pairs the engine already holds are dropped by _apply_adds. Baseline is "Streams ATD" in the last month before the add month.
+    
+    Outputs:
+    - isrc, playlist_id, playlist_name
+    - add_date, add_month (ordinal)
+    - baseline_streams (streams when first added)
+    - latest_streams (Streams ATD through `through_month`)
+    """
+    month = _activity_month_ordinal('l')
+    date_filter = f"TRY_TO_DATE(p.added_at) >= TRY_TO_DATE('{added_after}')" if added_after else "TRUE"
+    
+    new_isrcs_cte = ""
+    if months_after is not None:
+        new_isrcs_cte = f"""
+    new_isrcs AS (
+        SELECT DISTINCT l.ISRC
+        FROM RIGHTSAPP_INSIGHTS.PUBLIC.LUMINATEMONTHLYSTREAMSBYRECORDING l
+        WHERE l.Territory = '{market_code}'
+        AND {month} > {months_after} AND {month} <= {through_month}
+        AND NOT EXISTS (
+            SELECT 1
+            FROM RIGHTSAPP_INSIGHTS.PUBLIC.LUMINATEMONTHLYSTREAMSBYRECORDING o
+            WHERE o.ISRC = l.ISRC AND o.Territory = '{market_code}'
+            AND {_activity_month_ordinal('o')} <= {months_after}
+        )
+    ),
+    """
+        date_filter = f"({date_filter} OR p.isrc IN (SELECT ISRC FROM new_isrcs))"
+    
+    return f"""
+    WITH {new_isrcs_cte}
+    adds AS (
+        SELECT 
+            p.isrc,
+            p.playlist_id,
+            MAX(p.playlist_name) as playlist_name,
+            MIN(TRY_TO_DATE(p.added_at)) as add_date
+        FROM RIGHTSAPP_INSIGHTS.PUBLIC.SPOTIFY_PLAYLIST_DATA p
+        WHERE TRY_TO_DATE(p.added_at) <= TRY_TO_DATE('{through_add_date}')
+        AND {date_filter}
+        GROUP BY p.isrc, p.playlist_id
+    ),
+    
+    adds_by_month AS (
+        SELECT 
+            isrc, playlist_id, playlist_name, add_date,
+            YEAR(add_date) * 12 + MONTH(add_date) as add_month
+        FROM adds
+    ),
+    
+    history AS (
+        SELECT 
+            l.ISRC,
+            {month} as month_ordinal,
+            l."Streams ATD" as streams_atd
+        FROM RIGHTSAPP_INSIGHTS.PUBLIC.LUMINATEMONTHLYSTREAMSBYRECORDING l
+        WHERE l.Territory = '{market_code}'
+        AND {month} <= {through_month}
+        AND l.ISRC IN (SELECT isrc FROM adds)
+    )
+    
+    SELECT 
+        a.isrc,
+        a.playlist_id,
+        a.playlist_name,
+        a.add_date,
+        a.add_month,
+        COALESCE(MAX(CASE WHEN h.month_ordinal < a.add_month THEN h.streams_atd END), 0) as baseline_streams,
+        MAX(h.streams_atd) as latest_streams
+    FROM adds_by_month a
+    JOIN history h ON h.ISRC = a.isrc
+    GROUP BY a.isrc, a.playlist_id, a.playlist_name, a.add_date, a.add_month;
+    """
+
+
+def get_streams_engine_months_query(market_code, after_month, through_month):
+    """
+    Luminate rows for newly loaded months of a territory
+    
+    Outputs:
+    - isrc, month_ordinal, streams_atd
+    """
+    month = _activity_month_ordinal('l')
+    return f"""
+    SELECT 
+        l.ISRC as isrc,
+        {month} as month_ordinal,
+        l."Streams ATD" as streams_atd
+    FROM RIGHTSAPP_INSIGHTS.PUBLIC.LUMINATEMONTHLYSTREAMSBYRECORDING l
+    WHERE l.Territory = '{market_code}'
+    AND {month} > {after_month} AND {month} <= {through_month};
+    """
+
+
+# ============================================================================
+# DATA VERSION: Luminate table load timestamp (cache invalidation)
+# ============================================================================
+def get_data_version_query():
+    """
+    Returns the last load/alter timestamp of the Luminate monthly table
+    
+    Outputs:
+    - data_version (timestamp, changes whenever a new month is loaded)
+    """
+    return """
+    SELECT TO_VARCHAR(LAST_ALTERED) as data_version
+    FROM RIGHTSAPP_INSIGHTS.INFORMATION_SCHEMA.TABLES
+    WHERE TABLE_SCHEMA = 'PUBLIC'
+    AND TABLE_NAME = 'LUMINATEMONTHLYSTREAMSBYRECORDING';
+    """
+
+
+def get_query_costs_query(query_ids):
+    """
+    Looks up warehouse cost of finished queries in this session's history
+    
+    Outputs:
+    - query_id
+    - bytes_scanned
+    - elapsed_ms
+    """
+    ids = ', '.join(f"'{query_id}'" for query_id in query_ids)
+    return f"""
+    SELECT QUERY_ID as query_id, BYTES_SCANNED as bytes_scanned, TOTAL_ELAPSED_TIME as elapsed_ms
+    FROM TABLE(RIGHTSAPP_INSIGHTS.INFORMATION_SCHEMA.QUERY_HISTORY_BY_SESSION(RESULT_LIMIT => 10000))
+    WHERE QUERY_ID IN ({ids});
+    """
+
+
 # ============================================================================
 # HELPER: Market code converter
 # ============================================================================
 def convert_market_to_code(market_name):
-    """Convert market display name to territory code"""
-    market_codes = {
-        'France': 'FR',
-        'Germany': 'DE',
-        'Spain': 'ES',
-        'UK': 'GB',
-        'United Kingdom': 'GB',
-        'US': 'US',
-        'United States': 'US',
-        'Thailand': 'TH',
-        'Japan': 'JP',
-        'Italy': 'IT',
-        'Netherlands': 'NL',
-        'Sweden': 'SE',
-        'Norway': 'NO',
-        'Brazil': 'BR',
-        'Mexico': 'MX',
-        'Australia': 'AU',
-        'Canada': 'CA',
-        'South Korea': 'KR',
-        'Worldwide': 'WW'
-    }
-    return market_codes.get(market_name, market_name)
\ No newline at end of file
+    """Convert market display name to territory code (market_config.json via the market registry)"""
+    return get_markets().market_code(market_name)
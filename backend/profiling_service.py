@@ -3,33 +3,106 @@ Profiling service for market/genre analysis using Snowflake
 Orchestrates execution of all profiling queries
 """
 
-import snowflake.connector
 from profiling_queries import *
+from query_results import ColumnarResult, iter_cursor_batches, DEFAULT_BATCH_SIZE
 import os
 from dotenv import load_dotenv
 import logging
+import threading
+import time
+import uuid
+from profile_cache import ProfileCache
+from streams_engine import IncrementalStreamsEngine
+from velocity_index import AdoptionTimelineIndex
+from transition_graph import LATENCY_LABELS, PlaylistTransitionGraph
+from query_guardrails import (
+    QUERY_TIMEOUTS, POLL_INTERVAL_SECONDS, QueryCancelled, QueryCostTracker,
+    current_query_guard
+)
 
 load_dotenv()
 
+# How long a data_version lookup is trusted before re-checking the warehouse
+DATA_VERSION_CHECK_SECONDS = int(os.getenv('PROFILE_DATA_VERSION_CHECK_SECONDS', '300'))
+PROFILE_CACHE_TTL_SECONDS = int(os.getenv('PROFILE_CACHE_TTL_SECONDS', '21600'))
+PROFILE_CACHE_NO_DATA_TTL_SECONDS = 60
+
+# Bytes scanned are looked up for all finished queries at once, this often, off the request path
+COST_LOOKUP_INTERVAL_SECONDS = int(os.getenv('PROFILE_COST_LOOKUP_SECONDS', '30'))
+COST_LOOKUP_TIMEOUT_SECONDS = 10
+COST_LOOKUP_BATCH = 500
+
+
+def _profile_cache_ttl(results):
+    """Cache successful profiles for the full TTL, empty ones briefly, errors never"""
+    status = results.get('status')
+    if results.get('degraded'):
+        return PROFILE_CACHE_NO_DATA_TTL_SECONDS
+    if status == 'success':
+        return PROFILE_CACHE_TTL_SECONDS
+    if status == 'no_data':
+        return PROFILE_CACHE_NO_DATA_TTL_SECONDS
+    return 0
+
+
+# Aggregates of get_summary_stats_query over no rows
+EMPTY_SUMMARY_STATS = {
+    'total_5_50m_songs': 0,
+    'total_playlists': 0,
+    'avg_playlists_per_song': None,
+    'avg_streams_millions': None,
+    'median_streams_millions': None,
+}
+
+
+def empty_summary_stats(columns=None):
+    """
+    Summary Statistics row for a territory with no 5-50M songs
+    
+    Matches what the single-market query aggregates over no rows (counts 0,
+    averages and median None), keyed by the warehouse's column names.
+    """
+    names = columns or list(EMPTY_SUMMARY_STATS)
+    return {name: EMPTY_SUMMARY_STATS.get(name.lower()) for name in names}
+
+
 class ProfilingService:
     """Service class for executing market/genre profiling queries"""
     
-    def __init__(self, snowflake_conn=None):
-        """Initialize with optional Snowflake connection"""
+    def __init__(self, snowflake_conn=None, cache=None):
+        """Initialize with optional Snowflake connection and shared profile cache"""
         self.conn = snowflake_conn
         self.logger = logging.getLogger(__name__)
+        self.cache = cache if cache is not None else ProfileCache(ttl_for=_profile_cache_ttl)
+        self._data_version = None
+        self._data_version_checked_at = 0.0
+        self._data_version_lock = threading.Lock()
+        self.cost_tracker = QueryCostTracker()
+        self._pending_costs = []  # query ids waiting for the batched history lookup
+        self._pending_costs_lock = threading.Lock()
+        self._cost_worker_pid = None
+        self._fallback_results = {}  # query text -> last good ColumnarResult
+        self.streams_engine = IncrementalStreamsEngine(self)
+        self.adoption_index = AdoptionTimelineIndex(self)
+        self.transition_graph = PlaylistTransitionGraph(self.adoption_index)
+        self._velocity_tiers = {}  # market_code -> (index versions, tiers)
         
     def _get_connection(self):
         """Get or create Snowflake connection"""
         if self.conn is None:
             try:
+                # Imported on first connection: the connector is the slowest import in the app
+                # and mock / local profiling never needs it
+                import snowflake.connector
                 self.conn = snowflake.connector.connect(
                     account=os.getenv('SNOWFLAKE_ACCOUNT'),
                     user=os.getenv('SNOWFLAKE_USER'),
                     password=os.getenv('SNOWFLAKE_PASSWORD'),
                     warehouse=os.getenv('SNOWFLAKE_WAREHOUSE'),
                     database=os.getenv('SNOWFLAKE_DATABASE', 'RIGHTSAPP_INSIGHTS'),
-                    schema=os.getenv('SNOWFLAKE_SCHEMA', 'PUBLIC')
+                    schema=os.getenv('SNOWFLAKE_SCHEMA', 'PUBLIC'),
+                    # Server-side backstop in case a client-side cancel is lost
+                    session_parameters={'STATEMENT_TIMEOUT_IN_SECONDS': max(QUERY_TIMEOUTS.values())}
                 )
             except Exception as e:
                 self.logger.error(f"Failed to connect to Snowflake: {e}")
@@ -38,31 +111,290 @@ class ProfilingService:
     
     def _execute_query(self, query, query_name):
         """Execute SQL query and return results as list of dictionaries"""
+        return self._execute_query_columnar(query, query_name).to_rows()
+    
+    def _execute_query_columnar(self, query, query_name):
+        """
+        Execute SQL query and return a ColumnarResult
+        
+        Results are fetched as Arrow batches and kept column-oriented; row
+        dicts are only built when the payload is serialized to JSON.
+        
+        Guardrails: the query runs under its per-type timeout and is cancelled
+        server-side when the request deadline passes or the client disconnects
+        (QueryCancelled is re-raised). Query types over their bytes-scanned
+        budget are answered from the last good result instead.
+        """
+        guard = current_query_guard()
         try:
+            guard.raise_if_cancelled(query_name)
+            
+            if self.cost_tracker.is_over_budget(query_name):
+                return self._over_budget_result(query, query_name)
+            
             conn = self._get_connection()
             if conn is None:
-                return []
-                
-            cursor = conn.cursor()
-            cursor.execute(query)
-            
-            # Get column names
-            columns = [desc[0] for desc in cursor.description]
+                return ColumnarResult.empty()
             
-            # Fetch all results and convert to list of dicts
-            results = []
-            for row in cursor.fetchall():
-                results.append(dict(zip(columns, row)))
+            started = time.monotonic()
+            cursor = conn.cursor()
+            try:
+                query_id = self._run_statement(cursor, query, query_name, guard)
+                results = ColumnarResult.from_cursor(cursor)
+            finally:
+                cursor.close()
             
-            cursor.close()
+            self._remember_result(query, results)
+            self._record_query_cost(query_name, query_id, started)
             self.logger.info(f"✅ {query_name}: {len(results)} results")
             return results
+        
+        except QueryCancelled as e:
+            self.logger.warning(f"⏹️ {e}")
+            self.cost_tracker.record(query_name, status='cancelled')
+            raise
             
         except Exception as e:
             self.logger.error(f"❌ {query_name} failed: {e}")
-            return []
+            return ColumnarResult.empty()
+    
+    def _run_statement(self, cursor, query, query_name, guard):
+        """
+        Run a statement asynchronously and wait for it under the guard
+        
+        Polls the query status so a deadline or client disconnect can cancel
+        the warehouse query instead of leaving it running. Returns the query id.
+        """
+        timeout = guard.timeout_for(query_name)
+        if timeout <= 0:
+            raise QueryCancelled(f"{query_name}: request deadline exceeded")
+        
+        conn = cursor.connection
+        cursor.execute_async(query)
+        query_id = cursor.sfqid
+        deadline = time.monotonic() + timeout
+        
+        while conn.is_still_running(conn.get_query_status_throw_if_error(query_id)):
+            if guard.cancelled or time.monotonic() >= deadline:
+                self._cancel_query(conn, query_id)
+                reason = guard.reason or f"timed out after {timeout:.0f}s"
+                raise QueryCancelled(f"{query_name}: {reason}")
+            time.sleep(POLL_INTERVAL_SECONDS)
+        
+        cursor.get_results_from_sfqid(query_id)
+        return query_id
+    
+    def _cancel_query(self, conn, query_id):
+        """Cancel a running warehouse query"""
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT SYSTEM$CANCEL_QUERY('{query_id}')")
+            cursor.close()
+        except Exception as e:
+            self.logger.error(f"Failed to cancel query {query_id}: {e}")
+    
+    def _record_query_cost(self, query_name, query_id, started):
+        """
+        Record a finished query's elapsed time now
+        
+        Bytes scanned are filled in later by the cost worker, which reads the
+        warehouse query history for every pending query id in one statement.
+        """
+        elapsed_ms = int((time.monotonic() - started) * 1000)
+        self.cost_tracker.record(query_name, query_id, None, elapsed_ms)
+        if query_id:
+            with self._pending_costs_lock:
+                self._pending_costs.append(query_id)
+            self._ensure_cost_worker()
+    
+    def _ensure_cost_worker(self):
+        """Start the cost lookup thread in this process (threads do not survive a fork)"""
+        if self._cost_worker_pid == os.getpid():
+            return
+        with self._pending_costs_lock:
+            if self._cost_worker_pid == os.getpid():
+                return
+            self._cost_worker_pid = os.getpid()
+        threading.Thread(target=self._cost_worker, name='query-cost-lookup', daemon=True).start()
+    
+    def _cost_worker(self):
+        while True:
+            time.sleep(COST_LOOKUP_INTERVAL_SECONDS)
+            try:
+                self.flush_query_costs()
+            except Exception as e:
+                self.logger.debug(f"Query cost lookup failed: {e}")
+    
+    def flush_query_costs(self):
+        """
+        Fill in bytes scanned for pending queries with one query history lookup
+        
+        Uses the existing connection only (the history is per session) and a
+        short statement timeout. Returns the number of queries updated.
+        """
+        with self._pending_costs_lock:
+            query_ids = self._pending_costs[:COST_LOOKUP_BATCH]
+            del self._pending_costs[:COST_LOOKUP_BATCH]
+        conn = self.conn
+        if not query_ids or conn is None:
+            return 0
+        
+        cursor = conn.cursor()
+        try:
+            cursor.execute(get_query_costs_query(query_ids), timeout=COST_LOOKUP_TIMEOUT_SECONDS)
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        
+        updated = 0
+        for query_id, bytes_scanned, elapsed_ms in rows:
+            updated += 1 if self.cost_tracker.update(query_id, bytes_scanned, elapsed_ms) else 0
+        return updated
+    
+    def _remember_result(self, query, results, max_entries=200):
+        """Keep the last good result per query text as an over-budget fallback"""
+        self._fallback_results.pop(query, None)
+        self._fallback_results[query] = results
+        while len(self._fallback_results) > max_entries:
+            self._fallback_results.pop(next(iter(self._fallback_results)))
+    
+    def _over_budget_result(self, query, query_name):
+        """Downgrade an over-budget query to its last good answer, or reject it"""
+        fallback = self._fallback_results.get(query)
+        if fallback is not None:
+            self.logger.warning(f"💸 {query_name} over budget - serving last good result")
+            return fallback.with_notice(f"{query_name}: over cost budget, served cached result")
+        
+        self.logger.warning(f"💸 {query_name} over budget - rejected")
+        return ColumnarResult.empty().with_notice(f"{query_name}: over cost budget, query rejected")
+    
+    def get_query_stats(self):
+        """Bytes scanned / elapsed time per query type"""
+        return self.cost_tracker.summary()
+    
+    def stream_query_batches(self, query, query_name, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Execute SQL query and yield ColumnarResult batches as they arrive
+        
+        Intended for large outputs (e.g. full-ISRC queries) that should be
+        streamed to the client instead of materialized in memory.
+        """
+        conn = self._get_connection()
+        if conn is None:
+            return
+        
+        cursor = conn.cursor()
+        try:
+            yield from self._stream_cursor_batches(cursor, query, query_name, current_query_guard(), batch_size)
+        finally:
+            cursor.close()
+    
+    def _stream_cursor_batches(self, cursor, query, query_name, guard, batch_size):
+        """Run query on an open cursor and yield its batches (see stream_query_batches)"""
+        started = time.monotonic()
+        query_id = self._run_statement(cursor, query, query_name, guard)
+        total = 0
+        for batch in iter_cursor_batches(cursor, batch_size):
+            guard.raise_if_cancelled(query_name)
+            total += len(batch)
+            yield batch
+        self.logger.info(f"✅ {query_name}: {total} results (streamed)")
+        self._record_query_cost(query_name, query_id, started)
+    
+    def stream_isrc_enrichment(self, isrcs, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Enrich an ISRC set with Luminate streams and playlist stats
+        
+        The ISRCs are staged into a temporary table with one multi-row
+        insert per STAGE_INSERT_MAX_ROWS, joined server-side to
+        LUMINATEMONTHLYSTREAMSBYRECORDING and SPOTIFY_PLAYLIST_DATA, and the
+        enriched rows are yielded as ColumnarResult batches in request order.
+        Invalid and duplicate ISRCs are dropped before staging.
+        """
+        from streams_resolver import normalize_isrc
+        
+        staged = list(dict.fromkeys(filter(None, (normalize_isrc(isrc) for isrc in isrcs))))
+        conn = self._get_connection()
+        if conn is None or not staged:
+            return
+        
+        guard = current_query_guard()
+        stage_table = f"ENRICH_ISRCS_{uuid.uuid4().hex[:12].upper()}"
+        cursor = conn.cursor()
+        try:
+            self._run_statement(cursor, get_isrc_stage_table_query(stage_table), "ISRC Staging", guard)
+            for start in range(0, len(staged), STAGE_INSERT_MAX_ROWS):
+                chunk = staged[start:start + STAGE_INSERT_MAX_ROWS]
+                self._run_statement(cursor, get_isrc_stage_insert_query(stage_table, chunk, start), "ISRC Staging", guard)
+            self.logger.info(f"📤 Staged {len(staged)} ISRCs into {stage_table}")
+            
+            # Same cursor: the staging table is only visible to this session
+            yield from self._stream_cursor_batches(
+                cursor, get_isrc_enrichment_query(stage_table), "ISRC Enrichment", guard, batch_size
+            )
+        finally:
+            try:
+                cursor.execute(f"DROP TABLE IF EXISTS {stage_table}")
+            except Exception as e:
+                self.logger.debug(f"Could not drop {stage_table}: {e}")
+            cursor.close()
+    
+    def get_data_version(self):
+        """
+        Return the Luminate table's load timestamp, re-checked at most every
+        DATA_VERSION_CHECK_SECONDS. A new version invalidates cached profiles.
+        """
+        with self._data_version_lock:
+            now = time.monotonic()
+            if self._data_version is not None and now - self._data_version_checked_at < DATA_VERSION_CHECK_SECONDS:
+                return self._data_version
+            
+            rows = self._execute_query(get_data_version_query(), "Data Version")
+            version = str(rows[0].get('DATA_VERSION')) if rows else 'unknown'
+            
+            if self._data_version is not None and version != self._data_version:
+                dropped = self.cache.invalidate(lambda key: key[2] != version)
+                self.logger.info(f"🔄 Luminate data changed ({self._data_version} → {version}), dropped {dropped} cached profiles")
+            
+            self._data_version = version
+            self._data_version_checked_at = now
+            return version
     
     def profile_market_genre(self, market_name, genre):
+        """
+        Return profiling results for a market/genre, served from the shared
+        profile cache when the same (market, genre, data_version) was already run
+        """
+        market_code = convert_market_to_code(market_name)
+        key = (market_code, genre.strip().lower(), self.get_data_version())
+        
+        cached = self.cache.get_or_compute(key, lambda: self._run_profile(market_name, genre))
+        
+        # Shallow copy so callers can annotate the payload without touching the cache
+        results = dict(cached)
+        results['market_display'] = market_name
+        results['genre'] = genre
+        return results
+    
+    def refresh_profile(self, market_name, genre, min_remaining_seconds=0):
+        """
+        Re-run a profile in the background and replace its cache entry
+
+        Skipped while the cached entry has more than min_remaining_seconds
+        left, so pre-warming only pays for profiles about to expire.
+
+        Returns:
+            bool: True when the profile was recomputed
+        """
+        market_code = convert_market_to_code(market_name)
+        key = (market_code, genre.strip().lower(), self.get_data_version())
+        remaining = self.cache.expires_in(key)
+        if remaining is not None and remaining > min_remaining_seconds:
+            return False
+        self.cache.set(key, self._run_profile(market_name, genre))
+        return True
+    
+    def _run_profile(self, market_name, genre):
         """
         Run comprehensive profiling for a market/genre combination
         
@@ -87,42 +419,40 @@ class ProfilingService:
         }
         
         try:
-            # Execute all profiling queries
+            # Execute all profiling queries (results stay columnar until jsonify)
             
             # 1. Summary Statistics
             query = get_summary_stats_query(market_code, genre)
-            summary_results = self._execute_query(query, "Summary Statistics")
+            summary_results = self._execute_query_columnar(query, "Summary Statistics")
             results['summary_stats'] = summary_results[0] if summary_results else {}
+            if summary_results.notice:
+                results['errors'].append(summary_results.notice)
+                results['degraded'] = True
             
             # 2. Playlist Performance
             query = get_playlist_performance_query(market_code, genre)
-            results['playlist_performance'] = self._execute_query(query, "Playlist Performance")
+            results['playlist_performance'] = self._execute_query_columnar(query, "Playlist Performance")
             
             # 3. Most Common Playlists
             query = get_most_common_playlists_query(market_code, genre)
-            results['most_common_playlists'] = self._execute_query(query, "Most Common Playlists")
+            results['most_common_playlists'] = self._execute_query_columnar(query, "Most Common Playlists")
             
             # 4. Timing Analysis
             query = get_timing_analysis_query(market_code, genre)
-            results['timing_analysis'] = self._execute_query(query, "Timing Analysis")
+            results['timing_analysis'] = self._execute_query_columnar(query, "Timing Analysis")
             
             # 5. Seasonality
             query = get_seasonality_query(market_code, genre)
-            results['seasonality'] = self._execute_query(query, "Seasonality")
-            
-            # Check if we have any results
-            total_results = sum([
-                len(results.get('playlist_performance', [])),
-                len(results.get('most_common_playlists', [])),
-                len(results.get('timing_analysis', [])),
-                len(results.get('seasonality', []))
-            ])
-            
-            if total_results == 0:
-                results['status'] = 'no_data'
-                results['message'] = f'No profiling data found for {market_name} {genre}'
-            else:
-                self.logger.info(f"✅ Profiling completed: {total_results} total results")
+            results['seasonality'] = self._execute_query_columnar(query, "Seasonality")
+            
+            # 6. Baseline vs incremental streams (incrementally maintained)
+            results['baseline_analysis'] = self.streams_engine.playlist_summary(market_code)
+            
+            self._collect_notices(results)
+            self._check_profile_results(results, market_name, genre)
+            
+        except QueryCancelled:
+            raise
             
         except Exception as e:
             self.logger.error(f"❌ Profiling failed: {e}")
@@ -132,6 +462,208 @@ class ProfilingService:
         
         return results
     
+    def _collect_notices(self, results):
+        """Surface guardrail downgrades (cached/rejected queries) in the payload"""
+        for value in list(results.values()):
+            notice = getattr(value, 'notice', None)
+            if notice:
+                results['errors'].append(notice)
+                results['degraded'] = True
+    
+    def _check_profile_results(self, results, market_name, genre):
+        """Mark a profile as no_data when every query came back empty"""
+        total_results = sum([
+            len(results.get('playlist_performance', [])),
+            len(results.get('most_common_playlists', [])),
+            len(results.get('timing_analysis', [])),
+            len(results.get('seasonality', []))
+        ])
+        
+        if total_results == 0:
+            results['status'] = 'no_data'
+            results['message'] = f'No profiling data found for {market_name} {genre}'
+        else:
+            self.logger.info(f"✅ Profiling completed: {market_name} - {total_results} total results")
+    
+    def profile_markets_bulk(self, market_names, genres):
+        """
+        Profile many markets for one or more genres with set-based queries
+        
+        Each genre runs the five profiling queries once for all requested
+        territories (Territory IN (...)) and splits the output back into
+        per-market payloads with the same shape as profile_market_genre.
+        Cached markets are yielded immediately; the rest are yielded as soon
+        as their results are available.
+        
+        Yields:
+            dict: One profile_market_genre-shaped payload per (market, genre)
+        """
+        for genre in genres:
+            version = self.get_data_version()
+            pending = []
+            
+            for market_name in market_names:
+                key = (convert_market_to_code(market_name), genre.strip().lower(), version)
+                cached = self.cache.get(key)
+                if cached is not None:
+                    yield dict(cached, market_display=market_name, genre=genre)
+                else:
+                    pending.append(market_name)
+            
+            if not pending:
+                continue
+            
+            for market_name, results in self._run_profiles_bulk(pending, genre):
+                key = (results['market'], genre.strip().lower(), version)
+                self.cache.set(key, results)
+                yield dict(results)
+    
+    def _run_profiles_bulk(self, market_names, genre):
+        """
+        Run the bulk profiling queries for several markets of one genre
+        
+        Yields:
+            tuple: (market_name, results) for every requested market name
+        """
+        codes = []
+        for market_name in market_names:
+            code = convert_market_to_code(market_name)
+            if code not in codes:
+                codes.append(code)
+        
+        self.logger.info(f"🎯 Starting bulk profiling: {len(codes)} territories - {genre}")
+        
+        sections = {}
+        summary_columns = []
+        errors = []
+        notices = []
+        try:
+            # One scan per query type covering all requested territories
+            bulk_queries = [
+                ('summary_stats', get_bulk_summary_stats_query(codes, genre), "Bulk Summary Statistics"),
+                ('playlist_performance', get_bulk_playlist_performance_query(codes, genre), "Bulk Playlist Performance"),
+                ('most_common_playlists', get_bulk_most_common_playlists_query(codes, genre), "Bulk Most Common Playlists"),
+                ('timing_analysis', get_bulk_timing_analysis_query(codes, genre), "Bulk Timing Analysis"),
+                ('seasonality', get_bulk_seasonality_query(codes, genre), "Bulk Seasonality"),
+            ]
+            for section, query, query_name in bulk_queries:
+                section_results = self._execute_query_columnar(query, query_name)
+                if section_results.notice:
+                    notices.append(section_results.notice)
+                sections[section] = section_results.partition_by('territory')
+                if section == 'summary_stats':
+                    summary_columns = [c for c in section_results.columns if c.lower() != 'territory']
+        except QueryCancelled:
+            raise
+        except Exception as e:
+            self.logger.error(f"❌ Bulk profiling failed: {e}")
+            errors.append(f"Profiling error: {e}")
+        
+        for market_name in market_names:
+            market_code = convert_market_to_code(market_name)
+            results = {
+                'status': 'success',
+                'market': market_code,
+                'market_display': market_name,
+                'genre': genre,
+                'errors': list(errors)
+            }
+            
+            if errors:
+                results['status'] = 'error'
+                results['error'] = errors[0]
+                yield market_name, results
+                continue
+            
+            empty = ColumnarResult.empty()
+            summary_results = sections['summary_stats'].get(market_code, empty)
+            # Territories without hits get the zero aggregate row the single-market query returns
+            results['summary_stats'] = summary_results[0] if summary_results else empty_summary_stats(summary_columns)
+            for section in ('playlist_performance', 'most_common_playlists', 'timing_analysis', 'seasonality'):
+                results[section] = sections[section].get(market_code, empty)
+            results['baseline_analysis'] = self.streams_engine.playlist_summary(market_code)
+            
+            if notices:
+                results['errors'].extend(notices)
+                results['degraded'] = True
+            self._check_profile_results(results, market_name, genre)
+            yield market_name, results
+    
+    def get_velocity_tiers(self, market_name, genre):
+        """
+        Playlist velocity tiers for a market from the precomputed indexes
+        
+        Adoption speed comes from the per-ISRC timeline index and streams
+        from the incremental streams engine; both only fetch what changed
+        since their last refresh, so warm calls take milliseconds.
+        SPOTIFY_PLAYLIST_DATA has no genre column, so the tiers cover every
+        ISRC charting in the market (genre is echoed for the caller).
+        """
+        market_code = convert_market_to_code(market_name)
+        started = time.perf_counter()
+        
+        self.adoption_index.refresh()
+        self.streams_engine.refresh(market_code)
+        versions = (self.adoption_index.version, self.streams_engine.territory_version(market_code))
+        
+        cached = self._velocity_tiers.get(market_code)
+        if cached is not None and cached[0] == versions:
+            tiers = cached[1]
+        else:
+            tiers = self.adoption_index.velocity_tiers(self.streams_engine.isrc_streams(market_code))
+            self._velocity_tiers[market_code] = (versions, tiers)
+        
+        return {
+            'status': 'success' if any(tier['songs_count'] for tier in tiers) else 'no_data',
+            'market': market_code,
+            'market_display': market_name,
+            'genre': genre,
+            'velocity_tiers': tiers,
+            'total_songs_analyzed': sum(tier['songs_count'] for tier in tiers),
+            'computed_ms': round((time.perf_counter() - started) * 1000, 1),
+            'index': self.adoption_index.get_stats()
+        }
+    
+    def get_gateway_transitions(self, playlist, top_n=10, target_playlists=None):
+        """
+        Next-playlist destinations and crossover rates for a playlist
+        
+        Args:
+            playlist: playlist_id or playlist name
+            top_n: Number of next destinations to return
+            target_playlists: Optional playlist ids/names counted as crossover targets
+        
+        Returns:
+            dict: Transition summary from the in-memory transition graph
+        """
+        started = time.perf_counter()
+        self.adoption_index.refresh()
+        
+        playlist_id = self._resolve_playlist_id(playlist)
+        targets = [self._resolve_playlist_id(target) for target in target_playlists or []]
+        transitions = self.transition_graph.transitions(playlist_id, top_n, targets) if playlist_id else None
+        
+        if transitions is None:
+            return {'status': 'no_data', 'message': f'No playlist adds found for {playlist}'}
+        
+        transitions['status'] = 'success'
+        transitions['computed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return transitions
+    
+    def get_top_gateways(self, limit=20, min_songs=10):
+        """Playlists whose songs most often move on to another playlist"""
+        self.adoption_index.refresh()
+        return self.transition_graph.top_gateways(limit, min_songs)
+    
+    def _resolve_playlist_id(self, playlist):
+        """Accept a playlist_id or an exact playlist name"""
+        if self.adoption_index.playlist_index(playlist) is not None:
+            return playlist
+        for playlist_id, name in list(self.adoption_index.playlist_names.items()):
+            if name == playlist:
+                return playlist_id
+        return None
+    
     def get_market_insights(self, market_name, genre):
         """
         Get key insights summary for market/genre
@@ -217,7 +749,89 @@ class MockProfilingService(ProfilingService):
     def __init__(self):
         super().__init__(None)
     
-    def profile_market_genre(self, market_name, genre):
+    def get_data_version(self):
+        return 'mock'
+    
+    def _get_connection(self):
+        # Never reach for Snowflake in mock mode
+        return None
+    
+    def _run_profiles_bulk(self, market_names, genre):
+        for market_name in market_names:
+            yield market_name, self._run_profile(market_name, genre)
+    
+    def get_velocity_tiers(self, market_name, genre):
+        """Mock velocity tiers (the velocity_analysis tiers of the mock profile)"""
+        profile = self._run_profile(market_name, genre)
+        tiers = profile['velocity_analysis']['velocity_tiers']
+        return {
+            'status': 'success',
+            'market': profile['market'],
+            'market_display': market_name,
+            'genre': genre,
+            'velocity_tiers': tiers,
+            'total_songs_analyzed': sum(tier['songs_count'] for tier in tiers),
+            'computed_ms': 0.0,
+            'index': {'mock': True}
+        }
+    
+    def get_gateway_transitions(self, playlist, top_n=10, target_playlists=None):
+        """Mock next-playlist destinations, shaped like PlaylistTransitionGraph.transitions"""
+        destinations = [
+            ('mock-top-50', 'Top 50', 89, 21, [12, 20, 31, 18, 6, 2]),
+            ('mock-viral-50', 'Viral 50', 67, 18, [11, 17, 24, 11, 3, 1]),
+            ('mock-new-music-friday', 'New Music Friday', 45, 12, [14, 15, 11, 4, 1, 0]),
+            ('mock-radar', 'Radar', 38, 9, [16, 12, 7, 3, 0, 0]),
+        ]
+        moved_on = sum(frequency for _, _, frequency, _, _ in destinations)
+        songs_added = 241
+        result = {
+            'status': 'success',
+            'playlist_id': playlist,
+            'playlist_name': playlist,
+            'songs_added': songs_added,
+            'songs_moved_on': moved_on,
+            'continuation_rate': round(moved_on / songs_added, 3),
+            'next_playlists': [{
+                'playlist_id': playlist_id,
+                'playlist': name,
+                'frequency': frequency,
+                'share': round(frequency / moved_on, 3),
+                'avg_days': float(avg_days),
+                'latency_histogram': dict(zip(LATENCY_LABELS, histogram)),
+            } for playlist_id, name, frequency, avg_days, histogram in destinations[:top_n]],
+            'computed_ms': 0.0
+        }
+        if target_playlists:
+            targets = set(target_playlists)
+            crossed = [(frequency, avg_days) for playlist_id, name, frequency, avg_days, _ in destinations
+                       if playlist_id in targets or name in targets]
+            crossed_count = sum(frequency for frequency, _ in crossed)
+            result['songs_that_crossed_over'] = crossed_count
+            result['crossover_success_rate'] = round(crossed_count / songs_added, 3)
+            result['avg_days_to_crossover'] = (
+                round(sum(frequency * avg_days for frequency, avg_days in crossed) / crossed_count, 1)
+                if crossed_count else None
+            )
+        return result
+    
+    def get_top_gateways(self, limit=20, min_songs=10):
+        """Mock gateway ranking, shaped like PlaylistTransitionGraph.top_gateways"""
+        gateways = [
+            ('mock-radar', 'Radar', 241, 198),
+            ('mock-pollen', 'POLLEN', 298, 187),
+            ('mock-new-music-friday', 'New Music Friday', 198, 121),
+            ('mock-fresh-finds', 'Fresh Finds', 156, 74),
+        ]
+        return [{
+            'playlist_id': playlist_id,
+            'playlist_name': name,
+            'songs_added': songs_added,
+            'songs_moved_on': moved_on,
+            'continuation_rate': round(moved_on / songs_added, 3),
+        } for playlist_id, name, songs_added, moved_on in gateways if songs_added >= min_songs][:limit]
+    
+    def _run_profile(self, market_name, genre):
         """Return REVOLUTIONARY music intelligence mock data with baseline vs incremental analysis"""
         market_code = convert_market_to_code(market_name)
         
@@ -0,0 +1,201 @@
+"""
+Query guardrails for the profiling layer
+Per-query-type timeouts, cancellation when the deadline passes or the HTTP
+client goes away, and warehouse cost tracking with per-query budgets
+"""
+
+import os
+import select
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+# Statement timeouts in seconds, keyed by the query_name passed to _execute_query
+QUERY_TIMEOUTS = {
+    'Data Version': 15,
+    'Summary Statistics': 60,
+    'Playlist Performance': 120,
+    'Most Common Playlists': 90,
+    'Timing Analysis': 180,
+    'Seasonality': 90,
+    'Bulk Summary Statistics': 180,
+    'Bulk Playlist Performance': 300,
+    'Bulk Most Common Playlists': 240,
+    'Bulk Timing Analysis': 420,
+    'Bulk Seasonality': 240,
+    'Bulk Total Streams': 120,
+    'ISRC Staging': 60,
+    'ISRC Enrichment': 240,
+    'Streams Watermark': 30,
+    'Streams Engine Adds': 300,
+    'Streams Engine Months': 120,
+    'Playlist Adds Watermark': 30,
+    'Playlist First Adds': 300,
+}
+DEFAULT_QUERY_TIMEOUT = int(os.getenv('PROFILE_QUERY_TIMEOUT_SECONDS', '120'))
+
+# Bytes-scanned budgets; a query type whose recent scans exceed its budget is
+# answered from the last good result (or rejected) until the budget recovers
+QUERY_BYTE_BUDGETS = {
+    'Timing Analysis': 40 * 1024 ** 3,
+    'Bulk Timing Analysis': 200 * 1024 ** 3,
+}
+DEFAULT_BYTE_BUDGET = int(os.getenv('PROFILE_QUERY_BYTE_BUDGET', str(100 * 1024 ** 3)))
+
+# After this long an over-budget query type is allowed to run again
+BUDGET_COOLDOWN_SECONDS = int(os.getenv('PROFILE_QUERY_BUDGET_COOLDOWN_SECONDS', '900'))
+
+# Whole-request deadline for profiling endpoints
+REQUEST_DEADLINE_SECONDS = int(os.getenv('PROFILE_REQUEST_DEADLINE_SECONDS', '300'))
+
+POLL_INTERVAL_SECONDS = 0.25
+
+
+class QueryCancelled(Exception):
+    """Raised when a query is cancelled by deadline or client disconnect"""
+
+
+class QueryGuard:
+    """Deadline and cancellation state for the queries of one request"""
+
+    def __init__(self, deadline_seconds=None, cancel_check=None):
+        self.deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+        self.cancel_check = cancel_check
+        self._cancelled = threading.Event()
+        self.reason = None
+
+    def cancel(self, reason='cancelled'):
+        self.reason = self.reason or reason
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        if self._cancelled.is_set():
+            return True
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel('request deadline exceeded')
+        elif self.cancel_check is not None and self.cancel_check():
+            self.cancel('client disconnected')
+        return self._cancelled.is_set()
+
+    def timeout_for(self, query_name):
+        """Per-query-type timeout, capped by what is left of the request deadline"""
+        timeout = QUERY_TIMEOUTS.get(query_name, DEFAULT_QUERY_TIMEOUT)
+        if self.deadline is not None:
+            timeout = min(timeout, max(self.deadline - time.monotonic(), 0))
+        return timeout
+
+    def raise_if_cancelled(self, query_name):
+        if self.cancelled:
+            raise QueryCancelled(f"{query_name}: {self.reason}")
+
+
+_local = threading.local()
+
+
+def current_query_guard():
+    """Guard installed for the current thread (a permissive default if none)"""
+    guard = getattr(_local, 'guard', None)
+    return guard if guard is not None else QueryGuard()
+
+
+@contextmanager
+def query_guard(deadline_seconds=REQUEST_DEADLINE_SECONDS, cancel_check=None):
+    """Install a QueryGuard for every profiling query run in this thread"""
+    previous = getattr(_local, 'guard', None)
+    guard = QueryGuard(deadline_seconds, cancel_check)
+    _local.guard = guard
+    try:
+        yield guard
+    finally:
+        _local.guard = previous
+
+
+def client_disconnect_check(environ):
+    """
+    Build a cancel_check that reports whether the HTTP client has hung up
+
+    Works with servers that expose the client socket in the WSGI environ
+    (werkzeug dev server, gunicorn). Returns None when no socket is available.
+    """
+    sock = environ.get('gunicorn.socket') or environ.get('werkzeug.socket')
+    if sock is None:
+        return None
+
+    def check():
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+            if not readable:
+                return False
+            # Readable with no data means the peer closed the connection
+            return sock.recv(1, socket.MSG_PEEK) == b''
+        except (OSError, ValueError):
+            return True
+
+    return check
+
+
+class QueryCostTracker:
+    """Records bytes scanned and elapsed time per query_name"""
+
+    def __init__(self, window=20):
+        self.window = window
+        self._history = {}  # query_name -> list of recent samples
+        self._lock = threading.Lock()
+
+    def record(self, query_name, query_id=None, bytes_scanned=None, elapsed_ms=None, status='success'):
+        sample = {
+            'query_id': query_id,
+            'bytes_scanned': bytes_scanned,
+            'elapsed_ms': elapsed_ms,
+            'status': status,
+            'recorded_at': time.time(),
+        }
+        with self._lock:
+            samples = self._history.setdefault(query_name, [])
+            samples.append(sample)
+            del samples[:-self.window]
+
+    def update(self, query_id, bytes_scanned=None, elapsed_ms=None):
+        """Fill in warehouse figures for a sample recorded before they were known"""
+        with self._lock:
+            for samples in self._history.values():
+                for sample in samples:
+                    if sample['query_id'] == query_id:
+                        sample['bytes_scanned'] = bytes_scanned
+                        if elapsed_ms is not None:
+                            sample['elapsed_ms'] = elapsed_ms
+                        return True
+        return False
+
+    def is_over_budget(self, query_name):
+        """True when the last scan for this query type exceeded its budget within the cooldown"""
+        budget = QUERY_BYTE_BUDGETS.get(query_name, DEFAULT_BYTE_BUDGET)
+        with self._lock:
+            scans = [s for s in self._history.get(query_name, []) if s['bytes_scanned'] is not None]
+        if not scans:
+            return False
+        last = scans[-1]
+        return last['bytes_scanned'] > budget and time.time() - last['recorded_at'] < BUDGET_COOLDOWN_SECONDS
+
+    def summary(self):
+        with self._lock:
+            history = {name: list(samples) for name, samples in self._history.items()}
+
+        summary = {}
+        for name, samples in history.items():
+            scanned = [s['bytes_scanned'] for s in samples if s['bytes_scanned'] is not None]
+            elapsed = [s['elapsed_ms'] for s in samples if s['elapsed_ms'] is not None]
+            summary[name] = {
+                'runs': len(samples),
+                'cancelled': sum(1 for s in samples if s['status'] == 'cancelled'),
+                'last_bytes_scanned': scanned[-1] if scanned else None,
+                'avg_bytes_scanned': int(sum(scanned) / len(scanned)) if scanned else None,
+                'last_elapsed_ms': elapsed[-1] if elapsed else None,
+                'avg_elapsed_ms': int(sum(elapsed) / len(elapsed)) if elapsed else None,
+                'timeout_seconds': QUERY_TIMEOUTS.get(name, DEFAULT_QUERY_TIMEOUT),
+                'byte_budget': QUERY_BYTE_BUDGETS.get(name, DEFAULT_BYTE_BUDGET),
+                'over_budget': self.is_over_budget(name),
+            }
+        return summary
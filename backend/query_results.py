@@ -0,0 +1,213 @@
+"""
+Columnar query results for the profiling layer
+Keeps warehouse output as column arrays (Arrow when available) and only
+builds per-row dictionaries at the JSON boundary
+"""
+
+DEFAULT_BATCH_SIZE = 50000
+
+_pyarrow = False  # not imported yet; None once known to be missing
+
+
+def _arrow():
+    """pyarrow, imported on first use so app startup does not pay for it (None if not installed)"""
+    global _pyarrow
+    if _pyarrow is False:
+        try:
+            import pyarrow
+        except ImportError:  # pragma: no cover - connector installed without the pandas/arrow extra
+            pyarrow = None
+        _pyarrow = pyarrow
+    return _pyarrow
+
+
+class ColumnarResult:
+    """
+    Column-oriented result set
+
+    Behaves like a read-only list of row dicts (len, indexing, iteration) so
+    existing consumers keep working, but stores the data as one array per
+    column. Call to_rows() only when the payload is serialized.
+    """
+
+    def __init__(self, columns, table=None, arrays=None):
+        self.columns = list(columns)
+        self._table = table
+        self._arrays = arrays if arrays is not None else [[] for _ in self.columns]
+        self.notice = None  # set when a guardrail served a cached/rejected answer
+
+    # ------------------------------------------------------------------
+    # Constructors
+    # ------------------------------------------------------------------
+    @classmethod
+    def empty(cls, columns=()):
+        return cls(columns)
+
+    @classmethod
+    def from_arrow(cls, table):
+        """Wrap a pyarrow.Table without copying"""
+        return cls(table.column_names, table=table)
+
+    @classmethod
+    def from_rows(cls, columns, rows):
+        """Build from DB-API row tuples (fallback when Arrow is unavailable)"""
+        columns = list(columns)
+        if not rows:
+            return cls(columns)
+        return cls(columns, arrays=[list(col) for col in zip(*rows)])
+
+    @classmethod
+    def from_cursor(cls, cursor, batch_size=DEFAULT_BATCH_SIZE):
+        """Drain an executed cursor into a single ColumnarResult"""
+        columns = [desc[0] for desc in cursor.description or []]
+        batches = list(iter_cursor_batches(cursor, batch_size))
+
+        if not batches:
+            return cls(columns)
+        if len(batches) == 1:
+            return batches[0]
+        if all(batch._table is not None for batch in batches):
+            return cls.from_arrow(_arrow().concat_tables([batch._table for batch in batches]))
+
+        arrays = [[] for _ in columns]
+        for batch in batches:
+            for target, source in zip(arrays, batch.column_arrays()):
+                target.extend(source)
+        return cls(columns, arrays=arrays)
+
+    def with_notice(self, notice):
+        """Shallow copy carrying a guardrail notice (the original is left untouched)"""
+        copy = ColumnarResult(self.columns, table=self._table, arrays=self._arrays)
+        copy.notice = notice
+        return copy
+
+    # ------------------------------------------------------------------
+    # Column access
+    # ------------------------------------------------------------------
+    def column(self, name):
+        """Return one column as a Python list"""
+        index = self.columns.index(name)
+        if self._table is not None:
+            return self._table.column(index).to_pylist()
+        return list(self._arrays[index])
+
+    def column_arrays(self):
+        """Return every column as a Python list, in column order"""
+        if self._table is not None:
+            return [self._table.column(i).to_pylist() for i in range(len(self.columns))]
+        return self._arrays
+
+    def to_columns(self):
+        """Column name -> list of values"""
+        return dict(zip(self.columns, self.column_arrays()))
+
+    def partition_by(self, name):
+        """
+        Split into one ColumnarResult per distinct value of a column
+
+        The partition column is matched case-insensitively (Snowflake
+        upper-cases unquoted identifiers) and dropped from each part, so
+        every part has the shape of the equivalent single-partition query.
+        """
+        lookup = {column.lower(): column for column in self.columns}
+        column = lookup.get(name.lower())
+        if column is None or not len(self):
+            return {}
+
+        index = self.columns.index(column)
+        keys = self.column(column)
+        positions = {}
+        for position, key in enumerate(keys):
+            positions.setdefault(key, []).append(position)
+
+        remaining = [c for c in self.columns if c != column]
+        parts = {}
+        if self._table is not None:
+            table = self._table.remove_column(index)
+            for key, rows in positions.items():
+                parts[key] = ColumnarResult.from_arrow(table.take(rows))
+        else:
+            arrays = [a for i, a in enumerate(self._arrays) if i != index]
+            for key, rows in positions.items():
+                parts[key] = ColumnarResult(remaining, arrays=[[a[r] for r in rows] for a in arrays])
+        return parts
+
+    # ------------------------------------------------------------------
+    # Row access (JSON boundary)
+    # ------------------------------------------------------------------
+    def to_rows(self):
+        """Materialize as a list of row dicts"""
+        if self._table is not None:
+            return self._table.to_pylist()
+        return [dict(zip(self.columns, row)) for row in zip(*self._arrays)]
+
+    def iter_rows(self):
+        if self._table is not None:
+            for batch in self._table.to_batches():
+                yield from batch.to_pylist()
+        else:
+            for row in zip(*self._arrays):
+                yield dict(zip(self.columns, row))
+
+    def __len__(self):
+        if self._table is not None:
+            return self._table.num_rows
+        return len(self._arrays[0]) if self._arrays else 0
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __iter__(self):
+        return self.iter_rows()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.to_rows()[index]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('ColumnarResult index out of range')
+        if self._table is not None:
+            return self._table.slice(index, 1).to_pylist()[0]
+        return {name: array[index] for name, array in zip(self.columns, self._arrays)}
+
+    def __repr__(self):
+        backend = 'arrow' if self._table is not None else 'lists'
+        return f"<ColumnarResult {len(self)} rows x {len(self.columns)} columns ({backend})>"
+
+
+def iter_cursor_batches(cursor, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Yield ColumnarResult batches from an executed cursor as they arrive
+
+    Uses the Snowflake connector's Arrow result batches when possible and
+    falls back to fetchmany() for cursors without Arrow support.
+    """
+    columns = [desc[0] for desc in cursor.description or []]
+
+    fetch_arrow_batches = getattr(cursor, 'fetch_arrow_batches', None)
+    if fetch_arrow_batches is not None and _arrow() is not None:
+        try:
+            batches = fetch_arrow_batches()
+        except Exception:
+            # Non-Arrow result format (e.g. JSON results for metadata queries)
+            batches = None
+        if batches is not None:
+            for table in batches:
+                if table is not None and table.num_rows:
+                    yield ColumnarResult.from_arrow(table)
+            return
+
+    # DuckDB exposes Arrow results as a RecordBatchReader instead
+    fetch_record_batch = getattr(cursor, 'fetch_record_batch', None)
+    if fetch_record_batch is not None and _arrow() is not None:
+        for batch in fetch_record_batch(batch_size):
+            if batch.num_rows:
+                yield ColumnarResult.from_arrow(_arrow().Table.from_batches([batch]))
+        return
+
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield ColumnarResult.from_rows(columns, rows)
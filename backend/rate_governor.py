@@ -0,0 +1,198 @@
+"""
+Global outbound rate governor
+One GCRA (generic cell rate algorithm) budget per upstream API, shared by all
+threads and, through a small SQLite file, all worker processes. Callers
+reserve the next slot and sleep only as long as that reservation requires; a
+429's Retry-After pushes the whole upstream back so no worker keeps hammering.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+
+# Shared budget file for all workers (unset = budgets are per process)
+RATE_GOVERNOR_PATH = os.getenv('RATE_GOVERNOR_PATH')
+
+# Sustained requests per second and burst size per upstream
+BUDGETS = {
+    'spotify': (float(os.getenv('SPOTIFY_RATE_PER_SECOND', '10')), int(os.getenv('SPOTIFY_RATE_BURST', '10'))),
+    'apple_catalog': (float(os.getenv('APPLE_CATALOG_RATE_PER_SECOND', '5')),
+                      int(os.getenv('APPLE_CATALOG_RATE_BURST', '5'))),
+    'apple_search': (float(os.getenv('APPLE_SEARCH_RATE_PER_SECOND', '5')),
+                     int(os.getenv('APPLE_SEARCH_RATE_BURST', '5'))),
+}
+
+# 429 handling: Retry-After when given (capped), otherwise a short default pause
+DEFAULT_RETRY_AFTER_SECONDS = 1.0
+MAX_RETRY_AFTER_SECONDS = 60.0
+MAX_THROTTLED_RETRIES = 3
+
+
+def retry_after_seconds(response):
+    """Pause requested by a 429 response (Retry-After in seconds; HTTP dates fall back to the default)"""
+    value = response.headers.get('Retry-After')
+    try:
+        delay = float(value) if value is not None else DEFAULT_RETRY_AFTER_SECONDS
+    except ValueError:
+        delay = DEFAULT_RETRY_AFTER_SECONDS
+    return min(max(delay, 0.0), MAX_RETRY_AFTER_SECONDS)
+
+
+class RateGovernor:
+    """Per-upstream GCRA budgets; state is one theoretical arrival time (TAT) per upstream"""
+
+    def __init__(self, budgets=None, path=RATE_GOVERNOR_PATH):
+        """
+        Args:
+            budgets: {upstream: (requests_per_second, burst)}; defaults to BUDGETS
+            path: Optional SQLite file shared by worker processes (in-process state when None)
+        """
+        self.budgets = dict(budgets or BUDGETS)
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+        self._tat = {}  # upstream -> TAT, without a path
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            self._connect()
+        self.stats = {upstream: {'granted': 0, 'delayed': 0, 'waited_seconds': 0.0, 'throttled': 0, 'released': 0}
+                      for upstream in self.budgets}
+
+    def _connect(self):
+        # Autocommit mode so each update is one explicit BEGIN IMMEDIATE transaction
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS rate_budgets (upstream TEXT PRIMARY KEY, tat REAL)")
+
+    def reopen(self):
+        """New connection and lock after fork"""
+        self._lock = threading.Lock()
+        if self.path:
+            self._connect()
+
+    def _update(self, upstream, step):
+        """Atomically replace upstream's TAT with step(tat, now) -> (new_tat, result)"""
+        with self._lock:
+            now = time.time()
+            if self._conn is None:
+                self._tat[upstream], result = step(self._tat.get(upstream, now), now)
+                return result
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT tat FROM rate_budgets WHERE upstream = ?", (upstream,)).fetchone()
+                tat, result = step(row[0] if row else now, now)
+                self._conn.execute("INSERT OR REPLACE INTO rate_budgets (upstream, tat) VALUES (?, ?)",
+                                   (upstream, tat))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return result
+
+    def _interval(self, upstream):
+        rate, burst = self.budgets[upstream]
+        interval = 1.0 / rate
+        return interval, interval * (burst - 1)
+
+    def reserve(self, upstream):
+        """
+        Reserve the next request slot for upstream without sleeping
+
+        Returns:
+            float: Seconds the caller must wait before sending (0 when within budget)
+        """
+        interval, tolerance = self._interval(upstream)
+
+        def step(tat, now):
+            tat = max(tat, now)
+            return tat + interval, max(tat - tolerance - now, 0.0)
+
+        wait = self._update(upstream, step)
+        stats = self.stats[upstream]
+        stats['granted'] += 1
+        if wait > 0:
+            stats['delayed'] += 1
+            stats['waited_seconds'] += wait
+        return wait
+
+    def release(self, upstream, wait=0.0):
+        """Give back a slot from reserve() (which returned wait) that the caller gave up instead of waiting for"""
+        interval, _ = self._interval(upstream)
+        self._update(upstream, lambda tat, now: (tat - interval, None))
+        stats = self.stats[upstream]
+        stats['granted'] -= 1
+        stats['released'] += 1
+        if wait > 0:
+            stats['delayed'] -= 1
+            stats['waited_seconds'] -= wait
+
+    def acquire(self, upstream):
+        """Block until a request to upstream fits its budget; returns the seconds waited"""
+        wait = self.reserve(upstream)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def penalize(self, upstream, retry_after):
+        """Hold every caller of upstream back for retry_after seconds (after a 429)"""
+        _, tolerance = self._interval(upstream)
+        # Nothing is allowed before now + retry_after, and the burst restarts empty
+        self._update(upstream, lambda tat, now: (max(tat, now + retry_after + tolerance), None))
+        self.stats[upstream]['throttled'] += 1
+        self.logger.warning(f"⏳ {upstream} rate limited, pausing all workers for {retry_after:.1f}s")
+
+    def request(self, upstream, method, url, **kwargs):
+        """
+        requests.request() within upstream's budget, retrying 429s after their Retry-After
+
+        Returns:
+            requests.Response: The last response (still a 429 when retries ran out)
+        """
+        for attempt in range(MAX_THROTTLED_RETRIES + 1):
+            self.acquire(upstream)
+            response = requests.request(method, url, **kwargs)
+            if response.status_code != 429 or attempt == MAX_THROTTLED_RETRIES:
+                return response
+            self.penalize(upstream, retry_after_seconds(response))
+
+    def get(self, upstream, url, **kwargs):
+        return self.request(upstream, 'GET', url, **kwargs)
+
+    def get_stats(self):
+        """Budget use per upstream: outstanding reserved slots, backlog and 429 counts"""
+        now = time.time()
+        with self._lock:
+            if self._conn is None:
+                tats = dict(self._tat)
+            else:
+                tats = dict(self._conn.execute("SELECT upstream, tat FROM rate_budgets").fetchall())
+        report = {}
+        for upstream, (rate, burst) in self.budgets.items():
+            backlog = max(tats.get(upstream, now) - now, 0.0)
+            report[upstream] = dict(
+                self.stats[upstream],
+                waited_seconds=round(self.stats[upstream]['waited_seconds'], 2),
+                rate_per_second=rate,
+                burst=burst,
+                slots_in_use=round(backlog * rate, 1),
+                backlog_seconds=round(max(backlog - (burst - 1) / rate, 0.0), 2),
+            )
+        return {'shared': self._conn is not None, 'upstreams': report}
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_rate_governor():
+    """Process-wide governor (shared with other workers through RATE_GOVERNOR_PATH)"""
+    global _governor
+    if _governor is None:
+        with _governor_lock:
+            if _governor is None:
+                _governor = RateGovernor()
+    return _governor
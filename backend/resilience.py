@@ -0,0 +1,216 @@
+"""
+Retries and circuit breakers for upstream GET requests
+Idempotent GETs to Spotify and Apple Music are retried with exponential
+backoff and full jitter on connection errors, timeouts, broken response
+bodies, 5xx and 429 (whose Retry-After goes through the rate governor).
+A per-upstream circuit breaker opens after consecutive failures so requests
+fail fast instead of holding worker threads in timeouts, and lets one probe
+through after a cool-down.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+
+import requests
+
+from rate_governor import get_rate_governor, retry_after_seconds
+
+RETRY_MAX_ATTEMPTS = int(os.getenv('UPSTREAM_RETRY_ATTEMPTS', '3'))
+RETRY_BASE_SECONDS = 0.25
+RETRY_MAX_DELAY_SECONDS = 4.0
+
+# Longest a single call may spend across all of its attempts
+RETRY_DEADLINE_SECONDS = int(os.getenv('UPSTREAM_RETRY_DEADLINE_SECONDS', '20'))
+
+# (connect, read) timeouts for every upstream request
+CONNECT_TIMEOUT_SECONDS = 3.05
+READ_TIMEOUT_SECONDS = int(os.getenv('UPSTREAM_READ_TIMEOUT_SECONDS', '10'))
+
+# Consecutive failures that open a breaker, and how long it stays open
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', '5'))
+BREAKER_RESET_SECONDS = int(os.getenv('BREAKER_RESET_SECONDS', '30'))
+
+# Request errors worth another attempt (the body can break off after the headers arrived)
+TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout,
+                    requests.exceptions.ChunkedEncodingError, requests.exceptions.ContentDecodingError)
+
+
+class UpstreamUnavailable(requests.RequestException):
+    """Upstream failed after retries, or its circuit breaker is open"""
+
+    def __init__(self, upstream, reason):
+        super().__init__(f"{upstream} unavailable: {reason}")
+        self.upstream = upstream
+        self.reason = reason
+
+
+def backoff_delay(attempt, base=RETRY_BASE_SECONDS, cap=RETRY_MAX_DELAY_SECONDS):
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2^attempt)]"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def is_transient_status(status_code):
+    return status_code == 429 or status_code >= 500
+
+
+class CircuitBreaker:
+    """Closed -> open after threshold consecutive failures -> half-open probe after reset_seconds"""
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_seconds=BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.logger = logging.getLogger(__name__)
+        self._state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.stats = {'opened': 0, 'rejected': 0, 'failures': 0, 'successes': 0}
+
+    def allow(self):
+        """True when a request may be sent (at most one probe while half-open)"""
+        with self._lock:
+            if self._state == 'open' and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self._state = 'half_open'
+                self._probing = False
+            if self._state == 'closed' or (self._state == 'half_open' and not self._probing):
+                self._probing = self._state == 'half_open'
+                return True
+            self.stats['rejected'] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.stats['successes'] += 1
+            if self._state != 'closed':
+                self.logger.info(f"✅ {self.name} circuit closed")
+            self._state = 'closed'
+            self._failures = 0
+            self._probing = False
+
+    def release_probe(self):
+        """An allowed call ended without an outcome (cancelled, or failed outside the upstream)"""
+        with self._lock:
+            # Free the half-open probe so the next call can try; closed/open state is unchanged
+            if self._state == 'half_open':
+                self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.stats['failures'] += 1
+            self._failures += 1
+            if self._state == 'half_open' or (self._state == 'closed' and self._failures >= self.failure_threshold):
+                self._state = 'open'
+                self._opened_at = time.monotonic()
+                self._probing = False
+                self.stats['opened'] += 1
+                self.logger.warning(f"🔌 {self.name} circuit open for {self.reset_seconds}s "
+                                    f"after {self._failures} failures")
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == 'open' and time.monotonic() - self._opened_at >= self.reset_seconds:
+                return 'half_open'
+            return self._state
+
+    def get_stats(self):
+        return dict(self.stats, state=self.state, consecutive_failures=self._failures)
+
+
+class ResilientUpstreams:
+    """Rate-governed, retried, circuit-broken GETs per upstream"""
+
+    def __init__(self, rate_governor=None, max_attempts=RETRY_MAX_ATTEMPTS, deadline_seconds=RETRY_DEADLINE_SECONDS):
+        self.rate_governor = rate_governor or get_rate_governor()
+        self.max_attempts = max_attempts
+        self.deadline_seconds = deadline_seconds
+        self.timeout = (CONNECT_TIMEOUT_SECONDS, READ_TIMEOUT_SECONDS)
+        self.logger = logging.getLogger(__name__)
+        self.breakers = {upstream: CircuitBreaker(upstream) for upstream in self.rate_governor.budgets}
+        self.stats = {'requests': 0, 'retries': 0, 'gave_up': 0}
+
+    def get(self, upstream, url, **kwargs):
+        """
+        GET url within upstream's rate budget, retrying transient failures
+
+        Returns:
+            requests.Response: The first non-transient response (2xx, 304, 4xx)
+
+        Raises:
+            UpstreamUnavailable: The breaker is open, or every attempt failed transiently
+            requests.RequestException: A request error not worth retrying (counted as a failure)
+        """
+        breaker = self.breakers[upstream]
+        kwargs.setdefault('timeout', self.timeout)
+        deadline = time.monotonic() + self.deadline_seconds
+        reason = None
+        for attempt in range(self.max_attempts):
+            if not breaker.allow():
+                raise UpstreamUnavailable(upstream, reason or 'circuit open')
+            try:
+                wait = self.rate_governor.reserve(upstream)
+                if wait > 0 and time.monotonic() + wait >= deadline:
+                    # Waiting out the budget (e.g. a long Retry-After) would overrun the deadline
+                    self.rate_governor.release(upstream, wait)
+                    breaker.release_probe()
+                    reason = f"rate limited for {wait:.1f}s"
+                    break
+                if wait > 0:
+                    time.sleep(wait)
+                self.stats['requests'] += 1
+                response = requests.get(url, **kwargs)
+            except TRANSIENT_ERRORS as e:
+                reason = type(e).__name__
+                breaker.record_failure()
+                response = None
+            except requests.RequestException:
+                # Not worth retrying (e.g. a redirect loop), but still a failed call to this upstream
+                breaker.record_failure()
+                raise
+            except BaseException:
+                breaker.release_probe()
+                raise
+            else:
+                if not is_transient_status(response.status_code):
+                    breaker.record_success()
+                    return response
+                reason = f"HTTP {response.status_code}"
+                if response.status_code == 429:
+                    # Rate limited, not degraded: the governor holds every caller back instead
+                    breaker.record_success()
+                    self.rate_governor.penalize(upstream, retry_after_seconds(response))
+                else:
+                    breaker.record_failure()
+
+            if attempt + 1 < self.max_attempts:
+                delay = 0 if response is not None and response.status_code == 429 else backoff_delay(attempt)
+                if time.monotonic() + delay >= deadline:
+                    break
+                self.stats['retries'] += 1
+                time.sleep(delay)
+
+        self.stats['gave_up'] += 1
+        self.logger.warning(f"⚠️ {upstream} GET failed after retries ({reason}): {url}")
+        raise UpstreamUnavailable(upstream, reason)
+
+    def get_stats(self):
+        return dict(self.stats, breakers={name: breaker.get_stats() for name, breaker in self.breakers.items()})
+
+
+_upstreams = None
+_upstreams_lock = threading.Lock()
+
+
+def get_upstreams():
+    """Process-wide resilient upstream client (breakers are per process)"""
+    global _upstreams
+    if _upstreams is None:
+        with _upstreams_lock:
+            if _upstreams is None:
+                _upstreams = ResilientUpstreams()
+    return _upstreams
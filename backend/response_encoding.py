@@ -0,0 +1,144 @@
+"""
+Response encoding: fast JSON, negotiated compression and a compact row envelope
+orjson serializes responses when installed (stdlib json otherwise), large
+JSON responses are gzip / brotli compressed according to Accept-Encoding,
+and row arrays can be sent as {"columns": [...], "rows": [[...], ...]} so
+each key is sent once instead of once per row.
+"""
+
+import gzip
+import os
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+from query_results import ColumnarResult
+
+try:
+    import orjson
+except ImportError:  # stdlib json through DefaultJSONProvider
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed (headers would eat the saving)
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', '1024'))
+
+# Fast settings: a 50k-track response is compressed in tens of milliseconds
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', '5'))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', '4'))
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    orjson-backed JSON provider that expands columnar query results into rows
+
+    Types orjson does not handle natively (Decimal, and dates, which are kept
+    in Flask's format) go through DefaultJSONProvider.default.
+    """
+
+    # Keys stay in insertion order (track fields read naturally, and sorting costs CPU)
+    sort_keys = False
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, ColumnarResult):
+            return o.to_rows()
+        return DefaultJSONProvider.default(o)
+
+    def _dumps_bytes(self, obj):
+        return orjson.dumps(obj, default=self.default,
+                            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            kwargs.setdefault('default', self.default)
+            return super().dumps(obj, **kwargs)
+        return self._dumps_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        # Bytes straight into the response, skipping the str round trip
+        return self._app.response_class(self._dumps_bytes(obj) + b"\n", mimetype=self.mimetype)
+
+
+def wants_columns():
+    """True when the client asked for the compact envelope (?format=columns or "format": "columns")"""
+    if request.args.get('format') == 'columns':
+        return True
+    body = request.get_json(silent=True)
+    return isinstance(body, dict) and body.get('format') == 'columns'
+
+
+def columns_envelope(rows):
+    """
+    Row dicts as {"columns": [...], "rows": [[...], ...]}
+
+    Columns are every key in first-seen order; rows missing a key get null.
+    """
+    columns = {}
+    for row in rows:
+        for key in row:
+            columns.setdefault(key, None)
+    names = list(columns)
+    if all(list(row) == names for row in rows):
+        values = [list(row.values()) for row in rows]
+    else:
+        values = [[row.get(name) for name in names] for row in rows]
+    return {'columns': names, 'rows': values}
+
+
+def encode_rows(rows):
+    """Rows in the representation the client negotiated (plain list unless columns were requested)"""
+    return columns_envelope(rows) if wants_columns() else rows
+
+
+def negotiate_encoding():
+    """Best Content-Encoding the client accepts: br (when brotli is installed), gzip, or None"""
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return request.accept_encodings.best_match(offered)
+
+
+def compress_body(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def compress_response(response):
+    """after_request hook: compress large, complete JSON / text bodies"""
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or not (response.mimetype or '').startswith(COMPRESSIBLE_MIMETYPES)):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+
+    response.set_data(compress_body(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_app(app):
+    """Install the fast JSON provider and response compression on app"""
+    app.json = FastJSONProvider(app)
+    app.after_request(compress_response)
@@ -0,0 +1,261 @@
+"""
+Short-lived server-side result sets with opaque cursors
+Large endpoint results (harvested playlist tracks, writer credits) are
+appended here as they are produced and read back one page at a time, so the
+first page can be served while the rest is still being harvested and no
+response has to carry the whole array. Rows live in a SQLite file shared by
+all worker processes and expire RESULT_TTL_SECONDS after their last write.
+"""
+
+import base64
+import json
+import logging
+import os
+import secrets
+import sqlite3
+import tempfile
+import threading
+import time
+
+RESULT_STORE_PATH = os.getenv(
+    'RESULT_STORE_PATH', os.path.join(tempfile.gettempdir(), 'music-intelligence-results.sqlite3')
+)
+
+# Result sets (and their cursors) expire this long after they were last written
+RESULT_TTL_SECONDS = int(os.getenv('RESULT_TTL_SECONDS', '1800'))
+
+# Page sizes: used when the client gives none, and the largest accepted
+DEFAULT_PAGE_SIZE = int(os.getenv('RESULT_PAGE_SIZE', '100'))
+MAX_PAGE_SIZE = int(os.getenv('RESULT_MAX_PAGE_SIZE', '1000'))
+
+# Longest a page request waits for rows that are still being produced
+PAGE_WAIT_SECONDS = int(os.getenv('RESULT_PAGE_WAIT_SECONDS', '10'))
+
+# A running result set with no writes for this long lost its producer (worker restarted)
+STALLED_SECONDS = int(os.getenv('RESULT_STALLED_SECONDS', '300'))
+
+POLL_SECONDS = 0.05
+PURGE_INTERVAL_SECONDS = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS result_sets (
+    result_id TEXT PRIMARY KEY,
+    kind TEXT,
+    status TEXT,
+    row_count INTEGER,
+    summary_json TEXT,
+    error TEXT,
+    created_at REAL,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS result_rows (
+    result_id TEXT,
+    seq INTEGER,
+    row_json TEXT,
+    PRIMARY KEY (result_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+def encode_cursor(result_id, offset, limit):
+    """Opaque cursor for the page of limit rows starting at offset"""
+    raw = json.dumps([result_id, offset, limit], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    (result_id, offset, limit) from a cursor
+
+    Raises:
+        ValueError: The cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        result_id, offset, limit = json.loads(raw)
+    except (TypeError, ValueError) as e:
+        raise ValueError('invalid cursor') from e
+    if not isinstance(result_id, str) or not isinstance(offset, int) or not isinstance(limit, int) or offset < 0:
+        raise ValueError('invalid cursor')
+    return result_id, offset, clamp_page_size(limit)
+
+
+def clamp_page_size(page_size):
+    """page_size as an int within [1, MAX_PAGE_SIZE] (DEFAULT_PAGE_SIZE when missing or invalid)"""
+    try:
+        page_size = int(page_size)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return min(max(page_size, 1), MAX_PAGE_SIZE)
+
+
+class ResultStore:
+    """SQLite-backed result sets that are written incrementally and read by cursor"""
+
+    def __init__(self, path=RESULT_STORE_PATH, ttl_seconds=RESULT_TTL_SECONDS, dumps=json.dumps, loads=json.loads):
+        """
+        Args:
+            path: SQLite file shared by worker processes (':memory:' for a per-process store)
+            ttl_seconds: Lifetime of a result set after its last write
+            dumps: Row serializer (e.g. app.json.dumps)
+            loads: Matching deserializer
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.dumps = dumps
+        self.loads = loads
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._purged_at = 0.0
+        self._connect()
+        self.stats = {'created': 0, 'completed': 0, 'failed': 0, 'rows_written': 0, 'pages_served': 0,
+                      'purged': 0}
+
+    def _connect(self):
+        # WAL + busy timeout: the producing worker writes while any worker serves pages
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+        self._conn.row_factory = sqlite3.Row
+        if self.path != ':memory:':
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def reopen(self):
+        """New connection after fork (SQLite connections must not cross processes)"""
+        self._lock = threading.Lock()
+        self._connect()
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+    def create(self, kind):
+        """Start an empty, running result set; returns its id"""
+        self.purge_expired()
+        result_id = secrets.token_urlsafe(12)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO result_sets (result_id, kind, status, row_count, created_at, updated_at) "
+                "VALUES (?, ?, 'running', 0, ?, ?)",
+                (result_id, kind, now, now)
+            )
+        self.stats['created'] += 1
+        return result_id
+
+    def append(self, result_id, rows):
+        """Add rows to the end of a running result set"""
+        rows = list(rows)
+        encoded = [self.dumps(row) for row in rows]
+        with self._lock, self._conn:
+            start = self._conn.execute(
+                "SELECT row_count FROM result_sets WHERE result_id = ?", (result_id,)
+            ).fetchone()['row_count']
+            self._conn.executemany(
+                "INSERT INTO result_rows (result_id, seq, row_json) VALUES (?, ?, ?)",
+                [(result_id, start + i, row_json) for i, row_json in enumerate(encoded)]
+            )
+            self._conn.execute(
+                "UPDATE result_sets SET row_count = ?, updated_at = ? WHERE result_id = ?",
+                (start + len(encoded), time.time(), result_id)
+            )
+        self.stats['rows_written'] += len(encoded)
+
+    def finish(self, result_id, summary=None):
+        """Mark a result set complete, with the summary returned alongside its pages"""
+        self._close(result_id, 'complete', summary=self.dumps(summary or {}))
+        self.stats['completed'] += 1
+
+    def fail(self, result_id, error):
+        self._close(result_id, 'failed', error=str(error))
+        self.stats['failed'] += 1
+
+    def _close(self, result_id, status, summary=None, error=None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE result_sets SET status = ?, summary_json = ?, error = ?, updated_at = ? WHERE result_id = ?",
+                (status, summary, error, time.time(), result_id)
+            )
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+    def info(self, result_id):
+        """Status of a result set ({kind, status, row_count, summary, error}), None when unknown or expired"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM result_sets WHERE result_id = ?", (result_id,)).fetchone()
+        now = time.time()
+        if row is None or now - row['updated_at'] > self.ttl_seconds:
+            return None
+        status, error = row['status'], row['error']
+        if status == 'running' and now - row['updated_at'] > STALLED_SECONDS:
+            status, error = 'failed', 'result producer stopped'
+        return {
+            'kind': row['kind'],
+            'status': status,
+            'row_count': row['row_count'],
+            'summary': self.loads(row['summary_json']) if row['summary_json'] else None,
+            'error': error,
+        }
+
+    def rows(self, result_id, offset, limit):
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT row_json FROM result_rows WHERE result_id = ? AND seq >= ? ORDER BY seq LIMIT ?",
+                (result_id, offset, limit)
+            )
+            return [self.loads(row['row_json']) for row in cursor]
+
+    def page(self, result_id, offset=0, limit=DEFAULT_PAGE_SIZE, wait_seconds=PAGE_WAIT_SECONDS):
+        """
+        One page of a result set, waiting up to wait_seconds for rows still being produced
+
+        Returns:
+            dict: rows, status, rows_available, next_cursor (None after the last page) and,
+                  once complete, the summary; None when the result set is unknown or expired
+        """
+        deadline = time.monotonic() + wait_seconds
+        info = self.info(result_id)
+        while (info is not None and info['status'] == 'running' and info['row_count'] < offset + limit
+               and time.monotonic() < deadline):
+            time.sleep(POLL_SECONDS)
+            info = self.info(result_id)
+        if info is None:
+            return None
+
+        rows = self.rows(result_id, offset, limit)
+        end = offset + len(rows)
+        more = info['status'] == 'running' or end < info['row_count']
+        self.stats['pages_served'] += 1
+        return {
+            'result_id': result_id,
+            'status': info['status'],
+            'complete': info['status'] == 'complete',
+            'error': info['error'],
+            'offset': offset,
+            'rows': rows,
+            'rows_available': info['row_count'],
+            'next_cursor': encode_cursor(result_id, end, limit) if more and info['status'] != 'failed' else None,
+            'summary': info['summary'],
+        }
+
+    def purge_expired(self):
+        """Drop result sets past their TTL (at most once per PURGE_INTERVAL_SECONDS)"""
+        now = time.time()
+        if now - self._purged_at < PURGE_INTERVAL_SECONDS:
+            return
+        self._purged_at = now
+        with self._lock, self._conn:
+            expired = [row['result_id'] for row in self._conn.execute(
+                "SELECT result_id FROM result_sets WHERE updated_at < ?", (now - self.ttl_seconds,)
+            )]
+            for result_id in expired:
+                self._conn.execute("DELETE FROM result_rows WHERE result_id = ?", (result_id,))
+                self._conn.execute("DELETE FROM result_sets WHERE result_id = ?", (result_id,))
+        self.stats['purged'] += len(expired)
+
+    def get_stats(self):
+        with self._lock:
+            counts = dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM result_sets WHERE updated_at >= ? GROUP BY status",
+                (time.time() - self.ttl_seconds,)
+            ).fetchall())
+        return dict(self.stats, live=counts, path=self.path, ttl_seconds=self.ttl_seconds)
@@ -1,16 +1,28 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-import jwt
 import time
 import requests
 import json
 import os
 import base64
+import threading
 from dotenv import load_dotenv
+import response_encoding
+from response_encoding import encode_rows
+from query_guardrails import QueryCancelled, client_disconnect_check, query_guard
+from market_registry import get_markets, get_market_registry
+from playlist_scoring import select_candidates
+from playlist_store import PlaylistStore, format_playlist_track
+from rate_governor import get_rate_governor
+from resilience import UpstreamUnavailable, get_upstreams
+from result_store import ResultStore, clamp_page_size, decode_cursor
 
 load_dotenv()
 
+
 app = Flask(__name__)
+# orjson provider (columnar results expanded to rows) + gzip / brotli for large responses
+response_encoding.init_app(app)
 CORS(app)
 
 # Spotify credentials
@@ -28,6 +40,8 @@ with open(PRIVATE_KEY_PATH, "r") as f:
 
 def generate_apple_music_token():
     """Generate JWT token for Apple Music API - YOUR EXACT WORKING CODE"""
+    import jwt  # deferred: pulls in cryptography, which dominates import time
+
     payload = {
         'iss': TEAM_ID,
         'iat': int(time.time()),
@@ -41,15 +55,37 @@ def generate_apple_music_token():
         headers={'kid': KEY_ID, 'alg': 'ES256'}
     )
 
+# Outbound Spotify / Apple Music budgets, shared by all threads and workers (RATE_GOVERNOR_PATH)
+rate_governor = get_rate_governor()
+
+# Retried, circuit-broken GETs on top of the governor (fail fast while an upstream is degraded)
+upstreams = get_upstreams()
+
+# Playlist metadata (followers, snapshot_id, ...) and harvested tracks
+playlist_store = PlaylistStore()
+
+# Paginated track / writer-credit results, readable by cursor from any worker
+result_store = ResultStore(dumps=app.json.dumps, loads=app.json.loads)
+
+# Client-credentials token reused until shortly before it expires
+_spotify_token = {'value': None, 'expires_at': 0.0}
+_spotify_token_lock = threading.Lock()
+
 def get_spotify_token():
-    """Get Spotify access token"""
-    auth = base64.b64encode(f"{CLIENT_ID}:{CLIENT_SECRET}".encode()).decode()
-    res = requests.post(
-        "https://accounts.spotify.com/api/token",
-        headers={"Authorization": f"Basic {auth}"},
-        data={"grant_type": "client_credentials"}
-    )
-    return res.json()["access_token"]
+    """Get Spotify access token (cached until 60s before expiry)"""
+    with _spotify_token_lock:
+        if _spotify_token['value'] and time.time() < _spotify_token['expires_at']:
+            return _spotify_token['value']
+        auth = base64.b64encode(f"{CLIENT_ID}:{CLIENT_SECRET}".encode()).decode()
+        res = requests.post(
+            "https://accounts.spotify.com/api/token",
+            headers={"Authorization": f"Basic {auth}"},
+            data={"grant_type": "client_credentials"}
+        )
+        payload = res.json()
+        _spotify_token['value'] = payload["access_token"]
+        _spotify_token['expires_at'] = time.time() + payload.get("expires_in", 3600) - 60
+        return _spotify_token['value']
 
 def search_apple_music_by_isrc(isrc):
     """Enhanced lookup with IPI extraction - YOUR EXACT PRODUCTION CODE"""
@@ -66,7 +102,7 @@ def search_apple_music_by_isrc(isrc):
     }
 
     try:
-        response = requests.get(url, headers=headers, params=params)
+        response = upstreams.get('apple_catalog', url, headers=headers, params=params)
         
         if response.status_code == 200:
             data = response.json()
@@ -110,7 +146,8 @@ def search_apple_music_by_isrc(isrc):
                                 'limit': 5
                             }
                             
-                            search_response = requests.get(
+                            search_response = upstreams.get(
+                                'apple_search',
                                 "https://api.music.apple.com/v1/catalog/us/search",
                                 headers=headers,
                                 params=search_params
@@ -140,8 +177,10 @@ def search_apple_music_by_isrc(isrc):
                                             result['all_ipi_numbers'].append(writer_ipi)
                                             break
                             
-                            time.sleep(0.1)  # Rate limiting for writer searches
-                            
+                        except UpstreamUnavailable as e:
+                            print(f"Writer search unavailable for {writer}: {e}")
+                            result['writer_search_incomplete'] = True
+                            continue
                         except Exception as e:
                             print(f"Error searching for writer {writer}: {e}")
                             continue
@@ -169,10 +208,27 @@ def search_apple_music_by_isrc(isrc):
             print(f"Apple Music API error for ISRC {isrc}: {response.status_code}")
             return {'api_status': 'error', 'isrc': isrc}
             
+    except UpstreamUnavailable as e:
+        # Transient: retries exhausted or the breaker is open, worth asking again later
+        print(f"Apple Music unavailable for ISRC {isrc}: {e}")
+        return {'api_status': 'unavailable', 'isrc': isrc, 'error': str(e)}
+        
     except Exception as e:
         print(f"Error searching Apple Music for ISRC {isrc}: {e}")
         return {'api_status': 'error', 'isrc': isrc, 'error': str(e)}
 
+# Async Spotify / Apple Music client on one shared event loop (SPOTIFY_ASYNC=0 keeps the blocking path)
+try:
+    from async_spotify import AsyncBridge, AsyncMusicClient
+    if os.getenv('SPOTIFY_ASYNC', '1') == '1':
+        async_bridge = AsyncBridge()
+        music_client = AsyncMusicClient(get_spotify_token, generate_apple_music_token, playlist_store)
+    else:
+        async_bridge = music_client = None
+except ImportError as e:
+    async_bridge = music_client = None
+    print(f"⚠️ Async Spotify client unavailable, using blocking requests: {e}")
+
 @app.route('/api/test', methods=['GET'])
 def test():
     """Test both token generation and ISRC search"""
@@ -195,327 +251,32 @@ def test():
             'error': str(e)
         }), 500
 
-def get_playlists_from_category(market, genre, token):
-    """Universal playlist discovery system - works intelligently for ALL markets and genres"""
-    
-    # Market configurations with local terms
-    market_config = {
-        'France': {
-            'code': 'FR',
-            'terms': ['français', 'french', 'france', 'fr'],
-            'genre_translations': {
-                'hip-hop': ['rap français', 'rap fr', 'rappeur français'],
-                'pop': ['pop français', 'chanson française', 'pop fr'],
-                'electronic': ['électro français', 'french electronic', 'électro fr'],
-                'rock': ['rock français', 'french rock', 'rock fr'],
-                'r&b': ['rnb français', 'french rnb', 'rnb fr']
-            }
-        },
-        'Germany': {
-            'code': 'DE',
-            'terms': ['deutsch', 'german', 'deutschland', 'de'],
-            'genre_translations': {
-                'hip-hop': ['deutscher rap', 'rap deutsch', 'german rap'],
-                'pop': ['deutscher pop', 'german pop', 'pop deutsch'],
-                'electronic': ['deutsche elektronik', 'german electronic', 'techno deutsch'],
-                'rock': ['deutscher rock', 'german rock', 'rock deutsch'],
-                'r&b': ['deutscher rnb', 'german rnb', 'rnb deutsch']
-            }
-        },
-        'Spain': {
-            'code': 'ES',
-            'terms': ['español', 'spanish', 'españa', 'es'],
-            'genre_translations': {
-                'hip-hop': ['rap español', 'rap españa', 'spanish rap'],
-                'pop': ['pop español', 'spanish pop', 'pop españa'],
-                'electronic': ['electrónica española', 'spanish electronic', 'electro españa'],
-                'rock': ['rock español', 'spanish rock', 'rock españa'],
-                'r&b': ['rnb español', 'spanish rnb', 'rnb españa']
-            }
-        },
-        'UK': {
-            'code': 'GB',
-            'terms': ['uk', 'british', 'britain', 'gb'],
-            'genre_translations': {
-                'hip-hop': ['uk rap', 'british rap', 'grime uk'],
-                'pop': ['uk pop', 'british pop', 'brit pop'],
-                'electronic': ['uk house', 'uk dance', 'british electronic', 'uk garage', 'uk bass', 'uk bassline', 'uk dnb', 'uk dubstep'],
-                'rock': ['uk rock', 'british rock', 'brit rock'],
-                'r&b': ['uk rnb', 'british rnb', 'uk soul']
-            }
-        },
-        'US': {
-            'code': 'US',
-            'terms': ['american', 'usa', 'us'],
-            'genre_translations': {
-                'hip-hop': ['american rap', 'us hip hop', 'usa rap'],
-                'pop': ['american pop', 'us pop', 'usa pop'],
-                'electronic': ['american edm', 'us electronic', 'usa dance'],
-                'rock': ['american rock', 'us rock', 'usa rock'],
-                'r&b': ['american rnb', 'us rnb', 'usa soul']
-            }
-        },
-        'Thailand': {
-            'code': 'TH',
-            'terms': ['thai', 'thailand', 'th'],
-            'genre_translations': {
-                'hip-hop': ['thai rap', 'thailand hip hop', 'thai hip hop'],
-                'pop': ['thai pop', 'thailand pop', 't-pop'],
-                'electronic': ['thai electronic', 'thailand dance', 'thai edm'],
-                'rock': ['thai rock', 'thailand rock', 'thai indie'],
-                'r&b': ['thai rnb', 'thailand rnb', 'thai soul']
-            }
-        },
-        'Japan': {
-            'code': 'JP',
-            'terms': ['japanese', 'japan', 'jp', 'j-'],
-            'genre_translations': {
-                'hip-hop': ['japanese rap', 'japan hip hop', 'j-rap'],
-                'pop': ['j-pop', 'japanese pop', 'japan pop'],
-                'electronic': ['japanese electronic', 'japan edm', 'j-electronic'],
-                'rock': ['j-rock', 'japanese rock', 'japan rock'],
-                'r&b': ['j-rnb', 'japanese rnb', 'japan soul']
-            }
-        },
-        'Italy': {
-            'code': 'IT',
-            'terms': ['italian', 'italiano', 'italy', 'it'],
-            'genre_translations': {
-                'hip-hop': ['rap italiano', 'italian rap', 'rap italia'],
-                'pop': ['pop italiano', 'italian pop', 'musica italiana'],
-                'electronic': ['elettronica italiana', 'italian electronic'],
-                'rock': ['rock italiano', 'italian rock'],
-                'r&b': ['rnb italiano', 'italian rnb']
-            }
-        },
-        'Netherlands': {
-            'code': 'NL',
-            'terms': ['dutch', 'nederlands', 'holland', 'nl'],
-            'genre_translations': {
-                'hip-hop': ['nederlandse rap', 'dutch rap', 'nl rap'],
-                'pop': ['nederlandse pop', 'dutch pop', 'nl pop'],
-                'electronic': ['dutch electronic', 'nederlands dance'],
-                'rock': ['nederlandse rock', 'dutch rock'],
-                'r&b': ['nederlandse rnb', 'dutch rnb']
-            }
-        },
-        'Sweden': {
-            'code': 'SE',
-            'terms': ['swedish', 'sverige', 'sweden', 'se'],
-            'genre_translations': {
-                'hip-hop': ['svensk rap', 'swedish rap', 'sverige rap'],
-                'pop': ['svensk pop', 'swedish pop', 'sverige pop'],
-                'electronic': ['svensk elektronisk', 'swedish electronic'],
-                'rock': ['svensk rock', 'swedish rock'],
-                'r&b': ['svensk rnb', 'swedish rnb']
-            }
-        },
-        'Norway': {
-            'code': 'NO',
-            'terms': ['norwegian', 'norsk', 'norway', 'no'],
-            'genre_translations': {
-                'hip-hop': ['norsk rap', 'norwegian rap', 'norge rap'],
-                'pop': ['norsk pop', 'norwegian pop'],
-                'electronic': ['norsk elektronisk', 'norwegian electronic'],
-                'rock': ['norsk rock', 'norwegian rock'],
-                'r&b': ['norsk rnb', 'norwegian rnb']
-            }
-        },
-        'Brazil': {
-            'code': 'BR',
-            'terms': ['brazilian', 'brasil', 'brazil', 'br'],
-            'genre_translations': {
-                'hip-hop': ['rap brasileiro', 'brazilian rap', 'rap br'],
-                'pop': ['pop brasileiro', 'brazilian pop', 'mpb'],
-                'electronic': ['eletrônica brasileira', 'brazilian electronic'],
-                'rock': ['rock brasileiro', 'brazilian rock'],
-                'r&b': ['rnb brasileiro', 'brazilian rnb']
-            }
-        },
-        'Mexico': {
-            'code': 'MX',
-            'terms': ['mexican', 'méxico', 'mexico', 'mx'],
-            'genre_translations': {
-                'hip-hop': ['rap mexicano', 'mexican rap', 'rap mx'],
-                'pop': ['pop mexicano', 'mexican pop'],
-                'electronic': ['electrónica mexicana', 'mexican electronic'],
-                'rock': ['rock mexicano', 'mexican rock'],
-                'r&b': ['rnb mexicano', 'mexican rnb']
-            }
-        },
-        'Australia': {
-            'code': 'AU',
-            'terms': ['australian', 'aussie', 'australia', 'au'],
-            'genre_translations': {
-                'hip-hop': ['australian rap', 'aussie rap', 'au rap'],
-                'pop': ['australian pop', 'aussie pop'],
-                'electronic': ['australian electronic', 'aussie electronic'],
-                'rock': ['australian rock', 'aussie rock'],
-                'r&b': ['australian rnb', 'aussie rnb']
-            }
-        },
-        'Canada': {
-            'code': 'CA',
-            'terms': ['canadian', 'canada', 'ca'],
-            'genre_translations': {
-                'hip-hop': ['canadian rap', 'canada rap', 'ca rap'],
-                'pop': ['canadian pop', 'canada pop'],
-                'electronic': ['canadian electronic', 'canada electronic'],
-                'rock': ['canadian rock', 'canada rock'],
-                'r&b': ['canadian rnb', 'canada rnb']
-            }
-        },
-        'South Korea': {
-            'code': 'KR',
-            'terms': ['korean', 'korea', 'k-', 'kr'],
-            'genre_translations': {
-                'hip-hop': ['k-rap', 'korean rap', 'khiphop'],
-                'pop': ['k-pop', 'korean pop', 'kpop'],
-                'electronic': ['k-electronic', 'korean electronic'],
-                'rock': ['k-rock', 'korean rock'],
-                'r&b': ['k-rnb', 'korean rnb']
-            }
-        }
-    }
+def get_playlists_from_category(market, genre, token, report=None):
+    """
+    Universal playlist discovery system - works intelligently for ALL markets and genres
     
-    # Get market configuration
-    config = market_config.get(market, {'code': market, 'terms': [market.lower()], 'genre_translations': {}})
-    market_code = config['code']
-    market_terms = config['terms']
+    report: optional dict receiving failed_queries (searches that failed after
+    retries) and failed_details (playlists without metadata), for partial flags
+    """
+    report = report if report is not None else {}
+    report.setdefault('failed_queries', [])
+    report.setdefault('failed_details', [])
+    
+    # Market configuration, search queries and scorer all come precompiled
+    # from the market registry (market_config.json)
+    markets = get_markets()
+    market_code = markets.market_code(market)
+    search_queries = markets.search_queries(market, genre)
+    scorer = markets.scorer(market, genre)
     
     headers = {"Authorization": f"Bearer {token}"}
     playlists = []
     
-    # Build comprehensive search queries
-    search_queries = []
-    
-    # 1. Local language specific terms (highest priority)
-    genre_translations = config['genre_translations'].get(genre.lower(), [])
-    search_queries.extend(genre_translations)
-    
-    # 2. Market + genre combinations  
-    for term in market_terms:
-        search_queries.append(f"{term} {genre.lower()}")
-    
-    # 3. Market code + genre
-    search_queries.append(f"{market_code} {genre.lower()}")
-    
-    # 4. Add mainstream search terms for better variety
-    if market == 'UK' and genre.lower() == 'electronic':
-        # Add mainstream UK dance terms
-        mainstream_searches = [
-            "uk dance hits",
-            "uk house music", 
-            "new music friday uk",
-            "dance party uk",
-            "uk electronic music",
-            "british dance music"
-        ]
-        search_queries.extend(mainstream_searches)
-    
-    # 5. Generic genre (lowest priority)
-    search_queries.append(genre.lower())
-    
-    # Universal filtering system - automatically works for ALL markets/genres
-    def get_universal_skip_terms(market, genre):
-        """Generate smart skip terms based on market and genre"""
-        # Base terms that are generally irrelevant for music discovery
-        base_skip = ['sleep', 'study', 'meditation', 'yoga', 'ambient', 'white noise', 'rain sounds']
-        
-        # Genre-specific filtering
-        genre_skip = []
-        if genre.lower() in ['hip-hop', 'rap']:
-            genre_skip = ['lofi', 'lo-fi', 'jazz', 'classical', 'instrumental', 'beats to study', 'chill beats']
-            # Cross-cultural contamination prevention (unless it's that market)
-            if market not in ['South Korea', 'Korea']: 
-                genre_skip.extend(['kpop', 'k-pop', 'korean'])
-            if market not in ['Japan']: 
-                genre_skip.extend(['jpop', 'j-pop', 'anime', 'vocaloid'])
-            if market not in ['US', 'USA']: 
-                genre_skip.extend(['type beat', 'beats for sale'])
-        
-        elif genre.lower() == 'electronic':
-            genre_skip = ['acoustic', 'unplugged', 'live session', 'classical']
-            # For UK electronic, be less aggressive with filtering to allow mainstream dance
-            if market == 'UK':
-                genre_skip.extend(['ambient', 'meditation', 'sleep'])  # Keep mainstream dance/house
-            else:
-                if market not in ['Netherlands', 'Belgium']: 
-                    genre_skip.extend(['tomorrowland'])
-                if market not in ['UK', 'Britain']: 
-                    genre_skip.extend(['ministry of sound'])
-            
-        elif genre.lower() == 'pop':
-            genre_skip = ['death metal', 'black metal', 'hardcore punk', 'grindcore']
-        
-        elif genre.lower() == 'rock':
-            genre_skip = ['top 40', 'dance hits', 'club music']
-        
-        # Add workout/generic playlists that dilute results
-        generic_skip = ['workout', 'gym', 'running', 'car music', 'party mix', 'wedding']
-        
-        return base_skip + genre_skip + generic_skip
-    
-    def calculate_universal_priority(playlist_name, market, genre, search_query, config):
-        """Universal priority calculation that works for any market/genre"""
-        priority = 0
-        name_lower = playlist_name.lower()
-        query_lower = search_query.lower()
-        
-        # Market-specific boost (highest priority)
-        market_terms = config.get('terms', [])
-        for term in market_terms:
-            if term in name_lower:
-                priority += 20  # Strong boost for market-specific playlists
-        
-        # Genre translation boost (very high priority)
-        genre_translations = config.get('genre_translations', {}).get(genre.lower(), [])
-        for translation in genre_translations:
-            translation_words = translation.split()
-            if all(word in name_lower for word in translation_words):
-                # Balanced priority: mainstream and underground both get good scores
-                if market == 'UK' and genre.lower() == 'electronic':
-                    # Give mainstream terms equal priority with underground
-                    mainstream_terms = ['uk house', 'uk dance', 'british electronic']
-                    underground_terms = ['uk garage', 'uk bass', 'uk bassline']
-                    if any(term in translation for term in mainstream_terms):
-                        priority += 15  # Equal priority for mainstream
-                    elif any(term in translation for term in underground_terms):
-                        priority += 15  # Equal priority for underground
-                    else:
-                        priority += 15
-                else:
-                    priority += 15  # Strong boost for local language genre terms
-        
-        # Recency boost
-        current_year = "2025"
-        recent_terms = [current_year, "2024", "new", "fresh", "latest", "now"]
-        if any(term in name_lower for term in recent_terms):
-            priority += 8
-        
-        # Quality indicators boost
-        quality_terms = ["best", "top", "hits", "bangers", "essential", "ultimate", "must hear"]
-        quality_score = sum(3 for term in quality_terms if term in name_lower)
-        priority += min(quality_score, 9)  # Cap quality boost
-        
-        # Official/curated playlist boost
-        official_terms = ["official", "spotify", "curated", "editorial", "new music friday"]
-        if any(term in name_lower for term in official_terms):
-            priority += 8  # Higher boost for official playlists
-        
-        # Mainstream UK dance playlist boost
-        if market == 'UK' and genre.lower() == 'electronic':
-            mainstream_playlist_terms = ["dance hits", "house music", "dance party", "electronic music", "club hits"]
-            if any(term in name_lower for term in mainstream_playlist_terms):
-                priority += 5  # Boost mainstream dance playlists
-        
-        return priority
-    
     # Execute search with universal logic
     all_items = []
     seen_ids = set()
     
-    for search_query in search_queries[:10]:  # Increased for better coverage
+    for search_query in search_queries:
         search_params = {
             "q": search_query,
             "type": "playlist", 
@@ -524,7 +285,8 @@ def get_playlists_from_category(market, genre, token):
         }
         
         try:
-            search_response = requests.get(
+            search_response = upstreams.get(
+                'spotify',
                 "https://api.spotify.com/v1/search",
                 headers=headers,
                 params=search_params
@@ -540,40 +302,33 @@ def get_playlists_from_category(market, genre, token):
                         item['_search_query'] = search_query  # Track which query found it
                         all_items.append(item)
                         seen_ids.add(item.get("id"))
+            else:
+                report['failed_queries'].append(search_query)
         
         except Exception as e:
             print(f"Search error for query '{search_query}': {e}")
+            report['failed_queries'].append(search_query)
             continue
     
-    # Process and filter results with universal logic
+    # Process and filter results with universal logic: every candidate name is
+    # scored and skip-checked in one pass with the precompiled scorer
     processed_playlists = []
-    skip_terms = get_universal_skip_terms(market, genre)
     
-    for item in all_items[:60]:  # Process more items for better filtering
-        if not item:
-            continue
-            
+    # Process more items for better filtering; skipped names are already dropped
+    for item, priority in select_candidates(scorer, all_items, limit=60):
         playlist_id = item.get("id")
         playlist_name = item.get("name", "")
-        name_lower = playlist_name.lower()
-        
-        # Universal skip check
-        should_skip = any(term in name_lower for term in skip_terms)
-        if should_skip:
-            continue
         
-        # Get detailed playlist info
+        # Get detailed playlist info (local metadata store, refreshed by age tier)
         try:
-            playlist_details = requests.get(
-                f"https://api.spotify.com/v1/playlists/{playlist_id}",
-                headers=headers
-            ).json()
+            playlist_details = playlist_store.get_metadata(playlist_id, token)
+            if playlist_details is None:
+                report['failed_details'].append(playlist_id)
+                playlist_details = {}
             
-            followers = playlist_details.get("followers", {}).get("total", 0)
+            followers = playlist_details.get("followers") or 0
             
-            # Calculate priority using universal system
             search_query = item.get('_search_query', '')
-            priority = calculate_universal_priority(playlist_name, market, genre, search_query, config)
             
             processed_playlists.append({
                 "playlist_name": playlist_name,
@@ -587,6 +342,7 @@ def get_playlists_from_category(market, genre, token):
             
         except Exception as e:
             print(f"Error getting playlist details for {playlist_id}: {e}")
+            report['failed_details'].append(playlist_id)
             continue
     
     # Universal sorting: priority first, then followers
@@ -595,6 +351,54 @@ def get_playlists_from_category(market, genre, token):
     
     return playlists
 
+@app.route('/api/markets', methods=['GET'])
+def list_markets():
+    """Markets, territory codes and registry load stats from market_config.json"""
+    return jsonify({'success': True, **get_market_registry().get_stats()})
+
+@app.route('/api/markets/reload', methods=['POST'])
+def reload_markets():
+    """Reload market_config.json now (it is also picked up automatically when the file changes)"""
+    result = get_market_registry().reload()
+    return jsonify(result), (200 if result['success'] else 400)
+
+def analyze_pair(market, genre):
+    """
+    /api/analyze payload for one market/genre: pre-warmed results when available,
+    otherwise a live discovery shared with identical concurrent requests (any worker)
+    """
+    # Warm path: pre-warmed discovery results; stale ones (including partial or empty
+    # results) are refreshed in the background, and a partial one reports its failed searches
+    warm = discovery_store.get(market, genre)
+    report = {}
+    if warm is not None:
+        playlists, stale, failed = warm
+        report = {'failed_queries': failed}
+        if stale:
+            prewarmer.request_refresh(market, genre)
+    else:
+        # Identical cold requests (any worker) share one discovery run
+        def discover_and_store():
+            run_report = {}
+            found = discover_playlists(market, genre, run_report)
+            discovery_store.put(market, genre, found, failed_queries=run_report.get('failed_queries'))
+            return {'playlists': found, 'report': run_report}
+        discovered = coalescer.run(('analyze',) + DiscoveryStore.key(market, genre), discover_and_store)
+        playlists, report = discovered['playlists'], discovered['report']
+    failed_queries = report.get('failed_queries', [])
+    failed_details = report.get('failed_details', [])
+    
+    return {
+        'success': True,
+        'market': market,
+        'genre': genre,
+        'playlists_found': len(playlists),
+        'partial': bool(failed_queries or failed_details),
+        'failed_queries': failed_queries,
+        'missing_details': failed_details,
+        'playlists': playlists[:10]  # Return top 10
+    }
+
 @app.route('/api/analyze', methods=['POST'])
 def analyze():
     """Get real Spotify playlists for market and genre"""
@@ -606,28 +410,99 @@ def analyze():
         return jsonify({'error': 'Market and genre required'}), 400
     
     try:
-        token = get_spotify_token()
-        playlists = get_playlists_from_category(market, genre, token)
-        
-        return jsonify({
-            'success': True,
-            'market': market,
-            'genre': genre,
-            'playlists_found': len(playlists),
-            'playlists': playlists[:10]  # Return top 10
-        })
+        return jsonify(analyze_pair(market, genre))
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-def get_playlist_tracks_detailed(playlist_id, token, playlist_name=""):
-    """Return list of detailed track info for one playlist."""
-    headers = {"Authorization": f"Bearer {token}"}
+# Pairs from /api/analyze/batch run on one bounded pool per worker process; whatever
+# the pool size, their Spotify calls share the rate governor and circuit breakers
+DISCOVERY_BATCH_WORKERS = int(os.getenv('DISCOVERY_BATCH_WORKERS', '8'))
+_discovery_pool = {'pid': None, 'executor': None}
+_discovery_pool_lock = threading.Lock()
+
+def get_discovery_pool():
+    """This process's discovery thread pool (created on first use, and again after fork)"""
+    with _discovery_pool_lock:
+        if _discovery_pool['pid'] != os.getpid():
+            from concurrent.futures import ThreadPoolExecutor
+            _discovery_pool['executor'] = ThreadPoolExecutor(max_workers=DISCOVERY_BATCH_WORKERS,
+                                                             thread_name_prefix='discovery')
+            _discovery_pool['pid'] = os.getpid()
+        return _discovery_pool['executor']
+
+def metadata_lookups_shared():
+    """Playlist metadata lookups served by another pair's in-flight request (this worker)"""
+    if music_client is not None:
+        return music_client.stats['metadata_coalesced']
+    return playlist_store.get_stats()['metadata_coalesced']
+
+@app.route('/api/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """
+    Playlist discovery for many market/genre pairs in one request
+    
+    Request: {"pairs": [{"market": "France", "genre": "Hip-Hop"}, ...]}
+             or {"markets": [...], "genres": [...]} for every combination
+             (markets defaults to every market in market_config.json)
+    Response: NDJSON stream, one /api/analyze payload per pair as it completes,
+              followed by a {"done": true} summary line
+    """
+    from concurrent.futures import as_completed
+    
+    data = request.json or {}
+    if data.get('pairs'):
+        pairs = [((pair or {}).get('market'), (pair or {}).get('genre')) for pair in data['pairs']]
+    else:
+        markets = data.get('markets') or list(get_markets().markets)
+        genres = data.get('genres') or ([data['genre']] if data.get('genre') else [])
+        pairs = [(market, genre) for genre in genres for market in markets]
     
-    # Get playlist info (for followers)
-    playlist_url = f"https://api.spotify.com/v1/playlists/{playlist_id}"
-    p_info = requests.get(playlist_url, headers=headers).json()
-    followers = p_info.get("followers", {}).get("total")
+    if not pairs or not all(market and genre for market, genre in pairs):
+        return jsonify({'error': 'Market and genre required for every pair'}), 400
+    
+    # Repeated pairs (including market aliases) are discovered once
+    unique = {}
+    for market, genre in pairs:
+        unique.setdefault(DiscoveryStore.key(market, genre), (market, genre))
+    
+    print(f"🌍 Batch discovery request: {len(unique)} market/genre pairs")
+    
+    pool = get_discovery_pool()
+    
+    def generate():
+        started = time.time()
+        shared_before = metadata_lookups_shared()
+        futures = {pool.submit(analyze_pair, market, genre): (market, genre) for market, genre in unique.values()}
+        failed = 0
+        try:
+            for future in as_completed(futures):
+                market, genre = futures[future]
+                try:
+                    payload = future.result()
+                except Exception as e:
+                    failed += 1
+                    payload = {'success': False, 'market': market, 'genre': genre, 'error': str(e)}
+                yield app.json.dumps(payload) + "\n"
+        except GeneratorExit:
+            # Client stopped reading - drop the pairs that have not started yet
+            for future in futures:
+                future.cancel()
+            raise
+        yield app.json.dumps({
+            'done': True,
+            'pairs': len(futures),
+            'failed': failed,
+            'duplicates_skipped': len(pairs) - len(unique),
+            'metadata_lookups_shared': metadata_lookups_shared() - shared_before,
+            'elapsed_seconds': round(time.time() - started, 2)
+        }) + "\n"
+    
+    return Response(stream_with_context(tracked_stream(generate())), mimetype='application/x-ndjson')
+
+def harvest_playlist_tracks(playlist_id, token, playlist_name, followers):
+    """Paginate a playlist's tracks; returns (tracks, complete)"""
+    headers = {"Authorization": f"Bearer {token}"}
     
     # Get tracks with pagination
     url = f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks"
@@ -635,193 +510,661 @@ def get_playlist_tracks_detailed(playlist_id, token, playlist_name=""):
     all_tracks = []
     
     while url:
-        r = requests.get(url, headers=headers, params=params)
+        try:
+            r = upstreams.get('spotify', url, headers=headers, params=params)
+        except UpstreamUnavailable as e:
+            print(f"⚠️ Harvest of {playlist_id} cut short after {len(all_tracks)} tracks: {e}")
+            return all_tracks, False
         if r.status_code != 200:
-            break
+            return all_tracks, False
             
         data = r.json()
         
         for item in data.get("items", []):
-            track = item.get("track")
-            if not track:
-                continue
-            
-            # Extract track details
-            isrc = track.get("external_ids", {}).get("isrc")
-            track_name = track.get("name")
-            artists = ", ".join([a["name"] for a in track.get("artists", [])])
-            release_date = track.get("album", {}).get("release_date")
-            track_popularity = track.get("popularity")
-            spotify_link = track.get("external_urls", {}).get("spotify")
-            added_at = item.get("added_at")
-            
-            all_tracks.append({
-                "playlist_name": playlist_name or p_info.get("name"),
-                "playlist_id": playlist_id,
-                "playlist_followers": followers,
-                "track_name": track_name,
-                "track_artist": artists,
-                "track_added_at": added_at,
-                "track_release_date": release_date,
-                "track_popularity": track_popularity,
-                "isrc": isrc,
-                "spotify_link": spotify_link
-            })
+            row = format_playlist_track(item, playlist_id, playlist_name, followers)
+            if row:
+                all_tracks.append(row)
         
         url = data.get("next")  # Pagination
-        time.sleep(0.1)  # Rate limiting
     
-    return all_tracks
+    return all_tracks, True
+
+def fetch_playlist_track_page(playlist_id, token, offset, limit, playlist_name, followers):
+    """One page of a playlist's tracks at an offset (None on failure)"""
+    try:
+        r = upstreams.get(
+            'spotify',
+            f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks",
+            headers={"Authorization": f"Bearer {token}"},
+            params={"offset": offset, "limit": limit}
+        )
+    except UpstreamUnavailable:
+        return None
+    if r.status_code != 200:
+        return None
+    rows = [format_playlist_track(item, playlist_id, playlist_name, followers) for item in r.json().get("items", [])]
+    return [row for row in rows if row]
+
+def get_playlist_tracks_detailed(playlist_id, token, playlist_name=""):
+    """Return list of detailed track info for one playlist (re-harvested only when its snapshot_id changes)."""
+    tracks, _ = harvest_playlist(playlist_id, token, playlist_name)
+    return tracks
+
+def harvest_playlist(playlist_id, token, playlist_name=""):
+    """(tracks, complete) for one playlist; complete is False when pagination was cut short"""
+    _, tracks, complete = playlist_store.get_tracks(
+        playlist_id, token,
+        lambda metadata: harvest_playlist_tracks(
+            playlist_id, token, playlist_name or metadata['name'], metadata['followers']
+        )
+    )
+    return tracks, complete
+
+def start_result_set(kind, produce):
+    """
+    Run produce(emit) in a background thread, appending every emit(rows) to a new result set
+
+    produce returns the summary served with the pages once the set is complete.
+    Returns the result id, whose first page can be read before produce finishes.
+    """
+    result_id = result_store.create(kind)
+    
+    def run():
+        try:
+            summary = produce(lambda rows: result_store.append(result_id, rows))
+            result_store.finish(result_id, summary)
+        except Exception as e:
+            print(f"❌ Result set {result_id} ({kind}) failed: {e}")
+            result_store.fail(result_id, e)
+    
+    threading.Thread(target=run, name=f"result-{kind}", daemon=True).start()
+    return result_id
+
+def page_response(page):
+    """JSON body for one result page; the summary fields appear once the result set is complete"""
+    body = dict(page['summary'] or {})
+    body.update({
+        'success': page['status'] != 'failed',
+        'result_id': page['result_id'],
+        'complete': page['complete'],
+        'offset': page['offset'],
+        'rows_available': page['rows_available'],
+        'next_cursor': page['next_cursor'],
+        'tracks': encode_rows(page['rows'])
+    })
+    if page['error']:
+        body['error'] = page['error']
+    return body
+
+def harvest_tracks(playlist_ids, token, on_tracks):
+    """
+    Harvest every playlist, calling on_tracks(playlist_id, tracks) as each one is done
+
+    Returns the summary: total_tracks, partial, incomplete_playlists, unavailable_playlists
+    """
+    incomplete = []
+    harvested_ids = set()
+    counts = {'playlists': 0, 'tracks': 0}
+    lock = threading.Lock()
+    
+    def on_playlist(playlist_id, playlist_name, tracks, complete):
+        on_tracks(playlist_id, tracks)
+        with lock:
+            harvested_ids.add(playlist_id)
+            counts['playlists'] += 1
+            counts['tracks'] += len(tracks)
+            if not complete:
+                incomplete.append(playlist_id)
+            
+            # Progress indicator
+            print(f"{'✅' if complete else '⚠️'} [{counts['playlists']}/{len(playlist_ids)}] Fetched {len(tracks)} tracks "
+                  f"from '{playlist_name}'{'' if complete else ' (incomplete)'}")
+    
+    if music_client is not None:
+        # All playlists (and all pages of each) harvested concurrently, handed over as each finishes
+        async_bridge.run(music_client.harvest_playlists(playlist_ids, on_playlist=on_playlist))
+    else:
+        for playlist_id in playlist_ids:
+            # Get playlist name first (from the local metadata store when fresh)
+            metadata = playlist_store.get_metadata(playlist_id, token)
+            
+            if metadata is not None:
+                playlist_name = metadata.get("name") or "Unknown"
+                
+                # Get tracks for this playlist
+                tracks, complete = harvest_playlist(playlist_id, token, playlist_name)
+                on_playlist(playlist_id, playlist_name, tracks, complete)
+    
+    # Playlists whose metadata could not be fetched at all
+    unavailable = [playlist_id for playlist_id in playlist_ids if playlist_id not in harvested_ids]
+    
+    return {
+        'total_tracks': counts['tracks'],
+        'partial': bool(incomplete or unavailable),
+        'incomplete_playlists': incomplete,
+        'unavailable_playlists': unavailable
+    }
 
 @app.route('/api/playlist-tracks', methods=['POST'])
 def get_playlist_tracks():
-    """Get real Spotify track details from playlists"""
+    """
+    Get real Spotify track details from playlists
+
+    "format": "columns" returns tracks as {"columns": [...], "rows": [[...], ...]}
+
+    With "page_size" the harvest runs in the background into a result set: the response
+    is the first page (sent as soon as it is harvested) with a next_cursor for GET /api/results,
+    and the totals arrive with the page that finds the set complete.
+    """
     data = request.json
     playlist_ids = data.get('playlist_ids', [])
+    include_streams = data.get('include_streams', False)
     
     if not playlist_ids:
         return jsonify({'error': 'playlist_ids required'}), 400
     
     try:
         token = get_spotify_token()
-        all_tracks = []
         
-        for i, playlist_id in enumerate(playlist_ids):
-            # Get playlist name first
-            playlist_response = requests.get(
-                f"https://api.spotify.com/v1/playlists/{playlist_id}",
-                headers={"Authorization": f"Bearer {token}"}
-            )
+        if data.get('page_size') is not None:
+            page_size = clamp_page_size(data['page_size'])
             
-            if playlist_response.status_code == 200:
-                playlist_data = playlist_response.json()
-                playlist_name = playlist_data.get("name", "Unknown")
-                
-                # Get tracks for this playlist
-                tracks = get_playlist_tracks_detailed(playlist_id, token, playlist_name)
-                all_tracks.extend(tracks)
-                
-                # Progress indicator
-                print(f"✅ [{i+1}/{len(playlist_ids)}] Fetched {len(tracks)} tracks from '{playlist_name}'")
+            def produce(emit):
+                # Pages follow request order like the unpaginated response: a playlist that
+                # finishes early waits until every playlist before it has been emitted
+                finished = {}
+                position = [0]
+                order_lock = threading.Lock()
+
+                def emit_ready():
+                    while position[0] < len(playlist_ids) and playlist_ids[position[0]] in finished:
+                        emit(finished[playlist_ids[position[0]]])
+                        position[0] += 1
+
+                def emit_tracks(playlist_id, tracks):
+                    # Luminate total streams per playlist, so early pages carry them too
+                    if include_streams and streams_resolver is not None:
+                        with query_guard():
+                            streams_resolver.annotate_tracks(tracks)
+                    with order_lock:
+                        finished[playlist_id] = tracks
+                        emit_ready()
+
+                summary = harvest_tracks(playlist_ids, token, emit_tracks)
+                # Unavailable playlists never finish: emit whatever was waiting behind them
+                with order_lock:
+                    for playlist_id in playlist_ids[position[0]:]:
+                        finished.setdefault(playlist_id, [])
+                    emit_ready()
+                return summary
+            
+            result_id = start_result_set('playlist_tracks', produce)
+            return jsonify(page_response(result_store.page(result_id, 0, page_size)))
+        
+        harvested = {}
+        summary = harvest_tracks(playlist_ids, token, harvested.__setitem__)
+        # Request order, whatever order the playlists finished in
+        all_tracks = [track for playlist_id in playlist_ids for track in harvested.get(playlist_id, [])]
+        
+        # Luminate total streams for all harvested ISRCs in one bulk lookup
+        if include_streams and streams_resolver is not None:
+            with query_guard(cancel_check=client_disconnect_check(request.environ)):
+                streams_resolver.annotate_tracks(all_tracks)
         
         return jsonify({
             'success': True,
-            'total_tracks': len(all_tracks),
-            'tracks': all_tracks
+            **summary,
+            'tracks': encode_rows(all_tracks)
         })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/writer-credits', methods=['POST'])
-def get_writer_credits():
-    """Get writer credits using your exact working Apple Music setup"""
+@app.route('/api/results', methods=['GET'])
+def get_result_page():
+    """
+    Next page of a paginated result (from /api/playlist-tracks or /api/writer-credits)
+    
+    Request: ?cursor=<next_cursor from the previous page> (&format=columns)
+    Response: tracks for the page, next_cursor (null after the last page), complete,
+              rows_available so far and, once complete, the endpoint's totals / stats
+    """
+    cursor = request.args.get('cursor')
+    if not cursor:
+        return jsonify({'error': 'cursor required'}), 400
+    
     try:
-        data = request.json
-        tracks = data.get('tracks', [])
+        result_id, offset, page_size = decode_cursor(cursor)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    page = result_store.page(result_id, offset, page_size)
+    if page is None:
+        return jsonify({'error': 'result expired or unknown'}), 404
+    return jsonify(page_response(page))
+
+@app.route('/api/result-store', methods=['GET'])
+def result_store_stats():
+    """Paginated result sets: live by status, rows written and pages served (this worker)"""
+    return jsonify({'success': True, 'pid': os.getpid(), **result_store.get_stats()})
+
+@app.route('/api/playlist-tracks/diff', methods=['POST'])
+def get_playlist_track_diffs():
+    """
+    Incremental harvest for playlist monitoring: tracks added / removed since the last harvest
+    
+    Request: {"playlist_ids": ["37i9dQZF1DX...", ...]}
+    Response: one entry per playlist with mode (initial / unchanged / tail / full),
+              added and removed tracks and the number of track pages fetched
+    """
+    from playlist_diff import harvest_incremental
+    
+    data = request.json or {}
+    playlist_ids = data.get('playlist_ids', [])
+    
+    if not playlist_ids:
+        return jsonify({'error': 'playlist_ids required'}), 400
+    
+    try:
+        token = get_spotify_token()
+        diffs = []
         
-        if not tracks:
-            return jsonify({'error': 'tracks required'}), 400
+        for playlist_id in playlist_ids:
+            # Always revalidate: a 304 on an unchanged snapshot is the whole cost
+            metadata = playlist_store.get_metadata(playlist_id, token, max_age_seconds=0)
+            if metadata is None:
+                diffs.append({'playlist_id': playlist_id, 'mode': 'failed', 'error': 'playlist not available'})
+                continue
+            
+            name, followers = metadata.get("name"), metadata.get("followers")
+            diff = harvest_incremental(
+                playlist_store, playlist_id, metadata,
+                fetch_page=lambda offset, limit: fetch_playlist_track_page(
+                    playlist_id, token, offset, limit, name, followers),
+                harvest_full=lambda: harvest_playlist_tracks(playlist_id, token, name, followers)
+            )
+            diffs.append(diff)
         
-        enriched_tracks = []
-        stats = {
-            'total_processed': 0,
-            'found_in_apple_music': 0,
-            'has_writer_credits': 0,
-            'has_any_ipis': 0,
-            'total_ipis_found': 0,
-            'artist_ipis_found': 0,
-            'writer_ipis_found': 0,
-            'has_isrc': 0
-        }
+        return jsonify({
+            'success': True,
+            'playlists': diffs,
+            'total_added': sum(len(d.get('added', [])) for d in diffs),
+            'total_removed': sum(len(d.get('removed', [])) for d in diffs),
+            'pages_fetched': sum(d.get('pages_fetched', 0) for d in diffs)
+        })
         
-        # Limit to first 10 tracks for faster testing
-        limited_tracks = tracks[:10]
-        print(f"🔥 FAST MODE: Processing only first 10 tracks (out of {len(tracks)} total)")
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/playlist-store', methods=['GET'])
+def playlist_store_stats():
+    """Local playlist metadata store: refresh tiers hit and harvests reused"""
+    return jsonify({'success': True, **playlist_store.get_stats()})
+
+def enrich_writer_credits(tracks, emit):
+    """
+    Apple Music credits and IPIs for each track, calling emit([enriched_track]) as each one is done
+
+    Returns the summary: stats and partial
+    """
+    stats = {
+        'total_processed': 0,
+        'found_in_apple_music': 0,
+        'has_writer_credits': 0,
+        'has_any_ipis': 0,
+        'total_ipis_found': 0,
+        'artist_ipis_found': 0,
+        'writer_ipis_found': 0,
+        'has_isrc': 0,
+        'unavailable': 0,
+        'writer_search_incomplete': 0
+    }
+    
+    # Apple Music lookups for every ISRC at once on the async client
+    prefetched = {}
+    if music_client is not None:
+        isrcs = [track.get('isrc') for track in tracks if track.get('isrc')]
+        prefetched = dict(zip(isrcs, async_bridge.run(music_client.lookup_credits(isrcs))))
+    
+    for track in tracks:
+        stats['total_processed'] += 1
+        enriched_track = track.copy()
         
-        for track in limited_tracks:
-            stats['total_processed'] += 1
-            enriched_track = track.copy()
+        isrc = track.get('isrc')
+        if isrc:
+            stats['has_isrc'] += 1
             
-            isrc = track.get('isrc')
-            if isrc:
-                stats['has_isrc'] += 1
-                
-                # Use your exact working Apple Music search
-                apple_result = search_apple_music_by_isrc(isrc)
-                
-                enriched_track.update(apple_result)
-                
-                if apple_result.get('api_status') in ['found', 'found_with_credits']:
-                    stats['found_in_apple_music'] += 1
-                    
-                    # Count traditional writer credits (composer names)
-                    if apple_result.get('composer_names'):
-                        stats['has_writer_credits'] += 1
-                    
-                    # Count IPI extractions (main artist + writers)
-                    has_any_ipi = False
-                    
-                    if apple_result.get('main_artist_ipi'):
-                        stats['artist_ipis_found'] += 1
-                        stats['total_ipis_found'] += 1
-                        has_any_ipi = True
-                    
-                    if apple_result.get('writer_ipis'):
-                        for writer in apple_result.get('writer_ipis', []):
-                            if writer.get('ipi'):
-                                stats['writer_ipis_found'] += 1
-                                stats['total_ipis_found'] += 1
-                                has_any_ipi = True
-                    
-                    if has_any_ipi:
-                        stats['has_any_ipis'] += 1
-            else:
-                enriched_track.update({'api_status': 'no_isrc'})
+            # Use your exact working Apple Music search
+            apple_result = prefetched.get(isrc) or search_apple_music_by_isrc(isrc)
             
-            enriched_tracks.append(enriched_track)
+            enriched_track.update(apple_result)
             
-            # Rate limiting
-            time.sleep(0.5)
+            if apple_result.get('api_status') == 'unavailable':
+                stats['unavailable'] += 1
+            if apple_result.get('writer_search_incomplete'):
+                stats['writer_search_incomplete'] += 1
             
-            print(f"✅ Processed {stats['total_processed']}/{len(limited_tracks)}: {track.get('track_name', 'Unknown')}")
+            if apple_result.get('api_status') in ['found', 'found_with_credits']:
+                stats['found_in_apple_music'] += 1
+                
+                # Count traditional writer credits (composer names)
+                if apple_result.get('composer_names'):
+                    stats['has_writer_credits'] += 1
+                
+                # Count IPI extractions (main artist + writers)
+                has_any_ipi = False
+                
+                if apple_result.get('main_artist_ipi'):
+                    stats['artist_ipis_found'] += 1
+                    stats['total_ipis_found'] += 1
+                    has_any_ipi = True
+                
+                if apple_result.get('writer_ipis'):
+                    for writer in apple_result.get('writer_ipis', []):
+                        if writer.get('ipi'):
+                            stats['writer_ipis_found'] += 1
+                            stats['total_ipis_found'] += 1
+                            has_any_ipi = True
+                
+                if has_any_ipi:
+                    stats['has_any_ipis'] += 1
+        else:
+            enriched_track.update({'api_status': 'no_isrc'})
         
-        # Calculate success rates
-        success_rate = (stats['found_in_apple_music'] / stats['has_isrc'] * 100) if stats['has_isrc'] > 0 else 0
-        credits_rate = (stats['has_writer_credits'] / stats['has_isrc'] * 100) if stats['has_isrc'] > 0 else 0
-        ipi_success_rate = (stats['has_any_ipis'] / stats['has_isrc'] * 100) if stats['has_isrc'] > 0 else 0
+        emit([enriched_track])
+        
+        print(f"✅ Processed {stats['total_processed']}/{len(tracks)}: {track.get('track_name', 'Unknown')}")
+    
+    # Calculate success rates
+    success_rate = (stats['found_in_apple_music'] / stats['has_isrc'] * 100) if stats['has_isrc'] > 0 else 0
+    credits_rate = (stats['has_writer_credits'] / stats['has_isrc'] * 100) if stats['has_isrc'] > 0 else 0
+    ipi_success_rate = (stats['has_any_ipis'] / stats['has_isrc'] * 100) if stats['has_isrc'] > 0 else 0
+    
+    return {
+        'stats': {
+            'total_processed': stats['total_processed'],
+            'has_isrc': stats['has_isrc'],
+            'found_in_apple_music': stats['found_in_apple_music'],
+            'has_writer_credits': stats['has_writer_credits'],
+            'apple_music_success_rate': f"{success_rate:.1f}%",
+            'writer_credits_rate': f"{credits_rate:.1f}%",
+            'total_ipis_found': stats['total_ipis_found'],
+            'artist_ipis_found': stats['artist_ipis_found'],
+            'writer_ipis_found': stats['writer_ipis_found'],
+            'ipi_success_rate': f"{ipi_success_rate:.1f}%",
+            'has_any_ipis': stats['has_any_ipis'],
+            'apple_music_unavailable': stats['unavailable'],
+            'writer_search_incomplete': stats['writer_search_incomplete']
+        },
+        'partial': bool(stats['unavailable'] or stats['writer_search_incomplete'])
+    }
+
+@app.route('/api/writer-credits', methods=['POST'])
+def get_writer_credits():
+    """
+    Get writer credits using your exact working Apple Music setup
+
+    "format": "columns" returns tracks as {"columns": [...], "rows": [[...], ...]}
+
+    "tracks_result_id" (the result_id of a paginated /api/playlist-tracks response) reads the
+    tracks from the server-side result set instead of the request body, and "page_size"
+    returns the enriched tracks as pages of a new result set (see /api/playlist-tracks).
+    """
+    try:
+        data = request.json
+        tracks = data.get('tracks', [])
+        
+        # Limit to first 10 tracks for faster testing
+        limit = 10
+        tracks_result_id = data.get('tracks_result_id')
+        if tracks_result_id:
+            page = result_store.page(tracks_result_id, 0, limit)
+            if page is None:
+                return jsonify({'error': 'tracks result expired or unknown'}), 404
+            limited_tracks = page['rows']
+            total_tracks = (page['summary'] or {}).get('total_tracks', page['rows_available'])
+        else:
+            limited_tracks = tracks[:limit]
+            total_tracks = len(tracks)
+        
+        if not limited_tracks:
+            return jsonify({'error': 'tracks required'}), 400
+        
+        print(f"🔥 FAST MODE: Processing only first {limit} tracks (out of {total_tracks} total)")
+        
+        if data.get('page_size') is not None:
+            result_id = start_result_set(
+                'writer_credits', lambda emit: enrich_writer_credits(limited_tracks, emit)
+            )
+            return jsonify(page_response(result_store.page(result_id, 0, clamp_page_size(data['page_size']))))
+        
+        enriched_tracks = []
+        summary = enrich_writer_credits(limited_tracks, enriched_tracks.extend)
         
         return jsonify({
             'success': True,
-            'stats': {
-                'total_processed': stats['total_processed'],
-                'has_isrc': stats['has_isrc'],
-                'found_in_apple_music': stats['found_in_apple_music'],
-                'has_writer_credits': stats['has_writer_credits'],
-                'apple_music_success_rate': f"{success_rate:.1f}%",
-                'writer_credits_rate': f"{credits_rate:.1f}%",
-                'total_ipis_found': stats['total_ipis_found'],
-                'artist_ipis_found': stats['artist_ipis_found'],
-                'writer_ipis_found': stats['writer_ipis_found'],
-                'ipi_success_rate': f"{ipi_success_rate:.1f}%",
-                'has_any_ipis': stats['has_any_ipis']
-            },
-            'tracks': enriched_tracks
+            **summary,
+            'tracks': encode_rows(enriched_tracks)
         })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/export/tracks', methods=['POST'])
+def export_tracks():
+    """
+    Bulk export of harvested tracks (optionally with streams and writer credits) to local files
+    
+    Request: {"playlist_ids": [...], "format": "parquet" | "csv",
+              "include_streams": false, "include_credits": false}
+    Response: NDJSON stream, one line per playlist as it is exported, followed by a
+              {"done": true} line with the files written, row count and bytes
+              (or {"done": false, "error": ...} when the export failed and its
+              partial output was removed). Parquet is one typed file; CSV is a
+              directory of part files.
+    """
+    from export_pipeline import FORMATS, TrackExporter, export_columns, new_export_path, parquet_available
+    
+    data = request.json or {}
+    playlist_ids = data.get('playlist_ids', [])
+    fmt = (data.get('format') or 'parquet').lower()
+    include_streams = bool(data.get('include_streams')) and streams_resolver is not None
+    include_credits = bool(data.get('include_credits'))
+    
+    if not playlist_ids:
+        return jsonify({'error': 'playlist_ids required'}), 400
+    if fmt not in FORMATS:
+        return jsonify({'error': f'format must be one of: {", ".join(FORMATS)}'}), 400
+    if fmt == 'parquet' and not parquet_available():
+        return jsonify({'error': 'Parquet export requires pyarrow'}), 503
+    
+    try:
+        token = get_spotify_token()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    path = new_export_path(fmt)
+    columns = export_columns(include_streams, include_credits)
+    cancel_check = client_disconnect_check(request.environ)
+    print(f"📦 Export request: {len(playlist_ids)} playlists -> {path}")
+    
+    def generate():
+        exported = 0
+        try:
+            # No request deadline: million-row exports outlast it. Partial output is
+            # removed if the export fails or the client disconnects
+            with query_guard(deadline_seconds=None, cancel_check=cancel_check) as guard, \
+                    TrackExporter(path, fmt, columns) as exporter:
+                try:
+                    for i, playlist_id in enumerate(playlist_ids):
+                        tracks, complete = harvest_playlist(playlist_id, token)
+                        if include_streams:
+                            streams_resolver.annotate_tracks(tracks)
+                        if include_credits:
+                            enriched = []
+                            enrich_writer_credits(tracks, enriched.extend)
+                            tracks = enriched
+                        exporter.write_rows(tracks)
+                        exported += len(tracks)
+                        yield app.json.dumps({
+                            'playlist_id': playlist_id,
+                            'tracks': len(tracks),
+                            'complete': complete,
+                            'exported': exported,
+                            'progress': f"{i + 1}/{len(playlist_ids)}"
+                        }) + "\n"
+                except GeneratorExit:
+                    # Client stopped reading - make sure nothing else gets queued
+                    guard.cancel('client disconnected')
+                    raise
+        except Exception as e:
+            print(f"❌ Export to {path} failed: {e}")
+            yield app.json.dumps({'done': False, 'error': str(e), 'exported': exported}) + "\n"
+            return
+        summary = exporter.summary()
+        print(f"✅ Exported {summary['rows']} tracks to {path} ({summary['bytes']:,} bytes)")
+        yield app.json.dumps({'done': True, **summary}) + "\n"
+    
+    return Response(stream_with_context(tracked_stream(generate())), mimetype='application/x-ndjson')
+
 # Initialize profiling service (with mock for development)
+# PROFILING_BACKEND: mock (default), snowflake, or local (DuckDB with synthetic data)
+PROFILING_BACKEND = os.getenv('PROFILING_BACKEND', 'mock').lower()
+
 try:
     from profiling_service import ProfilingService, MockProfilingService
-    # Try to use real service, fall back to mock if Snowflake not configured
-    profiling_service = MockProfilingService()  # Change to ProfilingService() when Snowflake is ready
-    print("📊 Profiling service initialized (mock mode)")
+    if PROFILING_BACKEND == 'snowflake':
+        profiling_service = ProfilingService()
+    elif PROFILING_BACKEND == 'local':
+        from local_profiling_service import LocalProfilingService
+        profiling_service = LocalProfilingService()
+        if not profiling_service.has_data():
+            profiling_service.load_synthetic_data(recordings=int(os.getenv('LOCAL_PROFILING_RECORDINGS', '100000')))
+    else:
+        profiling_service = MockProfilingService()
+    from streams_resolver import TotalStreamsResolver
+    streams_resolver = TotalStreamsResolver(profiling_service)
+    print(f"📊 Profiling service initialized ({PROFILING_BACKEND} mode)")
 except Exception as e:
     profiling_service = None
+    streams_resolver = None
     print(f"⚠️ Profiling service unavailable: {e}")
 
+# Background pre-warming of discovery + profiles for every configured market/genre
+PREWARM_ENABLED = os.getenv('PREWARM_ENABLED', '1') == '1' and bool(CLIENT_ID and CLIENT_SECRET)
+
+def discover_playlists(market, genre, report=None):
+    """Live Spotify discovery for one market/genre (report receives failed queries / details)"""
+    if music_client is not None:
+        return async_bridge.run(music_client.get_playlists_from_category(market, genre, report))
+    return get_playlists_from_category(market, genre, get_spotify_token(), report)
+
+from prewarm import DiscoveryStore, PrewarmScheduler
+# Under gunicorn the store is a shared SQLite file and one worker (the lock holder) refreshes it
+discovery_store = DiscoveryStore(path=os.getenv('DISCOVERY_STORE_PATH') or None)
+prewarmer = PrewarmScheduler(discover_playlists, discovery_store, profiling_service,
+                             leader_lock_path=os.getenv('PREWARM_LEADER_LOCK') or None)
+
+@app.before_request
+def start_prewarm():
+    # Started lazily so only the serving process runs it (not the debug reloader's parent)
+    if PREWARM_ENABLED:
+        prewarmer.ensure_started()
+
+# Identical concurrent /api/analyze requests share one computation (across workers
+# when COALESCE_DIR is set); results cross processes as JSON. /api/profile is
+# deduplicated by the profiling service's ProfileCache instead.
+from coalescing import RequestCoalescer
+coalescer = RequestCoalescer(dumps=app.json.dumps, loads=json.loads)
+
+@app.route('/api/rate-budgets', methods=['GET'])
+def rate_budget_stats():
+    """Outbound budget use per upstream (Spotify, Apple catalog, Apple search)"""
+    return jsonify({'success': True, 'pid': os.getpid(), **rate_governor.get_stats()})
+
+@app.route('/api/upstreams', methods=['GET'])
+def upstream_health():
+    """Circuit breaker state, retries and give-ups per upstream (this worker)"""
+    return jsonify({'success': True, 'pid': os.getpid(), **upstreams.get_stats()})
+
+@app.route('/api/coalescing', methods=['GET'])
+def coalescing_stats():
+    """Requests served by another request's computation, in this worker and across workers"""
+    return jsonify({'success': True, 'pid': os.getpid(), **coalescer.get_stats()})
+
+# ----------------------------------------------------------------------
+# Multi-process serving (gunicorn.conf.py): preload before fork, reset after
+# ----------------------------------------------------------------------
+_worker = None  # gunicorn worker serving this process (None under the dev server)
+_in_flight = {'streams': 0}
+_in_flight_lock = threading.Lock()
+
+def preload_shared_state():
+    """Warm state that every worker inherits through fork: Spotify token, market registry"""
+    get_markets()
+    if CLIENT_ID and CLIENT_SECRET:
+        try:
+            get_spotify_token()
+        except Exception as e:
+            print(f"⚠️ Spotify token preload failed (workers fetch their own): {e}")
+    print(f"📦 Shared state preloaded in pid {os.getpid()}")
+
+def after_fork(worker=None):
+    """Give a forked worker its own connections, locks and event loop"""
+    global _worker, _spotify_token_lock, _in_flight_lock
+    _worker = worker
+    _spotify_token_lock = threading.Lock()
+    _in_flight_lock = threading.Lock()
+    playlist_store.reopen()
+    result_store.reopen()
+    discovery_store.reopen()
+    coalescer.reopen()
+    rate_governor.reopen()
+    if async_bridge is not None:
+        async_bridge.reset()
+        music_client.reset()
+    # Snowflake connections are opened lazily; never reuse one created before the fork
+    if profiling_service is not None and hasattr(profiling_service, 'conn') and PROFILING_BACKEND == 'snowflake':
+        profiling_service.conn = None
+
+def tracked_stream(generator):
+    """Count a streaming response as in flight until its last line is sent"""
+    with _in_flight_lock:
+        _in_flight['streams'] += 1
+    try:
+        yield from generator
+    finally:
+        with _in_flight_lock:
+            _in_flight['streams'] -= 1
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness: the worker process answers requests"""
+    return jsonify({'status': 'ok', 'pid': os.getpid()})
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness: shared state is loaded and the worker is not draining for shutdown"""
+    checks = {
+        'market_registry': bool(get_markets().markets),
+        'profiling': profiling_service is not None,
+        'async_client': async_bridge is None or async_bridge.running or async_bridge.loop is None,
+        'accepting': _worker is None or bool(_worker.alive),
+    }
+    ready = checks['market_registry'] and checks['async_client'] and checks['accepting']
+    return jsonify({
+        'status': 'ready' if ready else 'unavailable',
+        'pid': os.getpid(),
+        'checks': checks,
+        'in_flight_streams': _in_flight['streams'],
+        'prewarm_leader': prewarmer.get_stats()['leader'],
+    }), 200 if ready else 503
+
+@app.route('/api/prewarm/status', methods=['GET'])
+def prewarm_status():
+    """Pre-warm scheduler progress and discovery store freshness"""
+    return jsonify({'success': True, 'enabled': PREWARM_ENABLED, **prewarmer.get_stats()})
+
 @app.route('/api/profile', methods=['POST'])
 def profile_market_genre():
     """
@@ -843,20 +1186,213 @@ def profile_market_genre():
         
         print(f"🎯 Profiling request: {market} - {genre}")
         
-        # Execute profiling
-        results = profiling_service.profile_market_genre(market, genre)
+        # Execute profiling (cancelled if the client disconnects or the deadline passes)
+        started = time.time()
+        # (concurrent identical profiles share one run through the ProfileCache)
+        with query_guard(cancel_check=client_disconnect_check(request.environ)):
+            results = profiling_service.profile_market_genre(market, genre)
         
         # Add timestamp
         import datetime
         results['timestamp'] = datetime.datetime.now().isoformat()
-        results['processing_time'] = 'Mock data (instant)'
+        results['processing_time'] = f"{time.time() - started:.2f}s ({PROFILING_BACKEND})"
         
         return jsonify(results)
+    
+    except QueryCancelled as e:
+        print(f"⏹️ Profiling cancelled: {e}")
+        return jsonify({'error': str(e)}), 504
         
     except Exception as e:
         print(f"❌ Profiling error: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/profile/bulk', methods=['POST'])
+def profile_markets_bulk():
+    """
+    Profile many markets for one or more genres in a single request
+    
+    Request: {"markets": ["France", "UK", ...], "genres": ["Hip-Hop"]}
+             (markets defaults to every market in market_config.json)
+    Response: NDJSON stream, one profile payload per market/genre as it completes,
+              followed by a {"done": true} summary line
+    """
+    if profiling_service is None:
+        return jsonify({'error': 'Profiling service not available'}), 503
+    
+    market_registry = get_markets()
+    
+    data = request.json or {}
+    markets = data.get('markets') or list(market_registry.markets)
+    genres = data.get('genres') or ([data['genre']] if data.get('genre') else [])
+    
+    if not genres:
+        return jsonify({'error': 'genres required'}), 400
+    
+    unknown = [m for m in markets if m not in market_registry.codes]
+    if unknown:
+        return jsonify({'error': f'Unknown markets: {", ".join(unknown)}'}), 400
+    
+    # Aliases of one territory (UK / United Kingdom) are profiled once
+    unique = {}
+    for market in markets:
+        unique.setdefault(market_registry.market_code(market), market)
+    markets = list(unique.values())
+    
+    print(f"🎯 Bulk profiling request: {len(markets)} markets x {len(genres)} genres")
+    
+    cancel_check = client_disconnect_check(request.environ)
+    
+    def generate():
+        import datetime
+        profiled = 0
+        started = time.time()
+        with query_guard(cancel_check=cancel_check) as guard:
+            try:
+                for results in profiling_service.profile_markets_bulk(markets, genres):
+                    results['timestamp'] = datetime.datetime.now().isoformat()
+                    profiled += 1
+                    yield app.json.dumps(results) + "\n"
+            except QueryCancelled as e:
+                yield app.json.dumps({'error': str(e)}) + "\n"
+            except GeneratorExit:
+                # Client stopped reading - make sure nothing else gets queued
+                guard.cancel('client disconnected')
+                raise
+        yield app.json.dumps({
+            'done': True,
+            'profiled': profiled,
+            'elapsed_seconds': round(time.time() - started, 2)
+        }) + "\n"
+    
+    return Response(stream_with_context(tracked_stream(generate())), mimetype='application/x-ndjson')
+
+@app.route('/api/profile/velocity', methods=['POST'])
+def profile_velocity_tiers():
+    """
+    Playlist velocity tiers for a market from the precomputed adoption index
+    
+    Request: {"market": "France", "genre": "Hip-Hop"}
+    Response: velocity_tiers with songs, hits and hit rate per tier
+    """
+    try:
+        if profiling_service is None:
+            return jsonify({'error': 'Profiling service not available'}), 503
+        
+        data = request.json or {}
+        market = data.get('market')
+        genre = data.get('genre')
+        
+        if not market or not genre:
+            return jsonify({'error': 'Market and genre required'}), 400
+        
+        with query_guard(cancel_check=client_disconnect_check(request.environ)):
+            results = profiling_service.get_velocity_tiers(market, genre)
+        return jsonify(results)
+    
+    except QueryCancelled as e:
+        print(f"⏹️ Velocity tiers cancelled: {e}")
+        return jsonify({'error': str(e)}), 504
+        
+    except Exception as e:
+        print(f"❌ Velocity tiers error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/profile/transitions', methods=['POST'])
+def profile_playlist_transitions():
+    """
+    Gateway analysis from the playlist transition graph
+    
+    Request: {"playlist": "Radar France", "targets": ["Top France"], "top": 10}
+             (without "playlist" the top gateway playlists are returned)
+    Response: next_playlists with frequency, share and latency distribution,
+              plus crossover rates into the target playlists
+    """
+    try:
+        if profiling_service is None:
+            return jsonify({'error': 'Profiling service not available'}), 503
+        
+        data = request.json or {}
+        top = int(data.get('top', 10))
+        
+        with query_guard(cancel_check=client_disconnect_check(request.environ)):
+            if not data.get('playlist'):
+                return jsonify({'success': True, 'gateways': profiling_service.get_top_gateways(top)})
+            results = profiling_service.get_gateway_transitions(data['playlist'], top, data.get('targets'))
+        return jsonify(results)
+    
+    except QueryCancelled as e:
+        print(f"⏹️ Transition lookup cancelled: {e}")
+        return jsonify({'error': str(e)}), 504
+        
+    except Exception as e:
+        print(f"❌ Transition lookup error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/luminate-enrich', methods=['POST'])
+def luminate_enrich():
+    """
+    Enrich harvested tracks with Luminate streams and playlist stats
+    
+    Request: {"tracks": [...]} (as returned by /api/playlist-tracks) or {"isrcs": [...]}
+    Response: NDJSON stream of enriched rows in request order (tracks are
+              returned with the Luminate fields merged in), followed by a
+              {"done": true} summary line
+    """
+    if profiling_service is None:
+        return jsonify({'error': 'Profiling service not available'}), 503
+    
+    data = request.json or {}
+    tracks = data.get('tracks') or []
+    isrcs = [track.get('isrc') for track in tracks] if tracks else data.get('isrcs') or []
+    
+    if not isrcs:
+        return jsonify({'error': 'tracks or isrcs required'}), 400
+    
+    print(f"🔗 Luminate enrichment request: {len(isrcs)} ISRCs")
+    
+    # Tracks sharing an ISRC all receive that ISRC's enrichment row
+    from streams_resolver import normalize_isrc
+    tracks_by_isrc = {}
+    for track in tracks:
+        tracks_by_isrc.setdefault(normalize_isrc(track.get('isrc')), []).append(track)
+    
+    cancel_check = client_disconnect_check(request.environ)
+    
+    def generate():
+        enriched = 0
+        matched = 0
+        started = time.time()
+        with query_guard(cancel_check=cancel_check) as guard:
+            try:
+                for batch in profiling_service.stream_isrc_enrichment(isrcs):
+                    for row in batch.iter_rows():
+                        row = {name.lower(): value for name, value in row.items()}
+                        matched += 1 if row.get('in_luminate') else 0
+                        for track in tracks_by_isrc.pop(row['isrc'], None) or [None]:
+                            enriched += 1
+                            yield app.json.dumps(dict(track, **row) if track else row) + "\n"
+            except QueryCancelled as e:
+                yield app.json.dumps({'error': str(e)}) + "\n"
+            except GeneratorExit:
+                guard.cancel('client disconnected')
+                raise
+        
+        # Tracks without a usable ISRC are passed through unenriched
+        for track_list in tracks_by_isrc.values():
+            for track in track_list:
+                enriched += 1
+                yield app.json.dumps(dict(track, in_luminate=False)) + "\n"
+        
+        yield app.json.dumps({
+            'done': True,
+            'rows': enriched,
+            'in_luminate': matched,
+            'elapsed_seconds': round(time.time() - started, 2)
+        }) + "\n"
+    
+    return Response(stream_with_context(tracked_stream(generate())), mimetype='application/x-ndjson')
+
 @app.route('/api/profile/test', methods=['GET'])
 def test_profiling_connection():
     """Test profiling service connection"""
@@ -865,11 +1401,25 @@ def test_profiling_connection():
             return jsonify({'status': 'error', 'message': 'Profiling service not initialized'})
         
         result = profiling_service.test_connection()
+        result['profile_cache'] = profiling_service.cache.get_stats()
+        result['streams_resolver'] = streams_resolver.get_stats()
         return jsonify(result)
         
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)})
 
+@app.route('/api/profile/query-stats', methods=['GET'])
+def profiling_query_stats():
+    """Bytes scanned, elapsed time, timeouts and budgets per profiling query type"""
+    if profiling_service is None:
+        return jsonify({'error': 'Profiling service not available'}), 503
+    
+    return jsonify({
+        'success': True,
+        'queries': profiling_service.get_query_stats(),
+        'streams_engine': profiling_service.streams_engine.get_stats()
+    })
+
 @app.route('/api/insights', methods=['POST'])
 def get_market_insights():
     """
@@ -890,9 +1440,13 @@ def get_market_insights():
             return jsonify({'error': 'Market and genre required'}), 400
         
         # Get insights
-        insights = profiling_service.get_market_insights(market, genre)
+        with query_guard(cancel_check=client_disconnect_check(request.environ)):
+            insights = profiling_service.get_market_insights(market, genre)
         
         return jsonify(insights)
+    
+    except QueryCancelled as e:
+        return jsonify({'error': str(e)}), 504
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -908,4 +1462,12 @@ if __name__ == '__main__':
     except Exception as e:
         print(f"❌ Apple Music setup failed: {e}")
     
-    app.run(debug=True, host='0.0.0.0', port=5001)  # Different port to avoid conflicts
\ No newline at end of file
+    # Development server only; production runs gunicorn -c gunicorn.conf.py wsgi:app
+    debug = os.getenv('FLASK_DEBUG', '0') == '1'
+    
+    # With debug=True this module also runs in the reloader's watcher process;
+    # only the child that serves requests (WERKZEUG_RUN_MAIN) pre-warms
+    if PREWARM_ENABLED and (not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+        prewarmer.ensure_started()
+    
+    app.run(debug=debug, host='0.0.0.0', port=int(os.getenv('PORT', '5001')), threaded=True)
\ No newline at end of file
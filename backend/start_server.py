@@ -1,17 +1,26 @@
 #!/usr/bin/env python3
 """
-Simple Flask server test to verify our universal playlist system works
+Start the backend server
+Runs gunicorn with gunicorn.conf.py where it is installed (Linux / macOS) and
+falls back to Flask's threaded server without the debugger elsewhere (Windows).
 """
+import importlib.util
 import os
 import sys
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-# Change to the backend directory
-os.chdir(r"C:\Users\kaz.roche\Desktop\music-intelligence\backend")
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND_DIR)
 
-# Import and start the server
-from simple_working import app
+# Relative paths (Apple Music key, market config) resolve against the backend directory
+os.chdir(BACKEND_DIR)
 
 if __name__ == '__main__':
-    print("🚀 Starting Server for Testing...")
-    app.run(host='0.0.0.0', port=5001, debug=False)  # No debug to avoid restarts
\ No newline at end of file
+    if importlib.util.find_spec('gunicorn') is not None:
+        print("🚀 Starting gunicorn (gunicorn.conf.py)...")
+        os.execvp(sys.executable, [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'])
+    else:
+        from simple_working import app, prewarmer, PREWARM_ENABLED
+        print("🚀 Starting Server (gunicorn not installed, single process)...")
+        if PREWARM_ENABLED:
+            prewarmer.ensure_started()
+        app.run(host='0.0.0.0', port=int(os.getenv('PORT', '5001')), debug=False, threaded=True)
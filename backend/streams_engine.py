@@ -0,0 +1,267 @@
+"""
+Baseline vs incremental streams engine
+Keeps per-(ISRC, playlist) baseline streams (Streams ATD when the song was
+first added) and incremental streams (growth since the add) per territory,
+and updates them from newly loaded Luminate months and new playlist adds
+instead of rescanning the full history on every profile.
+"""
+
+import logging
+import os
+import threading
+import time
+
+from profiling_queries import (
+    get_streams_watermark_query, get_streams_engine_adds_query, get_streams_engine_months_query
+)
+from query_results import ColumnarResult
+from query_guardrails import QueryCancelled
+
+# Playlists need this many tracked songs to appear in the summary
+MIN_SONGS_PER_PLAYLIST = 10
+
+# Skip the warehouse watermark check when a territory was checked this recently
+REFRESH_CHECK_SECONDS = int(os.getenv('STREAMS_ENGINE_CHECK_SECONDS', '60'))
+
+
+def _lower_columns(result):
+    """Column name -> values with lower-cased names (Snowflake upper-cases aliases)"""
+    return {name.lower(): values for name, values in result.to_columns().items()}
+
+
+class _TerritoryState:
+    """Engine state for one territory"""
+
+    def __init__(self):
+        self.pairs = {}  # (isrc, playlist_id) -> [playlist_name, add_month, baseline, latest]
+        self.by_isrc = {}  # isrc -> list of pair keys
+        self.month_watermark = None  # latest month ordinal applied
+        self.add_watermark = None  # latest add date applied (ISO string)
+        self.add_watermark_rows = None  # rows dated add_watermark when it was applied
+        self.checked_at = None  # monotonic time of the last successful watermark check
+        self.version = 0  # bumped whenever pairs change
+        self.lock = threading.Lock()
+        self.stats = {'full_builds': 0, 'incremental_updates': 0, 'unchanged_checks': 0,
+                      'last_refresh_seconds': None}
+
+
+class IncrementalStreamsEngine:
+    """Per-territory baseline/incremental streams, maintained incrementally"""
+
+    def __init__(self, profiling_service):
+        self.service = profiling_service
+        self.logger = logging.getLogger(__name__)
+        self._territories = {}
+        self._lock = threading.Lock()
+
+    def _state(self, market_code):
+        with self._lock:
+            return self._territories.setdefault(market_code, _TerritoryState())
+
+    def refresh(self, market_code, force=False):
+        """
+        Bring a territory up to date with the warehouse
+
+        The first call builds the territory from full history. Later calls
+        only read Luminate months newer than the month watermark (to move
+        latest/incremental streams forward) and playlist adds from the add
+        watermark's day on (plus adds of ISRCs that just entered the
+        territory). Adds loaded late for the watermark day change its row
+        count, which also triggers an update.
+        Checks within REFRESH_CHECK_SECONDS of the last one are skipped
+        unless force is set.
+
+        Returns:
+            bool: False when the warehouse could not be read
+        """
+        state = self._state(market_code)
+        with state.lock:
+            started = time.monotonic()
+            if not force and state.checked_at is not None and started - state.checked_at < REFRESH_CHECK_SECONDS:
+                return True
+            watermark = self.service._execute_query_columnar(
+                get_streams_watermark_query(market_code), "Streams Watermark"
+            )
+            if not watermark:
+                return False
+            columns = _lower_columns(watermark)
+            latest_month = columns['latest_month'][0]
+            latest_add = columns['latest_add_date'][0]
+            latest_add_rows = columns['latest_add_rows'][0]
+            if latest_month is None or latest_add is None:
+                return False
+            latest_month = int(latest_month)
+            latest_add = str(latest_add)[:10]
+
+            if state.month_watermark is None:
+                if not self._apply_adds(state, market_code, latest_month, latest_add):
+                    return False
+                state.stats['full_builds'] += 1
+                mode = 'full build'
+            elif (latest_month == state.month_watermark and latest_add == state.add_watermark
+                  and latest_add_rows == state.add_watermark_rows):
+                state.stats['unchanged_checks'] += 1
+                state.checked_at = started
+                return True
+            else:
+                # Both steps are idempotent, so a failure leaves the watermarks
+                # in place and the next refresh simply retries
+                new_months = latest_month > state.month_watermark
+                if new_months and not self._apply_months(state, market_code, state.month_watermark, latest_month):
+                    return False
+                if not self._apply_adds(
+                    state, market_code, latest_month, latest_add,
+                    added_after=state.add_watermark,
+                    months_after=state.month_watermark if new_months else None
+                ):
+                    return False
+                state.stats['incremental_updates'] += 1
+                mode = 'incremental update'
+
+            state.month_watermark = latest_month
+            state.add_watermark = latest_add
+            state.add_watermark_rows = latest_add_rows
+            state.checked_at = started
+            state.version += 1
+            state.stats['last_refresh_seconds'] = round(time.monotonic() - started, 3)
+            self.logger.info(
+                f"📈 Streams engine {market_code}: {mode}, {len(state.pairs)} pairs "
+                f"({state.stats['last_refresh_seconds']}s)"
+            )
+            return True
+
+    def _apply_adds(self, state, market_code, through_month, through_add, added_after=None, months_after=None):
+        """Insert (ISRC, playlist) pairs the engine has not seen yet; False on query failure"""
+        query = get_streams_engine_adds_query(market_code, through_month, through_add, added_after, months_after)
+        result = self.service._execute_query_columnar(query, "Streams Engine Adds")
+        if not result.columns:
+            return False
+        columns = _lower_columns(result)
+        for isrc, playlist_id, playlist_name, add_month, baseline, latest in zip(
+            columns['isrc'], columns['playlist_id'], columns['playlist_name'],
+            columns['add_month'], columns['baseline_streams'], columns['latest_streams']
+        ):
+            key = (isrc, playlist_id)
+            if key in state.pairs:
+                continue
+            state.pairs[key] = [playlist_name, int(add_month), int(baseline or 0), int(latest or 0)]
+            state.by_isrc.setdefault(isrc, []).append(key)
+        return True
+
+    def _apply_months(self, state, market_code, after_month, through_month):
+        """Move latest streams forward with newly loaded months; False on query failure"""
+        query = get_streams_engine_months_query(market_code, after_month, through_month)
+        result = self.service._execute_query_columnar(query, "Streams Engine Months")
+        if not result.columns:
+            return False
+        columns = _lower_columns(result)
+        for isrc, month, streams_atd in zip(columns['isrc'], columns['month_ordinal'], columns['streams_atd']):
+            keys = state.by_isrc.get(isrc)
+            if not keys or streams_atd is None:
+                continue
+            month, streams_atd = int(month), int(streams_atd)
+            for key in keys:
+                pair = state.pairs[key]
+                pair[3] = max(pair[3], streams_atd)
+                # Late-arriving months before the add month still count as baseline
+                if month < pair[1]:
+                    pair[2] = max(pair[2], streams_atd)
+        return True
+
+    def playlist_summary(self, market_code, limit=50, min_songs=MIN_SONGS_PER_PLAYLIST):
+        """
+        Baseline vs incremental streams per playlist for a territory
+
+        Refreshes the territory first. Playlists are ranked by average
+        incremental streams per song.
+
+        Returns:
+            ColumnarResult: playlist_name, playlist_id, songs_tracked,
+            avg_baseline_streams_millions, avg_incremental_streams_millions,
+            total_incremental_streams_millions, incremental_share
+        """
+        columns = ['playlist_name', 'playlist_id', 'songs_tracked', 'avg_baseline_streams_millions',
+                   'avg_incremental_streams_millions', 'total_incremental_streams_millions',
+                   'incremental_share']
+        try:
+            self.refresh(market_code)
+        except QueryCancelled:
+            raise
+        except Exception as e:
+            self.logger.error(f"❌ Streams engine refresh failed for {market_code}: {e}")
+
+        state = self._state(market_code)
+        with state.lock:
+            playlists = {}
+            for (isrc, playlist_id), (playlist_name, _, baseline, latest) in state.pairs.items():
+                totals = playlists.setdefault(playlist_id, [playlist_name, 0, 0, 0])
+                totals[1] += 1
+                totals[2] += baseline
+                totals[3] += max(latest - baseline, 0)
+
+        rows = []
+        for playlist_id, (playlist_name, songs, baseline, incremental) in playlists.items():
+            if songs < min_songs:
+                continue
+            rows.append((
+                playlist_name, playlist_id, songs,
+                round(baseline / songs / 1000000, 2),
+                round(incremental / songs / 1000000, 2),
+                round(incremental / 1000000, 1),
+                round(incremental / (baseline + incremental), 3) if baseline + incremental else None
+            ))
+        rows.sort(key=lambda row: row[4], reverse=True)
+        return ColumnarResult.from_rows(columns, rows[:limit])
+
+    def isrc_streams(self, market_code):
+        """
+        Per-ISRC streams for a territory (refreshed first)
+
+        Returns:
+            dict: isrc -> (baseline at its first playlist add, latest Streams ATD)
+        """
+        try:
+            self.refresh(market_code)
+        except QueryCancelled:
+            raise
+        except Exception as e:
+            self.logger.error(f"❌ Streams engine refresh failed for {market_code}: {e}")
+
+        state = self._state(market_code)
+        with state.lock:
+            return {
+                isrc: (min(state.pairs[key][2] for key in keys), max(state.pairs[key][3] for key in keys))
+                for isrc, keys in state.by_isrc.items()
+            }
+
+    def territory_version(self, market_code):
+        """Changes whenever the territory's pairs are updated"""
+        return self._state(market_code).version
+
+    def get_pair(self, market_code, isrc, playlist_id):
+        """Baseline/incremental streams for one (ISRC, playlist), or None"""
+        state = self._state(market_code)
+        with state.lock:
+            pair = state.pairs.get((isrc, playlist_id))
+        if pair is None:
+            return None
+        playlist_name, _, baseline, latest = pair
+        return {'playlist_name': playlist_name, 'baseline_streams': baseline,
+                'incremental_streams': max(latest - baseline, 0)}
+
+    def reset(self, market_code=None):
+        """Forget one territory (or all) so the next refresh rebuilds it"""
+        with self._lock:
+            if market_code is None:
+                self._territories.clear()
+            else:
+                self._territories.pop(market_code, None)
+
+    def get_stats(self):
+        with self._lock:
+            territories = dict(self._territories)
+        return {
+            code: dict(state.stats, pairs=len(state.pairs), month_watermark=state.month_watermark,
+                       add_watermark=state.add_watermark, add_watermark_rows=state.add_watermark_rows)
+            for code, state in territories.items()
+        }
@@ -0,0 +1,138 @@
+"""
+Bulk total-streams resolver for harvested tracks
+Implements the WW-first total streams rule from
+docs/LUMINATE_DATA_SPECIFICATION.md for a whole ISRC list in one set-based
+query, with a local LRU cache keyed by (ISRC, data month).
+"""
+
+import logging
+import re
+import threading
+from collections import OrderedDict
+
+from profiling_queries import get_bulk_total_streams_query
+
+ISRC_PATTERN = re.compile(r'^[A-Z0-9]{12}$')
+
+# ISRCs per query; keeps the IN (...) list well inside warehouse limits
+RESOLVE_CHUNK_SIZE = 1000
+
+
+def normalize_isrc(isrc):
+    """Upper-case and strip separators; None when it is not a valid ISRC"""
+    if not isrc:
+        return None
+    isrc = str(isrc).strip().upper().replace('-', '')
+    return isrc if ISRC_PATTERN.match(isrc) else None
+
+
+class TotalStreamsResolver:
+    """Resolves total streams for many ISRCs against a ProfilingService"""
+
+    def __init__(self, profiling_service, max_entries=50000, chunk_size=RESOLVE_CHUNK_SIZE):
+        """
+        Args:
+            profiling_service: ProfilingService (or subclass) used to run the query
+            max_entries: LRU capacity in (ISRC, data month) entries
+            chunk_size: Maximum ISRCs per query
+        """
+        self.service = profiling_service
+        self.max_entries = max_entries
+        self.chunk_size = chunk_size
+        self.logger = logging.getLogger(__name__)
+        self._entries = OrderedDict()  # (isrc, data_month) -> totals dict, or None when not in Luminate
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'queries': 0, 'invalid': 0}
+
+    def resolve(self, isrcs):
+        """
+        Return {isrc: totals} for every valid ISRC in isrcs
+
+        totals is {'total_streams', 'streams_source', 'territory_count'}, or
+        None when Luminate has no rows for the ISRC (outside the top 50K).
+        ISRCs that fail validation are left out of the result.
+        """
+        data_month = self.service.get_data_version()
+
+        wanted = {}  # ordered de-duplication
+        for isrc in isrcs:
+            normalized = normalize_isrc(isrc)
+            if normalized is None:
+                self.stats['invalid'] += 1
+            else:
+                wanted[normalized] = True
+
+        resolved = {}
+        missing = []
+        with self._lock:
+            for isrc in wanted:
+                key = (isrc, data_month)
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    resolved[isrc] = self._entries[key]
+                    self.stats['hits'] += 1
+                else:
+                    missing.append(isrc)
+                    self.stats['misses'] += 1
+
+        for start in range(0, len(missing), self.chunk_size):
+            chunk = missing[start:start + self.chunk_size]
+            found = self._query_totals(chunk)
+            if found is None:
+                # Query failed: report unresolved without caching the gap
+                resolved.update((isrc, None) for isrc in chunk)
+                continue
+            with self._lock:
+                for isrc in chunk:
+                    totals = found.get(isrc)
+                    resolved[isrc] = totals
+                    self._entries[(isrc, data_month)] = totals
+                    self._entries.move_to_end((isrc, data_month))
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+        return resolved
+
+    def _query_totals(self, isrcs):
+        """Run one bulk query; returns {isrc: totals} or None on failure"""
+        self.stats['queries'] += 1
+        results = self.service._execute_query_columnar(get_bulk_total_streams_query(isrcs), "Bulk Total Streams")
+        if not results.columns:
+            # Failed, rejected or no connection (a query that ran always has columns)
+            return None
+
+        # Snowflake upper-cases unquoted aliases, DuckDB keeps them as written
+        columns = {name.lower(): values for name, values in results.to_columns().items()}
+        found = {}
+        for isrc, total, source, territories in zip(
+            columns.get('isrc', []), columns.get('total_streams', []),
+            columns.get('streams_source', []), columns.get('territory_count', [])
+        ):
+            found[isrc] = {
+                'total_streams': int(total) if total is not None else None,
+                'streams_source': source,
+                'territory_count': int(territories or 0),
+            }
+        return found
+
+    def annotate_tracks(self, tracks, isrc_field='isrc'):
+        """
+        Add total_streams / streams_source to track dicts in place
+
+        All ISRCs are resolved together, so a harvested playlist of hundreds
+        of tracks costs at most one query per chunk_size ISRCs.
+        """
+        totals = self.resolve(track.get(isrc_field) for track in tracks)
+        for track in tracks:
+            found = totals.get(normalize_isrc(track.get(isrc_field)))
+            track['total_streams'] = found['total_streams'] if found else None
+            track['streams_source'] = found['streams_source'] if found else None
+        return tracks
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries))
@@ -0,0 +1,177 @@
+"""
+Synthetic Luminate + Spotify playlist tables for offline profiling
+Generates realistic volumes (millions of monthly rows) directly inside an
+embedded DuckDB database, using the same table and column names the
+Snowflake queries in profiling_queries.py expect.
+"""
+
+import time
+
+TERRITORIES = ['FR', 'DE', 'ES', 'GB', 'US', 'TH', 'JP', 'IT', 'NL', 'SE', 'NO', 'BR', 'MX', 'AU', 'CA', 'KR']
+
+PLAYLIST_TEMPLATES = [
+    'Radar {market}', 'Top {market}', 'Viral 50 {market}', 'New Music Friday {market}',
+    'Fresh Finds {market}', '{market} Hip-Hop Central', '{market} Pop Rising', 'Hot Hits {market}',
+    '{market} Dance Party', 'Chill {market}', '{market} Workout', 'Indie {market}',
+]
+
+MARKET_NAMES = {
+    'FR': 'France', 'DE': 'Germany', 'ES': 'Spain', 'GB': 'UK', 'US': 'USA', 'TH': 'Thailand',
+    'JP': 'Japan', 'IT': 'Italia', 'NL': 'Nederland', 'SE': 'Sverige', 'NO': 'Norge',
+    'BR': 'Brasil', 'MX': 'México', 'AU': 'Australia', 'CA': 'Canada', 'KR': 'Korea',
+}
+
+SCHEMA = 'RIGHTSAPP_INSIGHTS.PUBLIC'
+
+
+def prepare_catalog(conn, database_path=':memory:'):
+    """Attach the RIGHTSAPP_INSIGHTS catalog and Snowflake compatibility macros"""
+    attached = {row[0].upper() for row in conn.execute("SELECT database_name FROM duckdb_databases()").fetchall()}
+    if 'RIGHTSAPP_INSIGHTS' not in attached:
+        conn.execute(f"ATTACH '{database_path}' AS RIGHTSAPP_INSIGHTS")
+    conn.execute(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA}")
+    # Snowflake functions used by profiling_queries.py
+    conn.execute("CREATE OR REPLACE MACRO TRY_TO_DATE(x) AS TRY_CAST(x AS DATE)")
+
+
+def generate_synthetic_tables(conn, recordings=100000, months=24, playlists_per_market=40, seed=42):
+    """
+    Create and fill the three profiling tables
+
+    Args:
+        conn: DuckDB connection with prepare_catalog() applied
+        recordings: Number of distinct ISRCs
+        months: Length of the monthly Luminate history ending this month
+        playlists_per_market: Playlists generated per territory
+        seed: Makes the generated data reproducible
+
+    Returns:
+        dict: Row counts per table and generation time
+    """
+    started = time.time()
+
+    territory_rows = ', '.join(f"({i}, '{code}')" for i, code in enumerate(TERRITORIES))
+    playlist_rows = ', '.join(
+        f"('{code}', {t}, '{template.format(market=MARKET_NAMES[code])}')"
+        for code in TERRITORIES for t, template in enumerate(PLAYLIST_TEMPLATES)
+    )
+
+    # Recording universe: popularity is log-uniform so only a slice lands in 5-50M
+    conn.execute(f"""
+        CREATE OR REPLACE TEMP TABLE synthetic_recordings AS
+        SELECT
+            i AS rid,
+            'SY' || lpad(i::VARCHAR, 10, '0') AS isrc,
+            'Track ' || i AS title,
+            'Artist ' || (i % GREATEST({recordings} // 4, 1)) AS artist,
+            (hash(i, {seed}) % {months})::INTEGER AS release_offset,
+            pow(10, 3.2 + 3.3 * ((hash(i, {seed} + 1) % 100000) / 100000.0)) AS peak_monthly,
+            (hash(i, {seed} + 2) % {len(TERRITORIES)})::INTEGER AS home_territory
+        FROM range({recordings}) t(i)
+    """)
+
+    # Home territory always, other territories (and WW) with decreasing probability
+    conn.execute(f"""
+        CREATE OR REPLACE TEMP TABLE synthetic_presence AS
+        SELECT r.rid, t.code AS territory,
+               CASE WHEN t.idx = r.home_territory THEN 1.0 ELSE 0.15 END AS share
+        FROM synthetic_recordings r
+        CROSS JOIN (VALUES {territory_rows}) AS t (idx, code)
+        WHERE t.idx = r.home_territory OR hash(r.rid, t.idx, {seed}) % 100 < 12
+        UNION ALL
+        SELECT r.rid, 'WW', 3.0
+        FROM synthetic_recordings r
+        WHERE hash(r.rid, {seed} + 3) % 100 < 35
+    """)
+
+    conn.execute(f"""
+        CREATE OR REPLACE TABLE {SCHEMA}.LUMINATEMONTHLYSTREAMSBYRECORDING AS
+        WITH monthly AS (
+            SELECT
+                r.isrc AS ISRC,
+                r.title AS "Title",
+                r.artist AS "Display Artist",
+                p.territory AS Territory,
+                date_trunc('month', current_date) - INTERVAL (({months} - 1 - m.m)) MONTH AS month_start,
+                (r.peak_monthly * p.share
+                    * exp(-0.18 * (m.m - r.release_offset))
+                    * (0.7 + 0.6 * ((hash(r.rid, m.m, p.territory) % 1000) / 1000.0)))::BIGINT AS "Streams"
+            FROM synthetic_recordings r
+            JOIN synthetic_presence p ON p.rid = r.rid
+            JOIN range({months}) m(m) ON m.m >= r.release_offset
+        )
+        SELECT
+            ISRC, "Title", "Display Artist", Territory,
+            strftime(month_start, '%Y') AS "Activity Year",
+            strftime(month_start, '%B') AS "Activity Month",
+            "Streams",
+            SUM("Streams") OVER (PARTITION BY ISRC, Territory ORDER BY month_start) AS "Streams ATD"
+        FROM monthly
+    """)
+
+    # Playlists: a fixed editorial set per territory plus popularity (followers)
+    conn.execute(f"""
+        CREATE OR REPLACE TEMP TABLE synthetic_playlists AS
+        SELECT
+            row_number() OVER () AS pid,
+            '37i9dQZF1DX' || lpad((row_number() OVER ())::VARCHAR, 11, '0') AS playlist_id,
+            CASE WHEN copy = 0 THEN name ELSE name || ' ' || (copy + 1) END AS playlist_name,
+            territory,
+            (pow(10, 4 + 2.8 * ((hash(name, copy, {seed}) % 1000) / 1000.0)))::BIGINT AS playlist_popularity,
+            hash(name, copy, {seed} + 1) % 100 < 35 AS high_value
+        FROM (VALUES {playlist_rows}) AS p (territory, template_idx, name)
+        CROSS JOIN range(GREATEST({playlists_per_market} // {len(PLAYLIST_TEMPLATES)}, 1)) c(copy)
+    """)
+
+    # Playlist adds: popular recordings get more adds, sooner after release
+    conn.execute(f"""
+        CREATE OR REPLACE TABLE {SCHEMA}.SPOTIFY_PLAYLIST_DATA AS
+        WITH candidates AS (
+            SELECT r.rid, r.isrc, r.title, r.artist, r.release_offset, r.peak_monthly, pr.territory
+            FROM synthetic_recordings r
+            JOIN synthetic_presence pr ON pr.rid = r.rid AND pr.territory != 'WW'
+        ),
+        adds AS (
+            SELECT c.*, pl.playlist_id, pl.playlist_name, pl.playlist_popularity,
+                   (hash(c.rid, pl.pid, {seed}) % 120)::INTEGER AS days_after_release
+            FROM candidates c
+            JOIN synthetic_playlists pl ON pl.territory = c.territory
+            WHERE hash(c.rid, pl.pid, {seed} + 4) % 10000
+                  < 40 + 600 * (log10(c.peak_monthly) - 3.2) / 3.3
+        )
+        SELECT
+            isrc,
+            playlist_id,
+            playlist_name,
+            strftime(LEAST(
+                date_trunc('month', current_date)
+                    - INTERVAL (({months} - 1 - release_offset)) MONTH
+                    + INTERVAL (days_after_release) DAY,
+                current_date), '%Y-%m-%d') AS added_at,
+            playlist_popularity,
+            title AS name,
+            artist
+        FROM adds
+    """)
+
+    conn.execute(f"""
+        CREATE OR REPLACE TABLE {SCHEMA}.SPOTHIGHVALUE_ISRCS AS
+        SELECT DISTINCT p.isrc, p.playlist_id, p.playlist_name
+        FROM {SCHEMA}.SPOTIFY_PLAYLIST_DATA p
+        JOIN synthetic_playlists pl ON pl.playlist_id = p.playlist_id
+        WHERE pl.high_value
+    """)
+
+    conn.execute(f"""
+        CREATE OR REPLACE TABLE {SCHEMA}.SYNTHETIC_LOAD_METADATA AS
+        SELECT now()::VARCHAR AS loaded_at, {recordings} AS recordings, {months} AS months, {seed} AS seed
+    """)
+
+    for temp in ('synthetic_recordings', 'synthetic_presence', 'synthetic_playlists'):
+        conn.execute(f"DROP TABLE IF EXISTS {temp}")
+
+    counts = {}
+    for table in ('LUMINATEMONTHLYSTREAMSBYRECORDING', 'SPOTIFY_PLAYLIST_DATA', 'SPOTHIGHVALUE_ISRCS'):
+        counts[table] = conn.execute(f"SELECT COUNT(*) FROM {SCHEMA}.{table}").fetchone()[0]
+    counts['generation_seconds'] = round(time.time() - started, 2)
+    return counts
@@ -6,7 +6,6 @@ Tests the universal playlist discovery system
 
 import requests
 import json
-import time
 from datetime import datetime
 
 # Test combinations to validate
@@ -35,53 +34,71 @@ TEST_COMBINATIONS = [
     ("South Korea", "pop"),
 ]
 
-def test_combination(market, genre):
-    """Test a specific market/genre combination"""
-    try:
-        url = "http://localhost:5001/api/analyze"
-        payload = {"market": market, "genre": genre}
+def summarize_result(market, genre, data):
+    """Print and record one market/genre result from the batch stream"""
+    if data.get('success'):
+        playlists = data.get('playlists', [])
         
-        response = requests.post(url, json=payload, timeout=30)
+        print(f"\n🎵 {market} - {genre.title()}")
+        print(f"   Status: ✅ SUCCESS ({len(playlists)} playlists)")
         
-        if response.status_code == 200:
-            data = response.json()
-            playlists = data.get('playlists', [])
-            
-            print(f"\n🎵 {market} - {genre.title()}")
-            print(f"   Status: ✅ SUCCESS ({len(playlists)} playlists)")
-            
-            # Show top 3 playlists for quality check
-            for i, playlist in enumerate(playlists[:3]):
-                name = playlist.get('playlist_name', 'Unknown')
-                followers = playlist.get('followers', 0)
-                print(f"   {i+1}. {name} ({followers:,} followers)")
+        # Show top 3 playlists for quality check
+        for i, playlist in enumerate(playlists[:3]):
+            name = playlist.get('playlist_name', 'Unknown')
+            followers = playlist.get('followers', 0)
+            print(f"   {i+1}. {name} ({followers:,} followers)")
+        
+        return {
+            'market': market,
+            'genre': genre, 
+            'status': 'success',
+            'count': len(playlists),
+            'playlists': playlists[:3]  # Top 3 for analysis
+        }
+    
+    print(f"\n❌ {market} - {genre.title()}")
+    print(f"   Error: {data.get('error')}")
+    return {
+        'market': market,
+        'genre': genre,
+        'status': 'error',
+        'error': data.get('error')
+    }
+
+def test_combinations(combinations):
+    """Test every market/genre combination in one batch request (results stream in as they complete)"""
+    results = {}
+    try:
+        url = "http://localhost:5001/api/analyze/batch"
+        payload = {"pairs": [{"market": market, "genre": genre} for market, genre in combinations]}
+        
+        with requests.post(url, json=payload, stream=True, timeout=300) as response:
+            if response.status_code != 200:
+                raise RuntimeError(f"{response.status_code}: {response.text}")
             
-            return {
-                'market': market,
-                'genre': genre, 
-                'status': 'success',
-                'count': len(playlists),
-                'playlists': playlists[:3]  # Top 3 for analysis
-            }
-        else:
-            print(f"\n❌ {market} - {genre.title()}")
-            print(f"   Error: {response.status_code} - {response.text}")
-            return {
-                'market': market,
-                'genre': genre,
-                'status': 'error',
-                'error': f"{response.status_code}: {response.text}"
-            }
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                if data.get('done'):
+                    print(f"\n⏱️  Batch finished in {data.get('elapsed_seconds')}s "
+                          f"({data.get('metadata_lookups_shared', 0)} playlist lookups shared between markets)")
+                    continue
+                key = (data.get('market'), data.get('genre'))
+                print(f"\nCompleted {len(results) + 1}/{len(combinations)}: {key[0]} - {key[1]}")
+                results[key] = summarize_result(key[0], key[1], data)
             
     except Exception as e:
-        print(f"\n💥 {market} - {genre.title()}")
+        print(f"\n💥 Batch request failed")
         print(f"   Exception: {str(e)}")
-        return {
-            'market': market,
-            'genre': genre,
-            'status': 'exception',
-            'error': str(e)
-        }
+    
+    # Combinations missing from the stream (request failed or cut short)
+    return [results.get((market, genre)) or {
+        'market': market,
+        'genre': genre,
+        'status': 'exception',
+        'error': 'no result received'
+    } for market, genre in combinations]
 
 def analyze_results(results):
     """Analyze the quality of results for each market/genre"""
@@ -165,16 +182,8 @@ def main():
     print("🚀 Starting Comprehensive Market/Genre Testing...")
     print(f"Testing {len(TEST_COMBINATIONS)} combinations")
     
-    results = []
-    
-    for i, (market, genre) in enumerate(TEST_COMBINATIONS):
-        print(f"\nTesting {i+1}/{len(TEST_COMBINATIONS)}: {market} - {genre}")
-        
-        result = test_combination(market, genre)
-        results.append(result)
-        
-        # Rate limiting to avoid overwhelming the API
-        time.sleep(2)
+    # All combinations run in parallel on the server, sharing its rate governor
+    results = test_combinations(TEST_COMBINATIONS)
     
     # Analyze results
     is_passing = analyze_results(results)
@@ -0,0 +1,257 @@
+"""
+Playlist transition graph for gateway / crossover analysis
+Edge A -> B counts songs whose next playlist add after A was B, with the
+latency between the two adds. Built from the adoption timelines in
+velocity_index.py and stored as CSR arrays (one row of destinations per
+source playlist); new adds are applied as deltas and merged into the CSR
+arrays when the delta grows large.
+"""
+
+import logging
+import time
+from array import array
+from bisect import bisect_left
+
+# Upper bounds (days) of the latency histogram bins; the last bin is open-ended
+LATENCY_BINS = [7, 14, 30, 60, 90]
+LATENCY_LABELS = ['0_7_days', '8_14_days', '15_30_days', '31_60_days', '61_90_days', '90_plus_days']
+N_BINS = len(LATENCY_BINS) + 1
+
+# Merge deltas into the CSR arrays beyond this many changed edges (or 5% of all edges)
+COMPACT_MIN_DELTA_EDGES = 5000
+
+
+def _latency_bin(days):
+    return bisect_left(LATENCY_BINS, days)
+
+
+class _EdgeStats:
+    """Mutable count / latency totals for one edge (used while building and for deltas)"""
+
+    __slots__ = ('count', 'latency_sum', 'histogram')
+
+    def __init__(self):
+        self.count = 0
+        self.latency_sum = 0
+        self.histogram = [0] * N_BINS
+
+    def add(self, latency_days, sign=1):
+        self.count += sign
+        self.latency_sum += sign * latency_days
+        self.histogram[_latency_bin(latency_days)] += sign
+
+
+class PlaylistTransitionGraph:
+    """Compact playlist -> next playlist graph kept in sync with an AdoptionTimelineIndex"""
+
+    def __init__(self, adoption_index):
+        self.index = adoption_index
+        self.logger = logging.getLogger(__name__)
+        self._built = False
+        self._reset_csr()
+        self._delta = {}  # source -> {target: _EdgeStats}
+        self._delta_edges = 0
+        self._songs = array('l')  # playlist index -> songs added (all adds, not just transitions)
+        self.stats = {'builds': 0, 'compactions': 0, 'delta_updates': 0, 'last_build_seconds': None}
+        adoption_index.add_listener(self._on_insert)
+
+    def _reset_csr(self):
+        self._offsets = array('l', [0])  # source -> start of its row in the edge arrays
+        self._targets = array('l')
+        self._counts = array('l')
+        self._latency_sums = array('q')
+        self._histograms = array('l')  # N_BINS per edge
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+    def ensure_built(self):
+        """Build the CSR arrays from the adoption index on first use"""
+        with self.index.lock:
+            if not self._built:
+                self._build()
+
+    def _build(self, carry_delta=False):
+        started = time.monotonic()
+        edges = {}  # (source, target) -> _EdgeStats
+        songs = [0] * len(self.index.playlist_ids)
+
+        if carry_delta:
+            # Compaction: existing CSR rows plus pending deltas
+            for source in range(len(self._offsets) - 1):
+                for target, count, latency_sum, histogram in self._row(source):
+                    stats = edges.setdefault((source, target), _EdgeStats())
+                    stats.count, stats.latency_sum, stats.histogram = count, latency_sum, histogram
+            for source, row in self._delta.items():
+                for target, delta in row.items():
+                    stats = edges.setdefault((source, target), _EdgeStats())
+                    stats.count += delta.count
+                    stats.latency_sum += delta.latency_sum
+                    stats.histogram = [a + b for a, b in zip(stats.histogram, delta.histogram)]
+            songs[:len(self._songs)] = self._songs
+        else:
+            for _, days, playlists in self.index.iter_timelines():
+                for position, source in enumerate(playlists):
+                    songs[source] += 1
+                    if position + 1 < len(playlists):
+                        edges.setdefault((source, playlists[position + 1]), _EdgeStats()).add(
+                            days[position + 1] - days[position]
+                        )
+
+        self._reset_csr()
+        sources = len(self.index.playlist_ids)
+        ordered = sorted((key, stats) for key, stats in edges.items() if stats.count > 0)
+        position = 0
+        for source in range(sources):
+            while position < len(ordered) and ordered[position][0][0] == source:
+                (_, target), stats = ordered[position]
+                self._targets.append(target)
+                self._counts.append(stats.count)
+                self._latency_sums.append(stats.latency_sum)
+                self._histograms.extend(stats.histogram)
+                position += 1
+            self._offsets.append(len(self._targets))
+
+        self._songs = array('l', songs)
+        self._delta = {}
+        self._delta_edges = 0
+        self._built = True
+        self.stats['compactions' if carry_delta else 'builds'] += 1
+        self.stats['last_build_seconds'] = round(time.monotonic() - started, 3)
+        self.logger.info(f"🔀 Transition graph: {sources} playlists, {len(self._targets)} edges "
+                         f"({self.stats['last_build_seconds']}s)")
+
+    def _on_insert(self, isrc, position, days, playlists):
+        """Apply one new add as edge deltas (called by the adoption index)"""
+        if not self._built:
+            return
+        new = playlists[position]
+        while len(self._songs) <= new:
+            self._songs.append(0)
+        self._songs[new] += 1
+
+        has_prev = position > 0
+        has_next = position + 1 < len(playlists)
+        if has_prev and has_next:
+            # The new add splits an existing prev -> next transition
+            self._delta_add(playlists[position - 1], playlists[position + 1],
+                            days[position + 1] - days[position - 1], -1)
+        if has_prev:
+            self._delta_add(playlists[position - 1], new, days[position] - days[position - 1])
+        if has_next:
+            self._delta_add(new, playlists[position + 1], days[position + 1] - days[position])
+
+        self.stats['delta_updates'] += 1
+        if self._delta_edges > max(COMPACT_MIN_DELTA_EDGES, len(self._targets) // 20):
+            self._build(carry_delta=True)
+
+    def _delta_add(self, source, target, latency_days, sign=1):
+        row = self._delta.setdefault(source, {})
+        stats = row.get(target)
+        if stats is None:
+            stats = row[target] = _EdgeStats()
+            self._delta_edges += 1
+        stats.add(latency_days, sign)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def _row(self, source):
+        """(target, count, latency_sum, histogram) for the CSR row of a source"""
+        if source + 1 >= len(self._offsets):
+            return
+        for edge in range(self._offsets[source], self._offsets[source + 1]):
+            yield (self._targets[edge], self._counts[edge], self._latency_sums[edge],
+                   list(self._histograms[edge * N_BINS:(edge + 1) * N_BINS]))
+
+    def _merged_row(self, source):
+        """CSR row of a source with pending deltas applied"""
+        merged = {target: [count, latency_sum, histogram]
+                  for target, count, latency_sum, histogram in self._row(source)}
+        for target, delta in self._delta.get(source, {}).items():
+            current = merged.setdefault(target, [0, 0, [0] * N_BINS])
+            current[0] += delta.count
+            current[1] += delta.latency_sum
+            current[2] = [a + b for a, b in zip(current[2], delta.histogram)]
+        return {target: values for target, values in merged.items() if values[0] > 0}
+
+    def transitions(self, playlist_id, top_n=10, target_playlist_ids=None):
+        """
+        Where songs go after a playlist adds them
+
+        Args:
+            playlist_id: Source playlist
+            top_n: Number of next destinations to return
+            target_playlist_ids: Optional "mainstream" set for the crossover rate
+
+        Returns:
+            dict or None: songs_added, songs_moved_on, continuation_rate,
+            next_playlists (frequency, share, avg_days, latency histogram) and,
+            with targets, songs_that_crossed_over / crossover_success_rate /
+            avg_days_to_crossover. None for unknown playlists.
+        """
+        with self.index.lock:
+            self.ensure_built()
+            source = self.index.playlist_index(playlist_id)
+            if source is None:
+                return None
+            row = self._merged_row(source)
+            songs_added = self._songs[source] if source < len(self._songs) else 0
+            names = self.index.playlist_names
+            ids = self.index.playlist_ids
+
+            moved_on = sum(values[0] for values in row.values())
+            ranked = sorted(row.items(), key=lambda item: item[1][0], reverse=True)
+            next_playlists = [{
+                'playlist_id': ids[target],
+                'playlist': names.get(ids[target]),
+                'frequency': count,
+                'share': round(count / moved_on, 3),
+                'avg_days': round(latency_sum / count, 1),
+                'latency_histogram': dict(zip(LATENCY_LABELS, histogram)),
+            } for target, (count, latency_sum, histogram) in ranked[:top_n]]
+
+            result = {
+                'playlist_id': playlist_id,
+                'playlist_name': names.get(playlist_id),
+                'songs_added': songs_added,
+                'songs_moved_on': moved_on,
+                'continuation_rate': round(moved_on / songs_added, 3) if songs_added else 0,
+                'next_playlists': next_playlists,
+            }
+
+            if target_playlist_ids:
+                targets = {self.index.playlist_index(t) for t in target_playlist_ids} - {None}
+                crossed = [row[t] for t in targets if t in row]
+                crossed_count = sum(values[0] for values in crossed)
+                result['songs_that_crossed_over'] = crossed_count
+                result['crossover_success_rate'] = round(crossed_count / songs_added, 3) if songs_added else 0
+                result['avg_days_to_crossover'] = (
+                    round(sum(values[1] for values in crossed) / crossed_count, 1) if crossed_count else None
+                )
+            return result
+
+    def top_gateways(self, limit=20, min_songs=10):
+        """Playlists ranked by how many of their songs moved on to another playlist"""
+        with self.index.lock:
+            self.ensure_built()
+            ranked = []
+            for source, playlist_id in enumerate(self.index.playlist_ids):
+                songs_added = self._songs[source] if source < len(self._songs) else 0
+                if songs_added < min_songs:
+                    continue
+                moved_on = sum(values[0] for values in self._merged_row(source).values())
+                ranked.append((moved_on, songs_added, playlist_id))
+            ranked.sort(reverse=True)
+            return [{
+                'playlist_id': playlist_id,
+                'playlist_name': self.index.playlist_names.get(playlist_id),
+                'songs_added': songs_added,
+                'songs_moved_on': moved_on,
+                'continuation_rate': round(moved_on / songs_added, 3),
+            } for moved_on, songs_added, playlist_id in ranked[:limit]]
+
+    def get_stats(self):
+        with self.index.lock:
+            return dict(self.stats, playlists=len(self._offsets) - 1, edges=len(self._targets),
+                        delta_edges=self._delta_edges, built=self._built)
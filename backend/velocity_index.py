@@ -0,0 +1,247 @@
+"""
+Playlist adoption timelines and velocity tiers
+Keeps, per ISRC, the sorted dates on which each playlist first added it, so
+"N playlists within D days" questions are answered with a binary search
+instead of windowed self-joins over SPOTIFY_PLAYLIST_DATA. The index is
+built once and then extended with adds from its watermark day on.
+"""
+
+import datetime
+import logging
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+
+from profiling_queries import get_playlist_adds_watermark_query, get_playlist_first_adds_query
+
+# (velocity_type, window_days, min_playlists, max_playlists) - first match wins,
+# windows are anchored at the ISRC's first playlist add
+VELOCITY_TIERS = [
+    ('Lightning Fast', 30, 6, None),
+    ('Fast', 30, 3, 5),
+    ('Moderate', 60, 2, None),
+    ('Slow', 90, 1, None),
+]
+
+HIT_MIN_STREAMS = 5000000
+HIT_MAX_STREAMS = 50000000
+
+# Skip the warehouse watermark check when the index was checked this recently
+INDEX_CHECK_SECONDS = int(os.getenv('ADOPTION_INDEX_CHECK_SECONDS', '60'))
+
+
+def _day_ordinal(value):
+    """date / datetime / ISO string -> proleptic day ordinal"""
+    if isinstance(value, datetime.date):
+        return value.toordinal()
+    return datetime.date.fromisoformat(str(value)[:10]).toordinal()
+
+
+def _ordinal_suffix(n):
+    """1 -> '1st', 2 -> '2nd', 6 -> '6th'"""
+    if 10 <= n % 100 <= 20:
+        return f"{n}th"
+    return str(n) + {1: 'st', 2: 'nd', 3: 'rd'}.get(n % 10, 'th')
+
+
+class AdoptionTimelineIndex:
+    """Per-ISRC sorted playlist add days with window-count queries"""
+
+    def __init__(self, profiling_service):
+        self.service = profiling_service
+        self.logger = logging.getLogger(__name__)
+        self._days = {}  # isrc -> array of add day ordinals, sorted
+        self._playlists = {}  # isrc -> array of playlist indexes, parallel to _days
+        self.playlist_ids = []  # playlist index -> playlist_id
+        self.playlist_names = {}  # playlist_id -> playlist_name
+        self._playlist_index = {}  # playlist_id -> playlist index
+        self.add_watermark = None
+        self.add_watermark_rows = None  # rows dated add_watermark when it was applied
+        self.version = 0  # bumped whenever adds are applied
+        self._checked_at = None
+        self._listeners = []
+        self.lock = threading.RLock()  # also held by listeners and derived indexes
+        self.stats = {'full_builds': 0, 'incremental_updates': 0, 'adds_applied': 0,
+                      'last_refresh_seconds': None}
+
+    def add_listener(self, callback):
+        """Call callback(isrc, position, days, playlists) after each add is inserted"""
+        self._listeners.append(callback)
+
+    def refresh(self, force=False):
+        """
+        Apply playlist adds from the watermark day on
+
+        Adds loaded late for the watermark day change its row count, which
+        triggers an update even when the latest add date is unchanged.
+
+        Returns:
+            bool: False when the warehouse could not be read
+        """
+        with self.lock:
+            started = time.monotonic()
+            if not force and self._checked_at is not None and started - self._checked_at < INDEX_CHECK_SECONDS:
+                return True
+
+            watermark = self.service._execute_query_columnar(
+                get_playlist_adds_watermark_query(), "Playlist Adds Watermark"
+            )
+            columns = {name.lower(): values for name, values in watermark.to_columns().items()}
+            latest = columns['latest_add_date'][0] if watermark else None
+            if latest is None:
+                return False
+            latest = str(latest)[:10]
+            latest_rows = columns['latest_add_rows'][0]
+
+            if latest != self.add_watermark or latest_rows != self.add_watermark_rows:
+                query = get_playlist_first_adds_query(latest, self.add_watermark)
+                result = self.service._execute_query_columnar(query, "Playlist First Adds")
+                if not result.columns:
+                    return False
+                columns = {name.lower(): values for name, values in result.to_columns().items()}
+                applied = 0
+                for isrc, playlist_id, playlist_name, add_date in zip(
+                    columns['isrc'], columns['playlist_id'], columns['playlist_name'], columns['add_date']
+                ):
+                    if add_date is not None and self._insert(isrc, playlist_id, playlist_name, _day_ordinal(add_date)):
+                        applied += 1
+
+                self.stats['full_builds' if self.add_watermark is None else 'incremental_updates'] += 1
+                self.stats['adds_applied'] += applied
+                self.stats['last_refresh_seconds'] = round(time.monotonic() - started, 3)
+                self.add_watermark = latest
+                self.add_watermark_rows = latest_rows
+                self.version += 1
+                self.logger.info(f"⏱️ Adoption index: +{applied} adds, {len(self._days)} ISRCs "
+                                 f"({self.stats['last_refresh_seconds']}s)")
+
+            self._checked_at = started
+            return True
+
+    def _insert(self, isrc, playlist_id, playlist_name, day):
+        """Insert one first-add; False when the pair is already indexed"""
+        index = self._playlist_index.get(playlist_id)
+        if index is None:
+            index = len(self.playlist_ids)
+            self.playlist_ids.append(playlist_id)
+            self._playlist_index[playlist_id] = index
+        self.playlist_names[playlist_id] = playlist_name
+
+        days = self._days.get(isrc)
+        if days is None:
+            days = self._days[isrc] = array('l')
+            playlists = self._playlists[isrc] = array('l')
+        else:
+            playlists = self._playlists[isrc]
+            if index in playlists:
+                return False
+
+        # Same-day adds are ordered by playlist_id so timelines do not depend on load order
+        position = bisect_left(days, day)
+        end = bisect_right(days, day, position)
+        while position < end and self.playlist_ids[playlists[position]] < playlist_id:
+            position += 1
+        days.insert(position, day)
+        playlists.insert(position, index)
+        for callback in self._listeners:
+            callback(isrc, position, days, playlists)
+        return True
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def playlist_index(self, playlist_id):
+        """Dense index of a playlist_id, or None if it has never added anything"""
+        return self._playlist_index.get(playlist_id)
+
+    def iter_timelines(self):
+        """(isrc, days, playlists) for every indexed ISRC; hold self.lock while iterating"""
+        for isrc, days in self._days.items():
+            yield isrc, days, self._playlists[isrc]
+
+    def timeline(self, isrc):
+        """[(add_date, playlist_id)] for an ISRC in add order"""
+        with self.lock:
+            days = self._days.get(isrc, ())
+            playlists = self._playlists.get(isrc, ())
+            return [(datetime.date.fromordinal(day), self.playlist_ids[index])
+                    for day, index in zip(days, playlists)]
+
+    def adds_within(self, isrc, window_days):
+        """Playlists that added the ISRC within window_days of its first add"""
+        days = self._days.get(isrc)
+        if not days:
+            return 0
+        return bisect_left(days, days[0] + window_days)
+
+    def days_to_nth_add(self, isrc, n):
+        """Days from the first add to the nth add (None if fewer adds)"""
+        days = self._days.get(isrc)
+        if not days or len(days) < n:
+            return None
+        return days[n - 1] - days[0]
+
+    def velocity_tier(self, isrc):
+        """velocity_type for an indexed ISRC, or None"""
+        for velocity_type, window_days, min_playlists, max_playlists in VELOCITY_TIERS:
+            count = self.adds_within(isrc, window_days)
+            if count >= min_playlists and (max_playlists is None or count <= max_playlists):
+                return velocity_type
+        return None
+
+    def velocity_tiers(self, isrc_streams):
+        """
+        Velocity tier breakdown for a population of ISRCs
+
+        Args:
+            isrc_streams: isrc -> (baseline at first playlist, latest Streams ATD),
+                          as returned by IncrementalStreamsEngine.isrc_streams
+
+        Returns:
+            list: One dict per tier, shaped like the mock velocity_tiers
+        """
+        tiers = {name: {'songs': 0, 'hits': 0, 'incremental': 0, 'baseline': 0, 'days_to_nth': []}
+                 for name, _, _, _ in VELOCITY_TIERS}
+        # Days to the tier's threshold add (2nd add at least, the 1st is always day 0)
+        thresholds = {name: max(min_playlists, 2) for name, _, min_playlists, _ in VELOCITY_TIERS}
+
+        with self.lock:
+            for isrc, (baseline, latest) in isrc_streams.items():
+                tier = self.velocity_tier(isrc)
+                if tier is None:
+                    continue
+                totals = tiers[tier]
+                totals['songs'] += 1
+                totals['hits'] += 1 if HIT_MIN_STREAMS <= latest <= HIT_MAX_STREAMS else 0
+                totals['incremental'] += max(latest - baseline, 0)
+                totals['baseline'] += baseline
+                days = self.days_to_nth_add(isrc, thresholds[tier])
+                if days is not None:
+                    totals['days_to_nth'].append(days)
+
+        results = []
+        for velocity_type, window_days, min_playlists, max_playlists in VELOCITY_TIERS:
+            totals = tiers[velocity_type]
+            songs = totals['songs']
+            count = f"{min_playlists}-{max_playlists}" if max_playlists else f"{min_playlists}+"
+            days_to_nth = totals['days_to_nth']
+            results.append({
+                'velocity_type': velocity_type,
+                'definition': f"{count} playlists in first {window_days} days",
+                'songs_count': songs,
+                'hits_produced': totals['hits'],
+                'hit_rate': round(totals['hits'] / songs, 2) if songs else 0,
+                'avg_incremental_streams': round(totals['incremental'] / songs / 1000000, 1) if songs else 0,
+                'avg_baseline_at_first_playlist': round(totals['baseline'] / songs / 1000000, 2) if songs else 0,
+                f'avg_days_to_{_ordinal_suffix(thresholds[velocity_type])}_playlist':
+                    round(sum(days_to_nth) / len(days_to_nth)) if days_to_nth else None,
+            })
+        return results
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, isrcs=len(self._days), playlists=len(self.playlist_ids),
+                        add_watermark=self.add_watermark, add_watermark_rows=self.add_watermark_rows,
+                        version=self.version)
@@ -0,0 +1,15 @@
+"""
+WSGI entry point for production serving
+    gunicorn -c gunicorn.conf.py wsgi:app
+Worker count, threads, preload and shutdown draining are configured in
+gunicorn.conf.py; simple_working.py's __main__ block is the development server.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Relative paths (Apple Music key, market config) resolve against the backend directory
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+from simple_working import app  # noqa: E402
@@ -9,6 +9,7 @@ function App() {
   const [results, setResults] = useState(null);
   const [isLoadingTracks, setIsLoadingTracks] = useState(false);
   const [tracks, setTracks] = useState(null);
+  const [isLoadingMoreTracks, setIsLoadingMoreTracks] = useState(false);
   const [isLoadingCredits, setIsLoadingCredits] = useState(false);
   const [writerCredits, setWriterCredits] = useState(null);
   
@@ -17,6 +18,8 @@ function App() {
   const [profilingData, setProfilingData] = useState(null);
   const [profilingError, setProfilingError] = useState(null);
 
+  const TRACKS_PAGE_SIZE = 50;
+
   const markets = ['France', 'UK', 'Germany', 'Spain', 'US', 'Thailand', 'Japan'];
   const genres = ['Hip-Hop', 'Pop', 'Electronic', 'R&B', 'Rock'];
 
@@ -70,7 +73,8 @@ function App() {
         headers: {
           'Content-Type': 'application/json',
         },
-        body: JSON.stringify({ playlist_ids: playlistIds })
+        // First page arrives as soon as it is harvested; the rest is fetched on demand by cursor
+        body: JSON.stringify({ playlist_ids: playlistIds, page_size: TRACKS_PAGE_SIZE })
       });
       
       const data = await response.json();
@@ -87,6 +91,33 @@ function App() {
     }
   };
 
+  const handleLoadMoreTracks = async () => {
+    if (!tracks || !tracks.next_cursor) {
+      return;
+    }
+    
+    setIsLoadingMoreTracks(true);
+    
+    try {
+      const response = await fetch(
+        'http://localhost:5001/api/results?cursor=' + encodeURIComponent(tracks.next_cursor)
+      );
+      
+      const data = await response.json();
+      
+      if (data.success) {
+        // Append the page; totals (total_tracks, partial, ...) arrive once the harvest is complete
+        setTracks({ ...tracks, ...data, tracks: tracks.tracks.concat(data.tracks) });
+      } else {
+        alert('Error: ' + data.error);
+      }
+    } catch (error) {
+      alert('Error fetching tracks: ' + error.message);
+    } finally {
+      setIsLoadingMoreTracks(false);
+    }
+  };
+
   const handleFetchWriterCredits = async () => {
     if (!tracks || !tracks.tracks) {
       alert('No tracks to fetch writer credits for');
@@ -102,7 +133,10 @@ function App() {
         headers: {
           'Content-Type': 'application/json',
         },
-        body: JSON.stringify({ tracks: tracks.tracks })
+        // The server reads the harvested tracks from its result set instead of a re-upload
+        body: JSON.stringify(
+          tracks.result_id ? { tracks_result_id: tracks.result_id } : { tracks: tracks.tracks }
+        )
       });
       
       const data = await response.json();
@@ -298,13 +332,17 @@ function App() {
               </h2>
               
               <p style={{ fontSize: '18px', marginBottom: '20px', color: '#fff' }}>
-                Found <strong>{tracks.total_tracks}</strong> tracks across {results.playlists.length} playlists
+                {tracks.complete === false ? (
+                  <>Harvesting... <strong>{tracks.rows_available}</strong> tracks so far across {results.playlists.length} playlists</>
+                ) : (
+                  <>Found <strong>{tracks.total_tracks}</strong> tracks across {results.playlists.length} playlists</>
+                )}
               </p>
 
               <div style={{ marginTop: '20px' }}>
                 {tracks.tracks && tracks.tracks.length > 0 ? (
                   <div>
-                    {tracks.tracks.slice(0, 50).map((track, idx) => (
+                    {tracks.tracks.map((track, idx) => (
                       <div 
                         key={idx}
                         style={{
@@ -335,10 +373,27 @@ function App() {
                         </div>
                       </div>
                     ))}
-                    {tracks.tracks.length > 50 && (
-                      <p style={{ color: '#888', textAlign: 'center', marginTop: '20px' }}>
-                        Showing first 50 of {tracks.total_tracks} tracks...
-                      </p>
+                    {tracks.next_cursor && (
+                      <div style={{ textAlign: 'center', marginTop: '20px' }}>
+                        <p style={{ color: '#888' }}>
+                          Showing {tracks.tracks.length} of {tracks.complete ? tracks.total_tracks : tracks.rows_available + '+'} tracks
+                        </p>
+                        <button
+                          onClick={handleLoadMoreTracks}
+                          disabled={isLoadingMoreTracks}
+                          style={{
+                            padding: '10px 24px',
+                            fontSize: '15px',
+                            backgroundColor: isLoadingMoreTracks ? '#ccc' : '#2196F3',
+                            color: 'white',
+                            border: 'none',
+                            borderRadius: '8px',
+                            cursor: isLoadingMoreTracks ? 'not-allowed' : 'pointer'
+                          }}
+                        >
+                          {isLoadingMoreTracks ? 'Loading...' : 'Load more tracks'}
+                        </button>
+                      </div>
                     )}
                   </div>
                 ) : (